@@ -7,6 +7,8 @@ from backend.app.api.v1.system import router as system_router
 from backend.app.api.v1.resources import router as resources_router
 from backend.app.api.v1.proxy import router as proxy_router
 from backend.app.api.v1.danmaku import router as danmaku_router
+from backend.app.api.v1.stats import router as stats_router
+from backend.app.api.v1.analytics import router as analytics_router
 
 from backend.core.conf import settings
 
@@ -21,3 +23,5 @@ v1.include_router(danmaku_router, tags=["Danmaku"], prefix="/danmaku")
 v1.include_router(system_router, tags=["System"])
 v1.include_router(resources_router, tags=["Resources"], prefix="/resources")
 v1.include_router(proxy_router, tags=["Proxy"], prefix="/proxy")
+v1.include_router(stats_router, tags=["Stats"], prefix="/stats")
+v1.include_router(analytics_router, tags=["Analytics"], prefix="/analytics")
@@ -0,0 +1,109 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Query
+from backend.common.resp import Resp
+from backend.core.conf import settings
+from backend.database.db import AsyncReadSessionLocal
+from backend.app.crud.rollup import crud_rollup
+from backend.app.schemas import danmaku as dm_schema
+from backend.app.schemas.analytics import RevenueBreakdownResponse, RollupResponse
+from backend.utils.timezone import timezone
+
+router = APIRouter()
+
+Granularity = Literal["minute", "hour", "day"]
+
+
+@router.get("/{room_id}/timeline", response_model=Resp[List[RollupResponse]])
+async def get_timeline(
+    room_id: int,
+    granularity: Granularity = Query("hour", description="时间粒度 minute / hour / day"),
+    since: Optional[datetime] = Query(None, description="起始时间 (含)，ISO 时间或时间戳"),
+    until: Optional[datetime] = Query(None, description="结束时间 (不含)，ISO 时间或时间戳"),
+    limit: int = Query(100, ge=1, description="最多返回的时间桶数量，超过上限时按上限截断"),
+):
+    """
+    获取房间分时统计
+
+    Description:
+        按分钟/小时/天返回消息数、独立发送者数和营收，只读取后台汇总表，不扫描原始事件表。
+        汇总每 ROLLUP_INTERVAL 秒更新一次，最近一两分钟的数据可能尚未计入。
+        未指定 since 时返回最近 limit 个时间桶。
+
+    Args:
+        room_id (int): 房间号
+        granularity (str): 时间粒度
+        since (Optional[datetime]): 起始时间 (含)
+        until (Optional[datetime]): 结束时间 (不含)
+        limit (int): 最多返回数量，最大 ANALYTICS_MAX_BUCKETS
+
+    Return:
+        Resp[List[RollupResponse]]: 按时间正序排列的汇总列表
+
+    Raises:
+        无
+    """
+    async with AsyncReadSessionLocal() as db:
+        rows = await crud_rollup.get_rollups(
+            db,
+            room_id,
+            granularity,
+            since=timezone.to_local(since) if since else None,
+            until=timezone.to_local(until) if until else None,
+            limit=min(limit, settings.ANALYTICS_MAX_BUCKETS),
+        )
+
+    data = [
+        {
+            "timestamp": timezone.to_timestamp(r.bucket),
+            "danmaku_count": r.danmaku_count,
+            "gift_count": r.gift_count,
+            "super_chat_count": r.super_chat_count,
+            "unique_senders": r.unique_senders,
+            "gift_revenue": round(r.gift_revenue, 2),
+            "guard_revenue": round(r.guard_revenue, 2),
+            "super_chat_revenue": round(r.super_chat_revenue, 2),
+        } for r in rows
+    ]
+    return Resp.success(data=data)
+
+@router.get("/{room_id}/revenue", response_model=Resp[RevenueBreakdownResponse])
+async def get_revenue_breakdown(
+    room_id: int,
+    granularity: Granularity = Query("day", description="用于合计的汇总粒度，since / until 按该粒度的时间桶起点过滤"),
+    since: Optional[datetime] = Query(None, description="起始时间 (含)，ISO 时间或时间戳"),
+    until: Optional[datetime] = Query(None, description="结束时间 (不含)，ISO 时间或时间戳"),
+):
+    """
+    获取房间营收构成
+
+    Description:
+        合计时间范围内按礼物、按舰队等级的营收，只读取后台汇总表。
+
+    Args:
+        room_id (int): 房间号
+        granularity (str): 汇总粒度，范围越长建议粒度越粗
+        since (Optional[datetime]): 起始时间 (含)
+        until (Optional[datetime]): 结束时间 (不含)
+
+    Return:
+        Resp[RevenueBreakdownResponse]: 营收构成
+
+    Raises:
+        无
+    """
+    async with AsyncReadSessionLocal() as db:
+        rows = await crud_rollup.get_gift_totals(
+            db,
+            room_id,
+            granularity,
+            since=timezone.to_local(since) if since else None,
+            until=timezone.to_local(until) if until else None,
+        )
+
+    gifts, guards = [], []
+    for r in rows:
+        item = {"gift_name": r.gift_name, "gift_count": r.gift_count, "gift_num": r.gift_num, "revenue": round(r.revenue, 2)}
+        (guards if r.gift_name in dm_schema.GUARD_GIFT_NAMES else gifts).append(item)
+    total = round(sum(r.revenue for r in rows), 2)
+    return Resp.success(data={"total_revenue": total, "gifts": gifts, "guards": guards})
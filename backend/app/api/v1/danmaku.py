@@ -1,23 +1,90 @@
-from typing import List
-from fastapi import APIRouter, Query
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Dict, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from backend.common.exception.custom_exception import NotFoundException
 from backend.common.resp import Resp
-from backend.database.db import AsyncSessionLocal
+from backend.core.conf import settings
+from backend.database.db import AsyncReadSessionLocal
 from backend.app.crud.danmaku import crud_danmaku
+from backend.app.models import danmaku as dm_model
 from backend.app.schemas import danmaku as dm_schema
+from backend.app.services.export_service import export_service
+from backend.app.services.retention_service import retention_service
+from backend.app.services.blive_service import blive_service
+from backend.utils.timezone import timezone
 
 router = APIRouter()
 
+def history_filters(
+    before_id: Optional[int] = Query(None, description="游标：只返回该记录之前的数据"),
+    after_id: Optional[int] = Query(None, description="游标：只返回该记录之后的数据"),
+    since: Optional[datetime] = Query(None, description="起始时间 (含)，ISO 时间或时间戳"),
+    until: Optional[datetime] = Query(None, description="结束时间 (不含)，ISO 时间或时间戳"),
+    user_uid: Optional[int] = Query(None, description="按用户UID过滤"),
+) -> dict:
+    """
+    历史查询的公共过滤参数
+
+    数据库中的时间以当前时区的本地时间存储，这里统一转换后再参与比较
+    """
+    return {
+        "before_id": before_id,
+        "after_id": after_id,
+        "since": timezone.to_local(since) if since else None,
+        "until": timezone.to_local(until) if until else None,
+        "uid": user_uid,
+    }
+
+
+def _clamp_limit(limit: int) -> int:
+    return min(limit, settings.HISTORY_MAX_PAGE_SIZE)
+
+
+def _uid_str(uid: Optional[int]) -> Optional[str]:
+    return str(uid) if uid is not None else None
+
+
+def _cached_recent(room_id: int, category: str, limit: int, filters: dict) -> Tuple[list, dict]:
+    """
+    无游标/时间/用户过滤时优先使用内存缓冲区
+
+    Returns:
+        Tuple[list, dict]: 缓冲区中的事件，以及查询数据库补足剩余条数时使用的过滤参数：
+            最早的缓冲事件已入库时以其 id 作为 before_id，否则 (保存仍在排队或失败) 以其时间戳作为 until；
+            有过滤条件时事件为空，全部查询数据库
+    """
+    if any(v is not None for v in filters.values()):
+        return [], filters
+    events = blive_service.get_recent_events(room_id, category, limit)
+    if len(events) >= limit or not events:
+        return events, filters
+    oldest = events[0]
+    if oldest.get("id") is not None:
+        return events, {**filters, "before_id": oldest["id"]}
+    # 记录的 create_time 在保存时生成，不早于事件时间戳，时间戳之前的记录不会与缓冲区重复
+    until = timezone.from_datetime(datetime.fromtimestamp(oldest["timestamp"], tz=dt_timezone.utc))
+    return events, {**filters, "until": until}
+
+
 @router.get("/history/danmaku", response_model=Resp[List[dm_schema.DanmakuResponse]])
-async def get_danmaku_history(room_id: str = Query(..., description="房间号"), limit: int = 100):
+async def get_danmaku_history(
+    room_id: int = Query(..., description="房间号"),
+    limit: int = Query(100, ge=1, description="返回记录数量，超过上限时按上限截断"),
+    filters: dict = Depends(history_filters),
+):
     """
-    获取最近弹幕历史
+    获取弹幕历史
 
     Description:
-        查询指定房间的最近弹幕记录。
+        查询指定房间的弹幕记录，按时间正序返回。
+        使用 before_id / after_id 游标翻页（取返回结果首/尾记录的 id），since / until 限定时间范围。
+        不带过滤条件时优先从内存中的最近事件缓冲区返回，缓冲区不足时只从数据库补足更早的记录。
 
     Args:
-        room_id (str): 房间号
-        limit (int): 返回记录数量限制，默认100
+        room_id (int): 房间号
+        limit (int): 返回记录数量限制，默认100，最大 HISTORY_MAX_PAGE_SIZE
+        filters (dict): before_id / after_id / since / until / user_uid 过滤参数
 
     Return:
         Resp[List[DanmakuResponse]]: 包含弹幕列表的响应对象
@@ -25,36 +92,47 @@ async def get_danmaku_history(room_id: str = Query(..., description="房间号")
     Raises:
         无
     """
-    async with AsyncSessionLocal() as db:
-        danmakus = await crud_danmaku.get_recent_danmaku(db, room_id, limit)
-        
-        data = [
-            dm_schema.DanmakuResponse(
-                user_name=d.user_name,
-                level=d.level,
-                privilege_name=d.privilege_name,
-                dm_text=d.dm_text,
-                identity=d.identity,
-                price=0,
-                uid=d.uid,
-                face_img=d.face_img,
-                msg_type="danmaku",
-                timestamp=d.create_time.timestamp() if d.create_time else 0.0
-            ) for d in danmakus
-        ]
-        return Resp.success(data=data)
+    limit = _clamp_limit(limit)
+    cached, filters = _cached_recent(room_id, "danmaku", limit, filters)
+    if len(cached) >= limit:
+        return Resp.success(data=cached)
+
+    async with AsyncReadSessionLocal() as db:
+        rows = await crud_danmaku.get_danmaku_page(db, room_id, limit - len(cached), **filters)
+
+    data = [
+        {
+            "id": r.id,
+            "user_name": r.user_name,
+            "level": r.level,
+            "privilege_name": r.privilege_name,
+            "dm_text": r.dm_text,
+            "identity": r.identity,
+            "price": 0.0,
+            "uid": _uid_str(r.uid),
+            "face_img": r.face_img,
+            "msg_type": "danmaku",
+            "timestamp": timezone.to_timestamp(r.create_time) if r.create_time else 0.0,
+        } for r in rows
+    ]
+    return Resp.success(data=data + cached)
 
 @router.get("/history/gift", response_model=Resp[List[dm_schema.GiftResponse]])
-async def get_gift_history(room_id: str = Query(..., description="房间号"), limit: int = 100):
+async def get_gift_history(
+    room_id: int = Query(..., description="房间号"),
+    limit: int = Query(100, ge=1, description="返回记录数量，超过上限时按上限截断"),
+    filters: dict = Depends(history_filters),
+):
     """
-    获取最近礼物历史
+    获取礼物历史
 
     Description:
-        查询指定房间的最近礼物（包含上舰）记录。
+        查询指定房间的礼物（包含上舰）记录，按时间正序返回。分页与过滤参数同弹幕历史。
 
     Args:
-        room_id (str): 房间号
-        limit (int): 返回记录数量限制，默认100
+        room_id (int): 房间号
+        limit (int): 返回记录数量限制，默认100，最大 HISTORY_MAX_PAGE_SIZE
+        filters (dict): before_id / after_id / since / until / user_uid 过滤参数
 
     Return:
         Resp[List[GiftResponse]]: 包含礼物列表的响应对象
@@ -62,35 +140,46 @@ async def get_gift_history(room_id: str = Query(..., description="房间号"), l
     Raises:
         无
     """
-    async with AsyncSessionLocal() as db:
-        gifts = await crud_danmaku.get_recent_gifts(db, room_id, limit)
-        
-        data = [
-            dm_schema.GiftResponse(
-                user_name=g.user_name,
-                level=g.level,
-                privilege_name=g.privilege_name,
-                gift_type=g.gift_name,
-                num=g.gift_num,
-                price=g.price,
-                uid=g.uid,
-                msg_type="guard" if g.gift_name in ["舰长", "提督", "总督"] else "gift",
-                timestamp=g.create_time.timestamp() if g.create_time else 0.0
-            ) for g in gifts
-        ]
-        return Resp.success(data=data)
+    limit = _clamp_limit(limit)
+    cached, filters = _cached_recent(room_id, "gift", limit, filters)
+    if len(cached) >= limit:
+        return Resp.success(data=cached)
+
+    async with AsyncReadSessionLocal() as db:
+        rows = await crud_danmaku.get_gift_page(db, room_id, limit - len(cached), **filters)
+
+    data = [
+        {
+            "id": r.id,
+            "user_name": r.user_name,
+            "level": r.level,
+            "privilege_name": r.privilege_name,
+            "gift_type": r.gift_name,
+            "num": r.gift_num,
+            "price": r.price,
+            "uid": _uid_str(r.uid),
+            "msg_type": "guard" if r.gift_name in dm_schema.GUARD_GIFT_NAMES else "gift",
+            "timestamp": timezone.to_timestamp(r.create_time) if r.create_time else 0.0,
+        } for r in rows
+    ]
+    return Resp.success(data=data + cached)
 
 @router.get("/history/sc", response_model=Resp[List[dm_schema.DanmakuResponse]])
-async def get_sc_history(room_id: str = Query(..., description="房间号"), limit: int = 100):
+async def get_sc_history(
+    room_id: int = Query(..., description="房间号"),
+    limit: int = Query(100, ge=1, description="返回记录数量，超过上限时按上限截断"),
+    filters: dict = Depends(history_filters),
+):
     """
-    获取最近SC历史
+    获取SC历史
 
     Description:
-        查询指定房间的最近Super Chat（醒目留言）记录。
+        查询指定房间的Super Chat（醒目留言）记录，按时间正序返回。分页与过滤参数同弹幕历史。
 
     Args:
-        room_id (str): 房间号
-        limit (int): 返回记录数量限制，默认100
+        room_id (int): 房间号
+        limit (int): 返回记录数量限制，默认100，最大 HISTORY_MAX_PAGE_SIZE
+        filters (dict): before_id / after_id / since / until / user_uid 过滤参数
 
     Return:
         Resp[List[DanmakuResponse]]: 包含SC列表的响应对象
@@ -98,20 +187,184 @@ async def get_sc_history(room_id: str = Query(..., description="房间号"), lim
     Raises:
         无
     """
-    async with AsyncSessionLocal() as db:
-        scs = await crud_danmaku.get_recent_super_chats(db, room_id, limit)
-        
-        data = [
-            dm_schema.DanmakuResponse(
-                user_name=s.user_name,
-                level=s.level,
-                privilege_name=s.privilege_name,
-                dm_text=s.sc_text,
-                identity=s.identity,
-                price=s.price,
-                uid=s.uid,
-                msg_type="super_chat",
-                timestamp=s.create_time.timestamp() if s.create_time else 0.0
-            ) for s in scs
-        ]
-        return Resp.success(data=data)
+    limit = _clamp_limit(limit)
+    cached, filters = _cached_recent(room_id, "sc", limit, filters)
+    if len(cached) >= limit:
+        return Resp.success(data=cached)
+
+    async with AsyncReadSessionLocal() as db:
+        rows = await crud_danmaku.get_super_chat_page(db, room_id, limit - len(cached), **filters)
+
+    data = [
+        {
+            "id": r.id,
+            "user_name": r.user_name,
+            "level": r.level,
+            "privilege_name": r.privilege_name,
+            "dm_text": r.sc_text,
+            "identity": r.identity,
+            "price": r.price,
+            "uid": _uid_str(r.uid),
+            "msg_type": "super_chat",
+            "timestamp": timezone.to_timestamp(r.create_time) if r.create_time else 0.0,
+        } for r in rows
+    ]
+    return Resp.success(data=data + cached)
+
+@router.get("/history/search", response_model=Resp[List[dm_schema.SearchResultResponse]])
+async def search_history(
+    room_id: int = Query(..., description="房间号"),
+    q: str = Query(..., min_length=1, max_length=100, description="检索词，多个词以空格分隔，需同时包含"),
+    types: List[Literal["danmaku", "sc"]] = Query(["danmaku", "sc"], description="检索的记录类型"),
+    since: Optional[datetime] = Query(None, description="起始时间 (含)，ISO 时间或时间戳"),
+    until: Optional[datetime] = Query(None, description="结束时间 (不含)，ISO 时间或时间戳"),
+    user_uid: Optional[int] = Query(None, description="按用户UID过滤"),
+    limit: int = Query(50, ge=1, description="返回记录数量，超过上限时按上限截断"),
+):
+    """
+    全文检索弹幕与SC
+
+    Description:
+        基于 SQLite FTS5 (trigram 分词) 检索正文包含全部检索词的弹幕/SC，按相关度排序并返回命中片段。
+        任一检索词少于 3 个字符时无法使用全文索引，改为在房间、时间范围内逐条匹配并按时间倒序返回，
+        此时建议同时指定 since / until 缩小范围。
+
+    Args:
+        room_id (int): 房间号
+        q (str): 检索词
+        types (List[str]): 检索的记录类型 danmaku / sc，默认全部
+        since (Optional[datetime]): 起始时间 (含)
+        until (Optional[datetime]): 结束时间 (不含)
+        user_uid (Optional[int]): 用户UID
+        limit (int): 返回记录数量限制，默认50，最大 HISTORY_MAX_PAGE_SIZE
+
+    Return:
+        Resp[List[SearchResultResponse]]: 检索结果
+
+    Raises:
+        无
+    """
+    terms = q.split()
+    if not terms:
+        return Resp.success(data=[])
+    limit = _clamp_limit(limit)
+    sources = {"danmaku": (dm_model.Danmaku, "danmaku"), "sc": (dm_model.SuperChat, "super_chat")}
+
+    results = []
+    async with AsyncReadSessionLocal() as db:
+        for t in dict.fromkeys(types):
+            model, msg_type = sources[t]
+            rows = await crud_danmaku.search_messages(
+                db, model, room_id, terms, limit,
+                since=timezone.to_local(since) if since else None,
+                until=timezone.to_local(until) if until else None,
+                uid=user_uid,
+            )
+            results += [
+                {
+                    "id": r.id,
+                    "msg_type": msg_type,
+                    "user_name": r.user_name,
+                    "uid": _uid_str(r.uid),
+                    "text": r.text,
+                    "snippet": r.snippet,
+                    "rank": r.rank,
+                    "timestamp": timezone.to_timestamp(r.create_time) if r.create_time else 0.0,
+                } for r in rows
+            ]
+
+    # 全文索引结果按相关度排序，逐条匹配的结果 (rank 均为 0) 按时间倒序
+    results.sort(key=lambda r: (r["rank"], -r["timestamp"]))
+    return Resp.success(data=results[:limit])
+
+@router.get("/history/export")
+async def export_history(
+    room_id: int = Query(..., description="房间号"),
+    types: List[Literal["danmaku", "gift", "sc"]] = Query(["danmaku", "gift", "sc"], description="导出的记录类型"),
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="导出格式"),
+    since: Optional[datetime] = Query(None, description="起始时间 (含)，ISO 时间或时间戳"),
+    until: Optional[datetime] = Query(None, description="结束时间 (不含)，ISO 时间或时间戳"),
+    gzip: bool = Query(False, description="是否 gzip 压缩"),
+):
+    """
+    导出房间历史记录
+
+    Description:
+        以流式响应导出指定房间、时间范围内的弹幕、礼物、SC 记录，按类型依次输出。
+        数据通过服务端游标分批读取并即时编码，导出量再大内存占用也保持恒定。
+
+    Args:
+        room_id (int): 房间号
+        types (List[str]): 导出的记录类型 danmaku / gift / sc，默认全部
+        fmt (str): 导出格式 ndjson 或 csv
+        since (Optional[datetime]): 起始时间 (含)
+        until (Optional[datetime]): 结束时间 (不含)
+        gzip (bool): 是否 gzip 压缩
+
+    Return:
+        StreamingResponse: 导出文件流
+
+    Raises:
+        无
+    """
+    filename = f"room_{room_id}_history.{fmt}"
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/csv; charset=utf-8"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    content = export_service.iter_export(
+        room_id,
+        list(dict.fromkeys(types)),
+        fmt=fmt,
+        since=timezone.to_local(since) if since else None,
+        until=timezone.to_local(until) if until else None,
+        gzip=gzip,
+    )
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/archive", response_model=Resp[Dict[str, List[str]]])
+async def list_archives():
+    """
+    列出历史归档
+
+    Description:
+        超过保留天数的记录会按天归档为 gzip 压缩的 NDJSON 文件并从数据库删除，这里列出已有的归档日期。
+
+    Args:
+        无
+
+    Return:
+        Resp[Dict[str, List[str]]]: 表名 (danmu / gift / superchat) -> 归档日期列表
+
+    Raises:
+        无
+    """
+    return Resp.success(data=retention_service.list_archives())
+
+@router.get("/archive/{table}/{day}")
+async def download_archive(table: Literal["danmu", "gift", "superchat"], day: date):
+    """
+    下载某天的历史归档
+
+    Description:
+        返回该表该日期的归档文件 (gzip 压缩的 NDJSON，每行一条完整记录)。
+
+    Args:
+        table (str): 表名 danmu / gift / superchat
+        day (date): 归档日期，格式 YYYY-MM-DD
+
+    Return:
+        FileResponse: 归档文件
+
+    Raises:
+        NotFoundException: 归档不存在
+    """
+    path = retention_service.archive_path(table, day)
+    if not path.exists():
+        raise NotFoundException(message=f"{table} 在 {day} 没有归档")
+    return FileResponse(path, media_type="application/gzip", filename=path.name)
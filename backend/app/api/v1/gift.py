@@ -1,7 +1,6 @@
 from fastapi import APIRouter
 from backend.app.services.gift_service import gift_service
 from backend.app.schemas import danmaku as dm_schema
-from backend.app.crud.danmaku import crud_danmaku
 from backend.database.db import AsyncSessionLocal
 from typing import List
 from backend.common.resp import Resp
@@ -41,7 +40,7 @@ async def get_gift_list():
     获取所有礼物列表
 
     Description:
-        获取数据库中存储的所有礼物信息（用于映射表配置等）。
+        获取所有礼物信息（用于映射表配置等），直接读取礼物服务的内存索引。
         若数据库为空，会自动插入默认模拟数据。
 
     Args:
@@ -53,11 +52,10 @@ async def get_gift_list():
     Raises:
         无
     """
-    async with AsyncSessionLocal() as db:
-        gifts = await crud_danmaku.get_all_gift_info_room(db)
-        
-        # 如果数据库为空，插入一些模拟数据以便测试
-        if not gifts:
+    gifts = await gift_service.get_all()
+    if not gifts:
+        async with AsyncSessionLocal() as db:
+            # 如果数据库为空，插入一些模拟数据以便测试
             mock_gifts = [
                 dm_model.GiftInfoRoom(name="情书", price=5.2, coin_type="gold", img="https://s1.hdslb.com/bfs/live/8e9f5e7c8e5c8e5c8e5c8e5c8e5c8e5c.png"), # 假图片
                 dm_model.GiftInfoRoom(name="牛哇牛哇", price=6.6, coin_type="gold", img="https://s1.hdslb.com/bfs/live/8e9f5e7c8e5c8e5c8e5c8e5c8e5c8e5c.png"),
@@ -66,10 +64,9 @@ async def get_gift_list():
             ]
             db.add_all(mock_gifts)
             await db.commit()
-            
-            # 重新获取
-            gifts = await crud_danmaku.get_all_gift_info_room(db)
 
-        # 手动转换为 Pydantic 模型，确保序列化正确
-        data = [dm_schema.GiftInfoRoomResponse.model_validate(g) for g in gifts]
-        return Resp.success(data=data)
\ No newline at end of file
+        # 重新加载内存索引
+        await gift_service.load()
+        gifts = await gift_service.get_all()
+
+    return Resp.success(data=gifts)
\ No newline at end of file
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
-from typing import Optional
+from typing import List, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, BackgroundTasks, Query
 from backend.app.services.blive_service import blive_service
-from backend.app.schemas.room import ListenRequest, StartListenResponse, StopListenResponse
+from backend.app.services.room_info_service import room_info_service
+from backend.app.schemas.room import ListenRequest, StartListenResponse, StopListenResponse, RoomInfoBatchResponse
+from backend.common.exception.custom_exception import BadRequestException
+from backend.common.resp import Resp
+from backend.core.conf import settings
 
 router = APIRouter()
 
@@ -12,7 +16,12 @@ router = APIRouter()
 async def websocket_listen_endpoint(
     websocket: WebSocket, 
     room_id: int, 
-    user_name: Optional[str] = Query(None, description="用户名称，用于查找数据库中的 Cookie")
+    user_name: Optional[str] = Query(None, description="用户名称，用于查找数据库中的 Cookie"),
+    history: int = Query(0, ge=0, description="连接后回放的每类最近事件数量 (来自内存缓冲区)"),
+    last_seq: Optional[int] = Query(None, ge=0, description="重连时最后收到的事件 seq，补发之后的事件"),
+    stats: bool = Query(False, description="是否订阅实时统计推送"),
+    encoding: Optional[str] = Query(None, description="推送编码候选 (逗号分隔，按优先级)：json / compact / msgpack / cbor"),
+    epoch: Optional[int] = Query(None, description="重连时最后收到的事件 epoch，与 last_seq 一起传回"),
 ):
     """
     WebSocket 监听端点
@@ -24,6 +33,14 @@ async def websocket_listen_endpoint(
         websocket (WebSocket): WebSocket 连接对象
         room_id (int): 房间号
         user_name (Optional[str]): 关联用户名 (已废弃)
+        history (int): 连接后回放的每类最近事件数量，0 表示不回放
+        last_seq (Optional[int]): 重连时最后收到的事件 seq。缺失事件在重放窗口内时直接补发，
+            否则先推送 {"msg_type": "resync"}，客户端应重新拉取历史
+        stats (bool): 是否订阅定期推送的实时统计 (msg_type=stats)
+        encoding (Optional[str]): 推送编码。json (默认) 为原有格式；compact 为紧凑信封 (整数枚举、缩写字段) 的 JSON；
+            msgpack / cbor 为紧凑信封的二进制帧，服务端未安装对应库时退回 json
+        epoch (Optional[int]): 重连时最后收到的事件 epoch。seq 在服务重启后会重新计数，
+            epoch 与当前进程不一致 (或缺失) 时不补发，直接推送 resync
 
     Return:
         None
@@ -31,7 +48,7 @@ async def websocket_listen_endpoint(
     Raises:
         WebSocketDisconnect: 连接断开时处理
     """
-    await blive_service.connect(websocket, room_id, user_name)
+    await blive_service.connect(websocket, room_id, user_name, history, last_seq, stats, encoding, epoch)
     try:
         while True:
             # 保持连接，接收客户端消息（如果有的话，比如心跳）
@@ -95,3 +112,29 @@ async def stop_listen():
         return {"message": f"停止监听房间 {current_room_id}"}
     else:
         return {"message": "当前没有正在监听的房间"}
+
+@router.get("/rooms", response_model=Resp[RoomInfoBatchResponse])
+async def get_rooms_info(room_ids: List[int] = Query(..., description="房间号 (可以是短号)，可重复传多个")):
+    """
+    批量获取直播间信息
+
+    Description:
+        解析短号并获取标题、主播名称和直播状态。结果有缓存，缓存过期但已知主播的房间合并为一次批量请求，
+        其余房间并发请求。
+
+    Args:
+        room_ids (List[int]): 房间号列表
+
+    Return:
+        Resp[RoomInfoBatchResponse]: 房间信息和获取失败的房间号
+
+    Raises:
+        BadRequestException: 房间数量超过 ROOM_INFO_BATCH_MAX
+    """
+    if len(room_ids) > settings.ROOM_INFO_BATCH_MAX:
+        raise BadRequestException(message=f"一次最多查询 {settings.ROOM_INFO_BATCH_MAX} 个房间")
+    infos = await room_info_service.get_room_infos(room_ids)
+    return Resp.success(data={
+        "rooms": {room_id: info for room_id, info in infos.items() if info is not None},
+        "failed": [room_id for room_id, info in infos.items() if info is None],
+    })
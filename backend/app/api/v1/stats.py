@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from backend.app.schemas.stats import RoomStatsResponse
+from backend.app.services.stats_service import stats_service
+from backend.common.resp import Resp
+
+router = APIRouter()
+
+@router.get("/{room_id}", response_model=Resp[RoomStatsResponse])
+async def get_room_stats(room_id: int):
+    """
+    获取直播间实时统计
+
+    Description:
+        返回内存中增量维护的统计数据：消息速率、每分钟营收、打赏排行、上舰数量等，不查询数据库。
+        WebSocket 连接时带上 stats=true 可定期收到同样内容的 msg_type=stats 推送。
+
+    Args:
+        room_id (int): 房间号
+
+    Return:
+        Resp[RoomStatsResponse]: 统计数据
+
+    Raises:
+        无
+    """
+    return Resp.success(data=stats_service.snapshot(room_id))
+
+@router.delete("/{room_id}", response_model=Resp)
+async def reset_room_stats(room_id: int):
+    """
+    重置直播间统计
+
+    Description:
+        清空内存中的统计数据并删除持久化快照，通常在新一场直播开始前调用。
+
+    Args:
+        room_id (int): 房间号
+
+    Return:
+        Resp: 操作结果
+
+    Raises:
+        无
+    """
+    stats_service.reset(room_id)
+    return Resp.success(message=f"房间 {room_id} 统计已重置")
@@ -1,6 +1,10 @@
+from typing import List
 from fastapi import APIRouter
 from backend.app.schemas.config import AppConfig
 from backend.app.services.config_service import config_service
+from backend.app.services.blive_service import blive_service
+from backend.app.services.identity_service import identity_pool
+from backend.utils.task_supervisor import background_tasks
 from backend.common.resp import Resp
 
 router = APIRouter()
@@ -64,3 +68,63 @@ async def reset_system_config():
     """
     reset_config = config_service.reset_config()
     return Resp.success(data=reset_config)
+
+@router.get("/pipeline", response_model=Resp[dict])
+async def get_pipeline_metrics():
+    """
+    获取事件队列指标
+
+    Description:
+        返回推送 (broadcast) 与保存 (persist) 队列中 paid / gift / chat 各优先级通道的
+        提交数、完成数、丢弃数、当前积压以及排队延迟 (平均 / P95 / 最大，毫秒)，
+        dropped 为各队列因积压超过上限丢弃的任务总数。
+
+    Args:
+        无
+
+    Return:
+        Resp[dict]: 各队列、各通道的指标
+
+    Raises:
+        无
+    """
+    return Resp.success(data=blive_service.pipeline_metrics())
+
+@router.get("/tasks", response_model=Resp[dict])
+async def get_task_metrics():
+    """
+    获取后台任务状态
+
+    Description:
+        返回事件处理任务 (blive) 与常驻后台任务 (background) 的运行中/等待中数量，
+        以及完成、失败、取消、因积压被拒绝的累计次数和最近一次异常。
+
+    Args:
+        无
+
+    Return:
+        Resp[dict]: 各任务管理器的状态
+
+    Raises:
+        无
+    """
+    return Resp.success(data={"blive": blive_service.tasks.snapshot(), "background": background_tasks.snapshot()})
+
+@router.get("/identities", response_model=Resp[List[dict]])
+async def get_identity_pool():
+    """
+    获取账号池状态
+
+    Description:
+        返回账号池中每个账号分配的房间、最近一分钟的请求数、连续被风控次数和剩余冷却时间。
+
+    Args:
+        无
+
+    Return:
+        Resp[List[dict]]: 各账号的状态
+
+    Raises:
+        无
+    """
+    return Resp.success(data=identity_pool.snapshot())
@@ -1,9 +1,42 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import delete
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncResult
+from sqlalchemy import delete, select, tuple_, literal, literal_column, table, column, Row
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from backend.app.models import danmaku as dm_model
 from backend.app.schemas import danmaku as dm_schema
 
+# trigram 分词的最短检索长度，更短的词无法走全文索引
+FTS_MIN_TERM_LENGTH = 3
+
+
+def _fts_query(terms: Sequence[str]) -> str:
+    """把检索词转换为 FTS5 查询：每个词作为短语 (子串) 匹配，多个词之间为 AND"""
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_pattern(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
 class CRUDDanmaku:
+    # 历史分页查询只取响应需要的列，避免构造完整 ORM 对象
+    DANMAKU_PAGE_COLUMNS = (
+        dm_model.Danmaku.id, dm_model.Danmaku.user_name, dm_model.Danmaku.uid, dm_model.Danmaku.level,
+        dm_model.Danmaku.privilege_name, dm_model.Danmaku.identity, dm_model.Danmaku.face_img,
+        dm_model.Danmaku.dm_text, dm_model.Danmaku.create_time,
+    )
+    GIFT_PAGE_COLUMNS = (
+        dm_model.Gift.id, dm_model.Gift.user_name, dm_model.Gift.uid, dm_model.Gift.level,
+        dm_model.Gift.privilege_name, dm_model.Gift.gift_name, dm_model.Gift.gift_num,
+        dm_model.Gift.price, dm_model.Gift.create_time,
+    )
+    SUPER_CHAT_PAGE_COLUMNS = (
+        dm_model.SuperChat.id, dm_model.SuperChat.user_name, dm_model.SuperChat.uid, dm_model.SuperChat.level,
+        dm_model.SuperChat.privilege_name, dm_model.SuperChat.identity, dm_model.SuperChat.sc_text,
+        dm_model.SuperChat.price, dm_model.SuperChat.create_time,
+    )
+
     async def create_danmaku(self, db: AsyncSession, danmaku: dm_schema.DanmakuCreate) -> dm_model.Danmaku:
         db_danmaku = dm_model.Danmaku(**danmaku.model_dump())
         db.add(db_danmaku)
@@ -22,35 +55,213 @@ class CRUDDanmaku:
         await db.flush()
         return db_sc
 
-    async def replace_gift_info_room(self, db: AsyncSession, gifts: list[dm_schema.GiftInfoRoomCreate]) -> list[dm_model.GiftInfoRoom]:
-        await db.execute(delete(dm_model.GiftInfoRoom))
-        db_gifts = [dm_model.GiftInfoRoom(**gift.model_dump()) for gift in gifts]
-        db.add_all(db_gifts)
-        await db.flush()
-        return db_gifts
+    async def upsert_gift_info_room(self, db: AsyncSession, gifts: list[dm_schema.GiftInfoRoomCreate]) -> list[dm_model.GiftInfoRoom]:
+        """按名称插入或更新礼物信息，返回本次涉及的记录"""
+        if not gifts:
+            return []
+        stmt = sqlite_insert(dm_model.GiftInfoRoom).values([gift.model_dump() for gift in gifts])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[dm_model.GiftInfoRoom.name],
+            set_={
+                "gift_id": stmt.excluded.gift_id,
+                "price": stmt.excluded.price,
+                "coin_type": stmt.excluded.coin_type,
+                "img": stmt.excluded.img,
+            },
+        )
+        await db.execute(stmt)
+        result = await db.execute(
+            select(dm_model.GiftInfoRoom).where(dm_model.GiftInfoRoom.name.in_([gift.name for gift in gifts]))
+        )
+        return result.scalars().all()
 
     async def get_all_gift_info_room(self, db: AsyncSession) -> list[dm_model.GiftInfoRoom]:
-        from sqlalchemy import select
         result = await db.execute(select(dm_model.GiftInfoRoom))
         return result.scalars().all()
 
-    async def get_recent_danmaku(self, db: AsyncSession, room_id: str, limit: int = 100) -> list[dm_model.Danmaku]:
-        from sqlalchemy import select
-        # Use simple string ordering if created_at is not available, or assume id is auto-incrementing
-        stmt = select(dm_model.Danmaku).where(dm_model.Danmaku.room_id == room_id).order_by(dm_model.Danmaku.id.desc()).limit(limit)
+    async def _get_recent(self, db: AsyncSession, model, room_id: int, limit: int, uid: Optional[int] = None) -> list:
+        # 命中 (room_id, create_time) 复合索引；按用户过滤时命中 (room_id, uid) 索引
+        stmt = select(model).where(model.room_id == room_id)
+        if uid is not None:
+            stmt = stmt.where(model.uid == uid)
+        stmt = stmt.order_by(model.create_time.desc(), model.id.desc()).limit(limit)
         result = await db.execute(stmt)
         return result.scalars().all()[::-1] # Reverse to chronological order
 
-    async def get_recent_gifts(self, db: AsyncSession, room_id: str, limit: int = 100) -> list[dm_model.Gift]:
-        from sqlalchemy import select
-        stmt = select(dm_model.Gift).where(dm_model.Gift.room_id == room_id).order_by(dm_model.Gift.id.desc()).limit(limit)
-        result = await db.execute(stmt)
-        return result.scalars().all()[::-1]
+    async def get_recent_danmaku(self, db: AsyncSession, room_id: int, limit: int = 100, uid: Optional[int] = None) -> list[dm_model.Danmaku]:
+        return await self._get_recent(db, dm_model.Danmaku, room_id, limit, uid)
+
+    async def get_recent_gifts(self, db: AsyncSession, room_id: int, limit: int = 100, uid: Optional[int] = None) -> list[dm_model.Gift]:
+        return await self._get_recent(db, dm_model.Gift, room_id, limit, uid)
+
+    async def get_recent_super_chats(self, db: AsyncSession, room_id: int, limit: int = 100, uid: Optional[int] = None) -> list[dm_model.SuperChat]:
+        return await self._get_recent(db, dm_model.SuperChat, room_id, limit, uid)
+
+    async def _keyset_clause(self, db: AsyncSession, model, cursor_id: int, before: bool):
+        """
+        构造 (create_time, id) 上的游标条件，可沿 (room_id, create_time) 索引做范围扫描
+        """
+        cursor_time = (await db.execute(select(model.create_time).where(model.id == cursor_id))).scalar()
+        if cursor_time is None:
+            # 游标记录已不存在 (例如被清理)，退化为按 id 比较
+            return model.id < cursor_id if before else model.id > cursor_id
+        key = tuple_(model.create_time, model.id)
+        cursor = tuple_(literal(cursor_time, model.create_time.type), literal(cursor_id))
+        return key < cursor if before else key > cursor
+
+    async def _get_page(
+        self,
+        db: AsyncSession,
+        model,
+        columns: Sequence,
+        room_id: int,
+        limit: int,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        uid: Optional[int] = None,
+    ) -> list[Row]:
+        stmt = select(*columns).where(model.room_id == room_id)
+        if uid is not None:
+            stmt = stmt.where(model.uid == uid)
+        if since is not None:
+            stmt = stmt.where(model.create_time >= since)
+        if until is not None:
+            stmt = stmt.where(model.create_time < until)
+        if before_id is not None:
+            stmt = stmt.where(await self._keyset_clause(db, model, before_id, before=True))
+        if after_id is not None:
+            stmt = stmt.where(await self._keyset_clause(db, model, after_id, before=False))
+
+        # 只有 after_id 时向后翻页 (取紧接游标之后的记录)，其余情况取最近的记录
+        if after_id is not None and before_id is None:
+            stmt = stmt.order_by(model.create_time.asc(), model.id.asc()).limit(limit)
+            return (await db.execute(stmt)).all()
+        stmt = stmt.order_by(model.create_time.desc(), model.id.desc()).limit(limit)
+        return (await db.execute(stmt)).all()[::-1]
 
-    async def get_recent_super_chats(self, db: AsyncSession, room_id: str, limit: int = 100) -> list[dm_model.SuperChat]:
-        from sqlalchemy import select
-        stmt = select(dm_model.SuperChat).where(dm_model.SuperChat.room_id == room_id).order_by(dm_model.SuperChat.id.desc()).limit(limit)
+    async def get_danmaku_page(self, db: AsyncSession, room_id: int, limit: int, **filters) -> list[Row]:
+        """
+        按游标/时间范围分页查询弹幕，返回按时间正序排列的行元组
+
+        Args:
+            db (AsyncSession): 数据库会话
+            room_id (int): 房间号
+            limit (int): 每页数量
+            **filters: before_id / after_id / since / until / uid
+
+        Returns:
+            list[Row]: 包含 DANMAKU_PAGE_COLUMNS 各列的行
+        """
+        return await self._get_page(db, dm_model.Danmaku, self.DANMAKU_PAGE_COLUMNS, room_id, limit, **filters)
+
+    async def get_gift_page(self, db: AsyncSession, room_id: int, limit: int, **filters) -> list[Row]:
+        """按游标/时间范围分页查询礼物，参数同 get_danmaku_page"""
+        return await self._get_page(db, dm_model.Gift, self.GIFT_PAGE_COLUMNS, room_id, limit, **filters)
+
+    async def get_super_chat_page(self, db: AsyncSession, room_id: int, limit: int, **filters) -> list[Row]:
+        """按游标/时间范围分页查询SC，参数同 get_danmaku_page"""
+        return await self._get_page(db, dm_model.SuperChat, self.SUPER_CHAT_PAGE_COLUMNS, room_id, limit, **filters)
+
+    async def stream_events(
+        self,
+        db: AsyncSession,
+        model,
+        columns: Sequence,
+        room_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncResult:
+        """
+        以服务端游标流式读取房间记录 (按时间正序)，内存占用只与 batch_size 相关
+
+        Returns:
+            AsyncResult: 可用 partitions() 分批迭代的结果
+        """
+        stmt = select(*columns).where(model.room_id == room_id)
+        if since is not None:
+            stmt = stmt.where(model.create_time >= since)
+        if until is not None:
+            stmt = stmt.where(model.create_time < until)
+        stmt = stmt.order_by(model.create_time.asc(), model.id.asc())
+        return await db.stream(stmt.execution_options(yield_per=batch_size))
+
+    async def search_messages(
+        self,
+        db: AsyncSession,
+        model,
+        room_id: int,
+        terms: Sequence[str],
+        limit: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        uid: Optional[int] = None,
+    ) -> list[Row]:
+        """
+        在弹幕或SC正文中检索同时包含所有检索词的记录
+
+        检索词均不短于 FTS_MIN_TERM_LENGTH 时走 FTS5 索引并按 bm25 相关度排序，
+        否则退化为在房间/时间范围内 LIKE 匹配并按时间倒序排列
+
+        Args:
+            db (AsyncSession): 数据库会话
+            model: dm_model.Danmaku 或 dm_model.SuperChat
+            room_id (int): 房间号
+            terms (Sequence[str]): 检索词
+            limit (int): 最多返回数量
+            since / until / uid: 时间范围与用户过滤
+
+        Returns:
+            list[Row]: (id, user_name, uid, text, snippet, rank, create_time)，LIKE 匹配时 rank 为 0
+        """
+        text_column = model.dm_text if model is dm_model.Danmaku else model.sc_text
+        columns = (model.id, model.user_name, model.uid, text_column.label("text"))
+
+        if all(len(term) >= FTS_MIN_TERM_LENGTH for term in terms):
+            fts_name = f"{model.__tablename__}_fts"
+            fts = table(fts_name, column("rowid"))
+            stmt = (
+                select(
+                    *columns,
+                    literal_column(f"snippet({fts_name}, 0, '【', '】', '…', 16)").label("snippet"),
+                    literal_column(f"bm25({fts_name})").label("rank"),
+                    model.create_time,
+                )
+                .select_from(fts)
+                .join(model, model.id == fts.c.rowid)
+                .where(literal_column(fts_name).op("MATCH")(_fts_query(terms)))
+            )
+            order_by = (literal_column("rank"), model.id.desc())
+        else:
+            stmt = select(*columns, text_column.label("snippet"), literal(0.0).label("rank"), model.create_time)
+            for term in terms:
+                stmt = stmt.where(text_column.like(_like_pattern(term), escape="\\"))
+            order_by = (model.create_time.desc(), model.id.desc())
+
+        stmt = stmt.where(model.room_id == room_id)
+        if uid is not None:
+            stmt = stmt.where(model.uid == uid)
+        if since is not None:
+            stmt = stmt.where(model.create_time >= since)
+        if until is not None:
+            stmt = stmt.where(model.create_time < until)
+        stmt = stmt.order_by(*order_by).limit(limit)
+        return (await db.execute(stmt)).all()
+
+    async def get_expired_rows(self, db: AsyncSession, model, cutoff: datetime, limit: int) -> list[dict]:
+        """
+        按 id 顺序取早于 cutoff 的整行记录 (用于归档)
+
+        记录按时间顺序写入，旧记录集中在 rowid 前部，按 id 扫描很快就能取满一批
+        """
+        stmt = select(model.__table__).where(model.create_time < cutoff).order_by(model.id.asc()).limit(limit)
         result = await db.execute(stmt)
-        return result.scalars().all()[::-1]
+        return [dict(row) for row in result.mappings()]
+
+    async def delete_by_ids(self, db: AsyncSession, model, ids: Sequence[int]) -> int:
+        result = await db.execute(delete(model).where(model.id.in_(ids)))
+        return result.rowcount
 
 crud_danmaku = CRUDDanmaku()
@@ -0,0 +1,336 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.app.models import danmaku as dm_model
+from backend.app.models import rollup as rollup_model
+from backend.app.schemas import danmaku as dm_schema
+
+# 汇总粒度 -> SQLite strftime 时间桶格式
+GRANULARITY_FORMATS = {
+    "minute": "%Y-%m-%d %H:%M:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+}
+
+_BUCKET_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _bucket(model, granularity: str):
+    return func.strftime(GRANULARITY_FORMATS[granularity], model.create_time)
+
+
+def _parse_bucket(value: str) -> datetime:
+    return datetime.strptime(value, _BUCKET_FORMAT)
+
+
+def _floor_bucket(value: datetime, granularity: str) -> datetime:
+    """把更细粒度的时间桶对齐到 granularity 的时间桶"""
+    return _parse_bucket(value.strftime(GRANULARITY_FORMATS[granularity]))
+
+
+def _in_range(model, start: datetime, end: datetime):
+    return (model.create_time >= start) & (model.create_time < end)
+
+
+# 可由细粒度时间桶直接累加的汇总列
+ROLLUP_SUM_COLUMNS = (
+    "danmaku_count", "gift_count", "super_chat_count", "gift_revenue", "guard_revenue", "super_chat_revenue",
+)
+
+
+def _empty_rollup(room_id: int, granularity: str, bucket: datetime) -> dict:
+    return {
+        "room_id": room_id, "granularity": granularity, "bucket": bucket,
+        "danmaku_count": 0, "gift_count": 0, "super_chat_count": 0, "unique_senders": 0,
+        "gift_revenue": 0.0, "guard_revenue": 0.0, "super_chat_revenue": 0.0,
+    }
+
+
+class CRUDRollup:
+    async def get_watermark(self, db: AsyncSession, name: str) -> Optional[datetime]:
+        result = await db.execute(select(rollup_model.RollupState.watermark).where(rollup_model.RollupState.name == name))
+        return result.scalar()
+
+    async def set_watermark(self, db: AsyncSession, name: str, watermark: datetime):
+        state = await db.get(rollup_model.RollupState, name)
+        if state is None:
+            db.add(rollup_model.RollupState(name=name, watermark=watermark))
+        else:
+            state.watermark = watermark
+        await db.flush()
+
+    async def get_earliest_event_time(self, db: AsyncSession) -> Optional[datetime]:
+        """三张事件表中最早的记录时间，用于首次汇总时回填历史数据"""
+        times = []
+        for model in (dm_model.Danmaku, dm_model.Gift, dm_model.SuperChat):
+            value = (await db.execute(select(func.min(model.create_time)))).scalar()
+            if value is not None:
+                times.append(value)
+        return min(times) if times else None
+
+    async def aggregate(self, db: AsyncSession, granularity: str, start: datetime, end: datetime) -> tuple[list[dict], list[dict]]:
+        """
+        从原始事件表计算 [start, end) 内各房间、各时间桶的汇总
+
+        Args:
+            db (AsyncSession): 数据库会话 (只读即可)
+            granularity (str): minute / hour / day
+            start (datetime): 起始时间 (含)，应与粒度对齐
+            end (datetime): 结束时间 (不含)
+
+        Returns:
+            tuple[list[dict], list[dict]]: (room_rollup 行, room_gift_rollup 行)
+        """
+        rollups: dict[tuple[int, datetime], dict] = {}
+
+        def row_for(room_id: int, bucket: str) -> dict:
+            key = (room_id, _parse_bucket(bucket))
+            if key not in rollups:
+                rollups[key] = _empty_rollup(room_id, granularity, key[1])
+            return rollups[key]
+
+        # 以下查询按时间范围跨房间扫描，命中 create_time 索引
+        danmaku = dm_model.Danmaku
+        stmt = (
+            select(danmaku.room_id, _bucket(danmaku, granularity).label("bucket"), func.count())
+            .where(_in_range(danmaku, start, end)).group_by(danmaku.room_id, "bucket")
+        )
+        for room_id, bucket, count in await db.execute(stmt):
+            row_for(room_id, bucket)["danmaku_count"] = count
+
+        sc = dm_model.SuperChat
+        stmt = (
+            select(sc.room_id, _bucket(sc, granularity).label("bucket"), func.count(), func.coalesce(func.sum(sc.price), 0.0))
+            .where(_in_range(sc, start, end)).group_by(sc.room_id, "bucket")
+        )
+        for room_id, bucket, count, revenue in await db.execute(stmt):
+            row = row_for(room_id, bucket)
+            row["super_chat_count"] = count
+            row["super_chat_revenue"] = revenue
+
+        gift = dm_model.Gift
+        stmt = (
+            select(
+                gift.room_id, _bucket(gift, granularity).label("bucket"), gift.gift_name,
+                func.count(), func.coalesce(func.sum(gift.gift_num), 0), func.coalesce(func.sum(gift.price), 0.0),
+            )
+            .where(_in_range(gift, start, end)).group_by(gift.room_id, "bucket", gift.gift_name)
+        )
+        gift_rows = []
+        for room_id, bucket, gift_name, count, num, revenue in await db.execute(stmt):
+            row = row_for(room_id, bucket)
+            row["gift_count"] += count
+            if gift_name in dm_schema.GUARD_GIFT_NAMES:
+                row["guard_revenue"] += revenue
+            else:
+                row["gift_revenue"] += revenue
+            gift_rows.append({
+                "room_id": room_id, "granularity": granularity, "bucket": row["bucket"],
+                "gift_name": gift_name, "gift_count": count, "gift_num": num, "revenue": revenue,
+            })
+
+        for key, count in (await self.get_unique_senders(db, granularity, start, end)).items():
+            row = rollups.get(key)
+            if row is None:
+                row = rollups[key] = _empty_rollup(key[0], granularity, key[1])
+            row["unique_senders"] = count
+
+        return list(rollups.values()), gift_rows
+
+    async def get_unique_senders(
+        self, db: AsyncSession, granularity: str, start: datetime, end: datetime
+    ) -> dict[tuple[int, datetime], int]:
+        """
+        计算 [start, end) 内各房间、各时间桶的独立发送者数
+
+        独立发送者需要在三张表合并后去重，不能由更细粒度的桶累加得到，只能从原始事件计算
+
+        Returns:
+            dict[tuple[int, datetime], int]: (room_id, 时间桶) -> 独立发送者数
+        """
+        senders = union_all(*(
+            select(model.room_id, _bucket(model, granularity).label("bucket"), model.uid)
+            .where(_in_range(model, start, end), model.uid.is_not(None))
+            for model in (dm_model.Danmaku, dm_model.Gift, dm_model.SuperChat)
+        )).subquery()
+        stmt = (
+            select(senders.c.room_id, senders.c.bucket, func.count(senders.c.uid.distinct()))
+            .group_by(senders.c.room_id, senders.c.bucket)
+        )
+        return {(room_id, _parse_bucket(bucket)): count for room_id, bucket, count in await db.execute(stmt)}
+
+    async def get_minute_senders(self, db: AsyncSession, start: datetime, end: datetime) -> set[tuple[int, datetime, int]]:
+        """
+        [start, end) 内各房间、各分钟的发送者，用于增量更新小时/天时间桶的发送者集合
+
+        Returns:
+            set[tuple[int, datetime, int]]: (room_id, 分钟时间桶, uid)
+        """
+        senders = union_all(*(
+            select(model.room_id, _bucket(model, "minute").label("bucket"), model.uid)
+            .where(_in_range(model, start, end), model.uid.is_not(None))
+            for model in (dm_model.Danmaku, dm_model.Gift, dm_model.SuperChat)
+        )).subquery()
+        stmt = select(senders.c.room_id, senders.c.bucket, senders.c.uid).distinct()
+        return {(room_id, _parse_bucket(bucket), uid) for room_id, bucket, uid in await db.execute(stmt)}
+
+    async def derive(
+        self,
+        db: AsyncSession,
+        granularity: str,
+        start: datetime,
+        split: datetime,
+        end: datetime,
+        minute_rollups: list[dict],
+        minute_gifts: list[dict],
+        minute_senders: set[tuple[int, datetime, int]],
+    ) -> tuple[list[dict], list[dict], list[dict]]:
+        """
+        由分钟汇总累加出 [start, end) 内的小时/天汇总
+
+        计数与营收直接累加分钟汇总：[start, split) 读取已保存的分钟汇总，[split, end) 使用本批刚计算、尚未保存的
+        分钟汇总。独立发送者不能累加，由 room_rollup_sender 中保存的时间桶发送者集合并上本批新分钟的发送者得到，
+        不需要重扫整个小时/天的原始事件。
+
+        Args:
+            db (AsyncSession): 数据库会话 (只读即可)
+            granularity (str): hour / day
+            start (datetime): 起始时间 (含)，应与粒度对齐
+            split (datetime): 已保存的分钟汇总的截止时间
+            end (datetime): 结束时间 (不含)
+            minute_rollups (list[dict]): [split, end) 的分钟 room_rollup 行
+            minute_gifts (list[dict]): [split, end) 的分钟 room_gift_rollup 行
+            minute_senders (set): [split, end) 的 (room_id, 分钟时间桶, uid)，见 get_minute_senders
+
+        Returns:
+            tuple[list[dict], list[dict], list[dict]]: (room_rollup 行, room_gift_rollup 行, 需新增的 room_rollup_sender 行)
+        """
+        stored_rollups, stored_gifts = [], []
+        if start < split:
+            for model, rows in ((rollup_model.RoomRollup, stored_rollups), (rollup_model.RoomGiftRollup, stored_gifts)):
+                columns = [column for column in model.__table__.columns if column.name != "id"]
+                stmt = select(*columns).where(
+                    model.granularity == "minute", model.bucket >= start, model.bucket < split
+                )
+                rows += [dict(row._mapping) for row in await db.execute(stmt)]
+
+        rollups: dict[tuple[int, datetime], dict] = {}
+        for minute in (*stored_rollups, *minute_rollups):
+            key = (minute["room_id"], _floor_bucket(minute["bucket"], granularity))
+            row = rollups.get(key)
+            if row is None:
+                row = rollups[key] = _empty_rollup(key[0], granularity, key[1])
+            for name in ROLLUP_SUM_COLUMNS:
+                row[name] += minute[name]
+
+        gifts: dict[tuple[int, datetime, str], dict] = {}
+        for minute in (*stored_gifts, *minute_gifts):
+            key = (minute["room_id"], _floor_bucket(minute["bucket"], granularity), minute["gift_name"])
+            row = gifts.get(key)
+            if row is None:
+                row = gifts[key] = {
+                    "room_id": key[0], "granularity": granularity, "bucket": key[1],
+                    "gift_name": key[2], "gift_count": 0, "gift_num": 0, "revenue": 0.0,
+                }
+            for name in ("gift_count", "gift_num", "revenue"):
+                row[name] += minute[name]
+
+        model = rollup_model.RoomRollupSender
+        stmt = select(model.room_id, model.bucket, model.uid).where(
+            model.granularity == granularity, model.bucket >= start
+        )
+        senders: dict[tuple[int, datetime], set] = {}
+        for room_id, bucket, uid in await db.execute(stmt):
+            senders.setdefault((room_id, _floor_bucket(bucket, granularity)), set()).add(uid)
+        sender_rows = []
+        for room_id, minute, uid in minute_senders:
+            key = (room_id, _floor_bucket(minute, granularity))
+            bucket_senders = senders.setdefault(key, set())
+            if uid not in bucket_senders:
+                bucket_senders.add(uid)
+                sender_rows.append({"granularity": granularity, "bucket": key[1], "room_id": room_id, "uid": uid})
+        for key, bucket_senders in senders.items():
+            if key in rollups:
+                rollups[key]["unique_senders"] = len(bucket_senders)
+
+        return list(rollups.values()), list(gifts.values()), sender_rows
+
+    async def replace_buckets(
+        self,
+        db: AsyncSession,
+        granularity: str,
+        start: datetime,
+        rollups: list[dict],
+        gifts: list[dict],
+        senders: Optional[list[dict]] = None,
+    ):
+        """
+        用重新计算的结果覆盖 start 及之后的时间桶 (重算是幂等的)，并保存时间桶新增的发送者
+        """
+        for model in (rollup_model.RoomRollup, rollup_model.RoomGiftRollup):
+            await db.execute(delete(model).where(model.granularity == granularity, model.bucket >= start))
+        if rollups:
+            await db.execute(insert(rollup_model.RoomRollup), rollups)
+        if gifts:
+            await db.execute(insert(rollup_model.RoomGiftRollup), gifts)
+        if senders:
+            await db.execute(sqlite_insert(rollup_model.RoomRollupSender).on_conflict_do_nothing(), senders)
+
+    async def prune_senders(self, db: AsyncSession, granularity: str, before: datetime):
+        """删除已结束的时间桶 (早于 before) 的发送者集合"""
+        model = rollup_model.RoomRollupSender
+        await db.execute(delete(model).where(model.granularity == granularity, model.bucket < before))
+
+    async def get_rollups(
+        self,
+        db: AsyncSession,
+        room_id: int,
+        granularity: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> list[rollup_model.RoomRollup]:
+        """
+        查询房间汇总数据，按时间桶正序返回；未指定 since 时返回最近 limit 个时间桶
+        """
+        model = rollup_model.RoomRollup
+        stmt = select(model).where(model.room_id == room_id, model.granularity == granularity)
+        if since is not None:
+            stmt = stmt.where(model.bucket >= since)
+        if until is not None:
+            stmt = stmt.where(model.bucket < until)
+        if since is not None:
+            stmt = stmt.order_by(model.bucket.asc()).limit(limit)
+            return (await db.execute(stmt)).scalars().all()
+        stmt = stmt.order_by(model.bucket.desc()).limit(limit)
+        return (await db.execute(stmt)).scalars().all()[::-1]
+
+    async def get_gift_totals(
+        self,
+        db: AsyncSession,
+        room_id: int,
+        granularity: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list:
+        """
+        按礼物名称合计时间范围内的礼物汇总，按营收降序返回 (gift_name, gift_count, gift_num, revenue)
+        """
+        model = rollup_model.RoomGiftRollup
+        stmt = (
+            select(
+                model.gift_name, func.sum(model.gift_count).label("gift_count"),
+                func.sum(model.gift_num).label("gift_num"), func.sum(model.revenue).label("revenue"),
+            )
+            .where(model.room_id == room_id, model.granularity == granularity)
+        )
+        if since is not None:
+            stmt = stmt.where(model.bucket >= since)
+        if until is not None:
+            stmt = stmt.where(model.bucket < until)
+        stmt = stmt.group_by(model.gift_name).order_by(func.sum(model.revenue).desc())
+        return (await db.execute(stmt)).all()
+
+crud_rollup = CRUDRollup()
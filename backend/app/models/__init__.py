@@ -1,3 +1,4 @@
 from .auth import Auth
 from .room import Room
 from .danmaku import Danmaku, Gift, SuperChat, GiftInfoRoom
+from .rollup import RoomRollup, RoomGiftRollup, RollupState
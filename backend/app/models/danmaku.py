@@ -1,6 +1,6 @@
 from backend.database.db import Base
 from backend.utils.timezone import timezone
-from sqlalchemy import String, Integer, Float, DateTime
+from sqlalchemy import String, Integer, BigInteger, Float, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 
@@ -9,11 +9,17 @@ class Danmaku(Base):
     弹幕数据模型
     """
     __tablename__ = "danmu"
+    __table_args__ = (
+        Index("ix_danmu_room_id_create_time", "room_id", "create_time"),
+        Index("ix_danmu_room_id_uid", "room_id", "uid"),
+        # 分时汇总跨房间按时间范围扫描
+        Index("ix_danmu_create_time", "create_time"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    room_id: Mapped[str] = mapped_column(String(64), index=True)
+    room_id: Mapped[int] = mapped_column(Integer)
     user_name: Mapped[str] = mapped_column(String(64))
-    uid: Mapped[str] = mapped_column(String(64), nullable=True)
+    uid: Mapped[int] = mapped_column(BigInteger, nullable=True)
     level: Mapped[int] = mapped_column(Integer, default=0)
     privilege_name: Mapped[str] = mapped_column(String(64), default="普通")
     identity: Mapped[str] = mapped_column(String(64), default="普通")
@@ -26,11 +32,17 @@ class Gift(Base):
     礼物/打赏数据模型
     """
     __tablename__ = "gift"
+    __table_args__ = (
+        Index("ix_gift_room_id_create_time", "room_id", "create_time"),
+        Index("ix_gift_room_id_uid", "room_id", "uid"),
+        # 分时汇总跨房间按时间范围扫描
+        Index("ix_gift_create_time", "create_time"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    room_id: Mapped[str] = mapped_column(String(64), index=True)
+    room_id: Mapped[int] = mapped_column(Integer)
     user_name: Mapped[str] = mapped_column(String(64))
-    uid: Mapped[str] = mapped_column(String(64), nullable=True)
+    uid: Mapped[int] = mapped_column(BigInteger, nullable=True)
     level: Mapped[int] = mapped_column(Integer, default=0)
     privilege_name: Mapped[str] = mapped_column(String(64), default="普通")
     identity: Mapped[str] = mapped_column(String(64), default="普通")
@@ -45,11 +57,17 @@ class SuperChat(Base):
     醒目留言模型
     """
     __tablename__ = "superchat"
-    
+    __table_args__ = (
+        Index("ix_superchat_room_id_create_time", "room_id", "create_time"),
+        Index("ix_superchat_room_id_uid", "room_id", "uid"),
+        # 分时汇总跨房间按时间范围扫描
+        Index("ix_superchat_create_time", "create_time"),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    room_id: Mapped[str] = mapped_column(String(64), index=True)
+    room_id: Mapped[int] = mapped_column(Integer)
     user_name: Mapped[str] = mapped_column(String(64))
-    uid: Mapped[str] = mapped_column(String(64), nullable=True)
+    uid: Mapped[int] = mapped_column(BigInteger, nullable=True)
     level: Mapped[int] = mapped_column(Integer, default=0)
     privilege_name: Mapped[str] = mapped_column(String(64), default="普通")
     identity: Mapped[str] = mapped_column(String(64), default="普通")
@@ -63,8 +81,14 @@ class GiftInfoRoom(Base):
     房间可赠送礼物信息模型
     """
     __tablename__ = "gift_info_room"
+    __table_args__ = (
+        # 礼物面板按名称去重，刷新时按名称 upsert
+        Index("ux_gift_info_room_name", "name", unique=True),
+        Index("ix_gift_info_room_gift_id", "gift_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    gift_id: Mapped[int] = mapped_column(Integer, nullable=True)
     name: Mapped[str] = mapped_column(String(64))
     price: Mapped[float] = mapped_column(Float)
     coin_type: Mapped[str] = mapped_column(String(64))
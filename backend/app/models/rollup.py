@@ -0,0 +1,68 @@
+from backend.database.db import Base
+from sqlalchemy import String, Integer, BigInteger, Float, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+
+class RoomRollup(Base):
+    """
+    直播间分时汇总模型 (分钟/小时/天)
+    """
+    __tablename__ = "room_rollup"
+    __table_args__ = (
+        UniqueConstraint("room_id", "granularity", "bucket", name="uq_room_rollup_bucket"),
+        # 汇总任务按 (粒度, 时间桶) 批量覆盖所有房间
+        Index("ix_room_rollup_granularity_bucket", "granularity", "bucket"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    room_id: Mapped[int] = mapped_column(Integer)
+    # minute / hour / day
+    granularity: Mapped[str] = mapped_column(String(16))
+    # 时间桶起点 (当前时区本地时间)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    danmaku_count: Mapped[int] = mapped_column(Integer, default=0)
+    gift_count: Mapped[int] = mapped_column(Integer, default=0)
+    super_chat_count: Mapped[int] = mapped_column(Integer, default=0)
+    unique_senders: Mapped[int] = mapped_column(Integer, default=0)
+    gift_revenue: Mapped[float] = mapped_column(Float, default=0.0)
+    guard_revenue: Mapped[float] = mapped_column(Float, default=0.0)
+    super_chat_revenue: Mapped[float] = mapped_column(Float, default=0.0)
+
+class RoomGiftRollup(Base):
+    """
+    直播间分时礼物汇总模型 (按礼物名称，上舰以舰队名称计)
+    """
+    __tablename__ = "room_gift_rollup"
+    __table_args__ = (
+        UniqueConstraint("room_id", "granularity", "bucket", "gift_name", name="uq_room_gift_rollup_bucket"),
+        Index("ix_room_gift_rollup_granularity_bucket", "granularity", "bucket"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    room_id: Mapped[int] = mapped_column(Integer)
+    granularity: Mapped[str] = mapped_column(String(16))
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    gift_name: Mapped[str] = mapped_column(String(255))
+    gift_count: Mapped[int] = mapped_column(Integer, default=0)
+    gift_num: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Float, default=0.0)
+
+class RoomRollupSender(Base):
+    """
+    未结束的小时/天时间桶内的发送者集合，用于增量计算独立发送者数 (时间桶结束后删除)
+    """
+    __tablename__ = "room_rollup_sender"
+
+    granularity: Mapped[str] = mapped_column(String(16), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    room_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    uid: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+class RollupState(Base):
+    """
+    汇总进度模型：记录已汇总到的时间点
+    """
+    __tablename__ = "rollup_state"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    watermark: Mapped[datetime] = mapped_column(DateTime(timezone=True))
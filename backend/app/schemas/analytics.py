@@ -0,0 +1,30 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class RollupResponse(BaseModel):
+    """
+    单个时间桶的汇总
+    """
+    timestamp: float = Field(..., description="时间桶起点时间戳")
+    danmaku_count: int = Field(default=0, description="弹幕数")
+    gift_count: int = Field(default=0, description="礼物条数 (含上舰)")
+    super_chat_count: int = Field(default=0, description="SC条数")
+    unique_senders: int = Field(default=0, description="独立发送者数")
+    gift_revenue: float = Field(default=0.0, description="礼物营收(元)")
+    guard_revenue: float = Field(default=0.0, description="上舰营收(元)")
+    super_chat_revenue: float = Field(default=0.0, description="SC营收(元)")
+
+class GiftRevenueItem(BaseModel):
+    gift_name: str = Field(..., description="礼物名称 (上舰为舰队名称)")
+    gift_count: int = Field(default=0, description="赠送次数")
+    gift_num: int = Field(default=0, description="赠送数量")
+    revenue: float = Field(default=0.0, description="营收(元)")
+
+class RevenueBreakdownResponse(BaseModel):
+    """
+    时间范围内的营收构成
+    """
+    total_revenue: float = Field(default=0.0, description="礼物与上舰合计营收(元)")
+    gifts: List[GiftRevenueItem] = Field(default_factory=list, description="按礼物统计")
+    guards: List[GiftRevenueItem] = Field(default_factory=list, description="按舰队等级统计")
@@ -1,6 +1,9 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 
+# 上舰记录在礼物表中以舰队名称作为礼物名保存
+GUARD_GIFT_NAMES = ("舰长", "提督", "总督")
+
 # ----------------- 响应模型 (推送到客户端的数据格式) -----------------
 
 class DanmakuResponse(BaseModel):
@@ -17,6 +20,10 @@ class DanmakuResponse(BaseModel):
     face_img: Optional[str] = Field(default=None, description="用户头像")
     msg_type: str = Field(default="danmaku", description="消息类型: danmaku, super_chat")
     timestamp: float = Field(default=0.0, description="创建时间戳")
+    id: Optional[int] = Field(default=None, description="记录ID，历史查询的分页游标")
+    seq: Optional[int] = Field(default=None, description="房间内推送序号，断线重连时作为 last_seq 传回")
+    epoch: Optional[int] = Field(default=None, description="服务进程的启动标识，断线重连时与 last_seq 一起传回")
+    repeat: int = Field(default=1, description="重复弹幕折叠后合并的条数")
 
 class GiftResponse(BaseModel):
     """
@@ -32,10 +39,31 @@ class GiftResponse(BaseModel):
     face_img: Optional[str] = Field(default=None, description="用户头像")
     gift_img: Optional[str] = Field(default=None, description="礼物图标")
     msg_type: str = Field(default="gift", description="消息类型: gift, guard")
+    combo_id: Optional[str] = Field(default=None, description="连击ID，同一连击的增量更新共用")
+    combo_num: int = Field(default=0, description="连击累计数量 (num/price 为本次增量)")
+    combo_price: float = Field(default=0.0, description="连击累计价值(元)")
+    combo_done: bool = Field(default=False, description="连击是否已结束")
+    timestamp: float = Field(default=0.0, description="创建时间戳")
+    id: Optional[int] = Field(default=None, description="记录ID，历史查询的分页游标")
+    seq: Optional[int] = Field(default=None, description="房间内推送序号，断线重连时作为 last_seq 传回")
+    epoch: Optional[int] = Field(default=None, description="服务进程的启动标识，断线重连时与 last_seq 一起传回")
+
+class SearchResultResponse(BaseModel):
+    """
+    全文检索结果
+    """
+    id: int = Field(..., description="记录ID")
+    msg_type: str = Field(..., description="消息类型: danmaku, super_chat")
+    user_name: str = Field(..., max_length=64, description="用户名称")
+    uid: Optional[str] = Field(default=None, description="用户UID")
+    text: str = Field(..., description="消息正文")
+    snippet: str = Field(..., description="命中片段，匹配部分以【】标出")
+    rank: float = Field(default=0.0, description="bm25 相关度，越小越相关")
     timestamp: float = Field(default=0.0, description="创建时间戳")
 
 class GiftInfoRoomResponse(BaseModel):
     id: int = Field(..., description="礼物ID")
+    gift_id: Optional[int] = Field(default=None, description="B站礼物ID")
     name: str = Field(..., max_length=64, description="礼物名称")
     price: float = Field(..., description="礼物价格")
     coin_type: str = Field(..., max_length=64, description="货币类型")
@@ -51,9 +79,9 @@ class FetchGiftInfoResponse(BaseModel):
 # ----------------- 数据库交互模型 (DTO) -----------------
 
 class DanmakuCreate(BaseModel):
-    room_id: str = Field(..., max_length=64, description="房间号")
+    room_id: int = Field(..., description="房间号")
     user_name: str = Field(..., max_length=64, description="用户名称")
-    uid: Optional[str] = Field(default=None, max_length=64, description="用户UID")
+    uid: Optional[int] = Field(default=None, description="用户UID")
     level: int = Field(default=0, description="粉丝牌等级")
     privilege_name: str = Field(default="普通", max_length=64, description="身份名称")
     identity: str = Field(default="普通", max_length=64, description="直播间身份")
@@ -61,9 +89,9 @@ class DanmakuCreate(BaseModel):
     dm_text: str = Field(..., max_length=255, description="弹幕内容")
 
 class SuperChatCreate(BaseModel):
-    room_id: str = Field(..., max_length=64, description="房间号")
+    room_id: int = Field(..., description="房间号")
     user_name: str = Field(..., max_length=64, description="用户名称")
-    uid: Optional[str] = Field(default=None, max_length=64, description="用户UID")
+    uid: Optional[int] = Field(default=None, description="用户UID")
     level: int = Field(default=0, description="粉丝牌等级")
     privilege_name: str = Field(default="普通", max_length=64, description="身份名称")
     identity: str = Field(default="普通", max_length=64, description="直播间身份")
@@ -72,9 +100,9 @@ class SuperChatCreate(BaseModel):
     price: float = Field(default=0.0, description="SC金额")
 
 class GiftCreate(BaseModel):
-    room_id: str = Field(..., max_length=64, description="房间号")
+    room_id: int = Field(..., description="房间号")
     user_name: str = Field(..., max_length=64, description="用户名称")
-    uid: Optional[str] = Field(default=None, max_length=64, description="用户UID")
+    uid: Optional[int] = Field(default=None, description="用户UID")
     level: int = Field(default=0, description="粉丝牌等级")
     privilege_name: str = Field(default="普通", max_length=64, description="身份名称")
     identity: str = Field(default="普通", max_length=64, description="直播间身份")
@@ -84,6 +112,7 @@ class GiftCreate(BaseModel):
     price: float = Field(default=0.0, description="礼物总价值")
 
 class GiftInfoRoomCreate(BaseModel):
+    gift_id: Optional[int] = Field(default=None, description="B站礼物ID")
     name: str = Field(..., max_length=64, description="礼物名称")
     price: float = Field(..., description="礼物价格")
     coin_type: str = Field(..., max_length=64, description="货币类型")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 class RoomCreate(BaseModel):
     room_id: str = Field(..., max_length=64, description="房间号")
@@ -22,3 +22,15 @@ class StartListenResponse(BaseModel):
 
 class StopListenResponse(BaseModel):
     message: str = Field(..., description="取消监听成功消息")
+
+class RoomInfoResponse(BaseModel):
+    room_id: int = Field(..., description="真实房间号")
+    short_id: int = Field(default=0, description="短号，没有时为 0")
+    uid: int = Field(..., description="主播UID")
+    title: Optional[str] = Field(default=None, description="直播间标题")
+    host_name: Optional[str] = Field(default=None, description="主播名称")
+    live_status: int = Field(default=0, description="直播状态：0 未开播、1 直播中、2 轮播中")
+
+class RoomInfoBatchResponse(BaseModel):
+    rooms: dict[int, RoomInfoResponse] = Field(default_factory=dict, description="请求的房间号 -> 房间信息")
+    failed: List[int] = Field(default_factory=list, description="获取失败的房间号")
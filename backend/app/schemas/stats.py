@@ -0,0 +1,28 @@
+from typing import Dict, List
+from pydantic import BaseModel, Field
+
+
+class TopGifter(BaseModel):
+    uid: str = Field(..., description="用户UID")
+    user_name: str = Field(default="", description="用户名称")
+    total: float = Field(..., description="累计打赏金额(元)")
+
+class RevenuePoint(BaseModel):
+    timestamp: int = Field(..., description="分钟起始时间戳")
+    revenue: float = Field(..., description="该分钟营收(元)")
+
+class RoomStatsResponse(BaseModel):
+    """
+    直播间实时统计
+    """
+    room_id: int = Field(..., description="房间号")
+    started_at: float = Field(..., description="统计开始时间戳")
+    danmaku_count: int = Field(default=0, description="弹幕数")
+    gift_count: int = Field(default=0, description="礼物条数")
+    super_chat_count: int = Field(default=0, description="SC条数")
+    total_revenue: float = Field(default=0.0, description="累计营收(元)")
+    guard_counts: Dict[str, int] = Field(default_factory=dict, description="上舰数量，键为舰队等级 1总督 2提督 3舰长")
+    msg_rate: float = Field(default=0.0, description="最近一分钟平均每秒消息数")
+    revenue_last_minute: float = Field(default=0.0, description="当前分钟营收(元)")
+    revenue_per_minute: List[RevenuePoint] = Field(default_factory=list, description="最近一小时每分钟营收")
+    top_gifters: List[TopGifter] = Field(default_factory=list, description="打赏排行")
@@ -3,6 +3,7 @@ import logging
 from typing import Optional
 from backend.app.schemas.auth import UserInfo
 from backend.app.crud.auth import crud_auth
+from backend.app.services.identity_service import identity_pool
 from backend.database.db import AsyncSessionLocal
 from backend.app.models.auth import Auth as Auth_model
 
@@ -32,6 +33,7 @@ class AuthService:
                 db_user = await crud_auth.create_user(db, user)
                 await db.commit()
                 await db.refresh(db_user)
+                identity_pool.invalidate()
                 logger.info(f"成功创建用户: {user.user_name}")
                 return db_user
             except Exception as e:
@@ -88,6 +90,7 @@ class AuthService:
                 success = await crud_auth.delete_user_by_name(db, user_name)
                 if success:
                     await db.commit()
+                    identity_pool.invalidate()
                     logger.info(f"成功删除用户: {user_name}")
                 else:
                     logger.warning(f"删除用户失败，用户不存在: {user_name}")
@@ -106,6 +109,7 @@ class AuthService:
                 success = await crud_auth.delete_user_by_uid(db, uid)
                 if success:
                     await db.commit()
+                    identity_pool.invalidate()
                     logger.info(f"成功删除用户UID: {uid}")
                 return success
             except Exception as e:
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 import asyncio
+import functools
+import heapq
+import time
 from loguru import logger
 import aiohttp
 import json
-from typing import Dict, Set, Optional, Union
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Optional, Union
 from fastapi import WebSocket
 
 # 使用本地 blivedm
@@ -18,6 +21,17 @@ from backend.database.db import AsyncSessionLocal
 from backend.core.conf import settings
 from backend.app.services.uidinfo_service import uidinfo_service
 from backend.app.services.config_service import config_service
+from backend.app.services.gift_service import gift_service
+from backend.app.services.room_info_service import room_info_service
+from backend.app.services.identity_service import Identity, identity_pool
+from backend.app.services.event_buffer import RoomEventBuffer, EVENT_CATEGORIES
+from backend.app.services import event_codec
+from backend.app.services.connection_sender import ConnectionSender
+from backend.app.services.stats_service import stats_service
+from backend.app.services.danmaku_collapser import DanmakuCollapser
+from backend.app.services.event_pipeline import PriorityPipeline
+from backend.app.services.gift_combo import GiftCombo, GiftComboAggregator
+from backend.utils.task_supervisor import TaskSupervisor
 
 # 身份映射
 PRIVILEGE_MAP = {
@@ -43,6 +57,14 @@ class BilibiliHandler(blivedm.BaseHandler):
         self.room_id = room_id
         self.service = service
         self.save_to_db = save_to_db
+        if settings.GIFT_COMBO_ENABLED:
+            service.gift_combos[room_id] = GiftComboAggregator(
+                settings.GIFT_COMBO_SETTLE,
+                settings.GIFT_COMBO_UPDATE_INTERVAL,
+                self._on_gift_combo_update,
+                self._on_gift_combo_settle,
+                self._on_gift_combo_done,
+            )
 
     def _get_guard_icon(self, guard_level: int) -> str:
         """根据配置获取舰队图标"""
@@ -85,46 +107,89 @@ class BilibiliHandler(blivedm.BaseHandler):
             msg_type="danmaku"
         )
         
+        collapser = self.service.collapser
+        if collapser is not None:
+            entry = collapser.add(self.room_id, message.msg, time.time())
+            if entry is not None:
+                self._on_duplicate_danmaku(entry, resp, message, privilege_name, identity)
+                return
+
         logger.info(f"[弹幕]房间:{self.room_id}，用户名:{message.uname}，弹幕: {message.msg}，舰队:{privilege_name}，身份:{identity}")
-        asyncio.create_task(self.service.broadcast(self.room_id, resp))
-        asyncio.create_task(self._save_danmaku(message, privilege_name, identity))
+        event = self.service.record_event(self.room_id, resp)
+        self.service.dispatch(
+            self.room_id, "chat", event, functools.partial(self._save_danmaku, message, privilege_name, identity, event)
+        )
+
+    def _on_duplicate_danmaku(self, entry, resp: dm_schema.DanmakuResponse, message, privilege_name, identity):
+        """
+        处理被折叠的重复弹幕：计入统计，按阈值决定是否保存，推送留给定时合并
+        """
+        logger.debug(f"[弹幕]房间:{self.room_id}，折叠重复弹幕: {message.msg} (窗口内第 {entry.count} 条)")
+        resp.timestamp = time.time()
+        stats_service.on_event(self.room_id, resp.model_dump())
+
+        entry.pending += 1
+        entry.latest = resp
+        if not entry.flush_scheduled:
+            entry.flush_scheduled = True
+            asyncio.get_running_loop().call_later(settings.DEDUP_FLUSH_INTERVAL, self._flush_duplicates, entry)
+
+        if self.service.collapser.should_persist(entry):
+            self.service.persist_pipeline.submit(
+                "chat", functools.partial(self._save_danmaku, message, privilege_name, identity)
+            )
+
+    def _flush_duplicates(self, entry):
+        """合并推送累计的重复弹幕"""
+        resp = self.service.collapser.take_pending(entry)
+        if resp is None:
+            return
+        event = self.service.record_event(self.room_id, resp, count_stats=False)
+        self.service.dispatch(self.room_id, "chat", event)
 
 
     def _on_super_chat(self, client: blivedm.BLiveClient, message: web_models.SuperChatMessage):
         """
         处理 Super Chat (醒目留言) 消息
         """
+        if message.face:
+            self._dispatch_super_chat(message)
+            return
+
         async def process_sc():
             # 尝试修复缺失的头像
-            if not message.face:
-                try:
-                    logger.info(f"[sc] 用户 {message.uname} ({message.uid}) 头像缺失，尝试获取...")
-                    user_info = await uidinfo_service.get_user_info_by_uid(str(message.uid))
-                    if user_info and user_info.get("face_img"):
-                        message.face = user_info["face_img"]
-                        logger.info(f"[sc] 获取头像成功: {message.face}")
-                except Exception as e:
-                    logger.warning(f"[sc] 获取用户头像失败: {e}")
-
-            privilege_name = PRIVILEGE_MAP.get(message.guard_level, "普通")
-            identity = "普通" # SuperChatMessage不包含admin信息，且privilege_type对应guard_level
-
-            resp = dm_schema.DanmakuResponse(
-                user_name=message.uname,
-                level=message.medal_level if message.medal_level else 0,
-                privilege_name=privilege_name,
-                dm_text=message.message,
-                identity=identity,
-                face_img=message.face,
-                price=message.price,
-                uid=str(message.uid),
-                msg_type="super_chat"
-            )
-            logger.info(f"[sc]房间:{self.room_id}，用户名:{message.uname}，sc: {message.message}，价值:{message.price}元")
-            await self.service.broadcast(self.room_id, resp)
-            await self._save_super_chat(message)
+            try:
+                logger.info(f"[sc] 用户 {message.uname} ({message.uid}) 头像缺失，尝试获取...")
+                user_info = await uidinfo_service.get_user_info_by_uid(str(message.uid))
+                if user_info and user_info.get("face_img"):
+                    message.face = user_info["face_img"]
+                    logger.info(f"[sc] 获取头像成功: {message.face}")
+            except Exception as e:
+                logger.warning(f"[sc] 获取用户头像失败: {e}")
+            self._dispatch_super_chat(message)
+
+        if self.service.tasks.spawn(process_sc(), name=f"super_chat-{self.room_id}") is None:
+            # 任务积压时不再补全头像，保证 SC 本身不丢失
+            self._dispatch_super_chat(message)
+
+    def _dispatch_super_chat(self, message: web_models.SuperChatMessage):
+        privilege_name = PRIVILEGE_MAP.get(message.guard_level, "普通")
+        identity = "普通" # SuperChatMessage不包含admin信息，且privilege_type对应guard_level
 
-        asyncio.create_task(process_sc())
+        resp = dm_schema.DanmakuResponse(
+            user_name=message.uname,
+            level=message.medal_level if message.medal_level else 0,
+            privilege_name=privilege_name,
+            dm_text=message.message,
+            identity=identity,
+            face_img=message.face,
+            price=message.price,
+            uid=str(message.uid),
+            msg_type="super_chat"
+        )
+        logger.info(f"[sc]房间:{self.room_id}，用户名:{message.uname}，sc: {message.message}，价值:{message.price}元")
+        event = self.service.record_event(self.room_id, resp)
+        self.service.dispatch(self.room_id, "paid", event, functools.partial(self._save_super_chat, message, event))
 
     def _on_gift(self, client: blivedm.BLiveClient, message: web_models.GiftMessage):
         """
@@ -155,6 +220,16 @@ class BilibiliHandler(blivedm.BaseHandler):
             elif message.price > 0:
                 price = float(message.price) * message.num / 1000.0
         
+        # 消息缺少价格或图标时从礼物信息索引补全 (只读内存，不访问数据库)
+        gift_img = message.gift_img_basic
+        fill_price = price <= 0 and message.coin_type != 'silver' and message.blind_gift is None
+        if not gift_img or fill_price:
+            info = gift_service.lookup(message.gift_id, message.gift_name)
+            if info is not None:
+                gift_img = gift_img or info.img
+                if fill_price and info.coin_type == 'gold':
+                    price = info.price * message.num
+
         resp = dm_schema.GiftResponse(
             user_name=message.uname,
             level=message.medal_level if message.medal_level else 0,
@@ -165,11 +240,78 @@ class BilibiliHandler(blivedm.BaseHandler):
             msg_type="gift",
             uid=str(message.uid),
             face_img=message.face,
-            gift_img=message.gift_img_basic
+            gift_img=gift_img
         )
         logger.info(f"[礼物]房间:{self.room_id}，用户名:{message.uname}，gift: {message.gift_name}，数量:{message.num}，单价:{price}元")
-        asyncio.create_task(self.service.broadcast(self.room_id, resp))
-        asyncio.create_task(self._save_gift(message, price))
+
+        # 盲盒礼物每条爆出的道具不同，不参与连击聚合
+        combos = self.service.gift_combos.get(self.room_id)
+        if combos is not None and message.blind_gift is None:
+            resp.timestamp = time.time()
+            stats_service.on_event(self.room_id, resp.model_dump())
+            combos.add(message, price, resp)
+            return
+
+        event = self.service.record_event(self.room_id, resp)
+        # 金瓜子礼物走付费通道，免费礼物优先级低于付费事件、高于弹幕
+        lane = "paid" if price > 0 else "gift"
+        self.service.dispatch(self.room_id, lane, event, functools.partial(self._save_gift, message, price, event))
+
+    def _on_gift_combo_update(self, combo: GiftCombo, final: bool):
+        """
+        推送连击的增量更新 (num/price 为距上次推送的增量，combo_num/combo_price 为累计值)
+        """
+        resp = combo.resp.model_copy(update={
+            "num": combo.num - combo.emitted_num,
+            "price": round(combo.price - combo.emitted_price, 3),
+            "combo_id": combo.combo_id,
+            "combo_num": combo.num,
+            "combo_price": combo.price,
+            "combo_done": final,
+            "timestamp": 0.0,
+        })
+        # 每条原始礼物已单独计入统计
+        combo.event = self.service.record_event(self.room_id, resp, count_stats=False)
+        self.service.dispatch(self.room_id, "paid" if combo.price > 0 else "gift", combo.event)
+
+    def _on_gift_combo_done(self, combo: GiftCombo):
+        """
+        连击结束且上次推送之后没有新礼物：只推送结束标记 (增量为 0)，不写入缓冲区、不分配 seq
+        """
+        if combo.event is not None:
+            # 缓冲区中的最后一条更新标记为已结束，之后的回放和历史查询看到的是最终状态
+            combo.event["combo_done"] = True
+        resp = combo.resp.model_copy(update={
+            "num": 0,
+            "price": 0.0,
+            "combo_id": combo.combo_id,
+            "combo_num": combo.num,
+            "combo_price": combo.price,
+            "combo_done": True,
+            "timestamp": time.time(),
+        })
+        self.service.dispatch(self.room_id, "paid" if combo.price > 0 else "gift", resp.model_dump())
+
+    def _on_gift_combo_settle(self, combo: GiftCombo):
+        """连击结束，保存一条合计记录，记录 ID 回填到最后一次推送的事件"""
+        logger.info(
+            f"[礼物]房间:{self.room_id}，用户名:{combo.message.uname}，连击结束: {combo.message.gift_name} "
+            f"x{combo.num} ({combo.count} 条消息)，总价:{combo.price}元"
+        )
+        self.service.persist_pipeline.submit(
+            "paid" if combo.price > 0 else "gift",
+            functools.partial(self._save_gift, combo.message, combo.price, combo.event, num=combo.num),
+        )
+
+    def _on_combo_send(self, client: blivedm.BLiveClient, message: web_models.ComboSendMessage):
+        """
+        处理连击汇总消息 (COMBO_SEND)
+
+        连击中的每个礼物都会另外收到 SEND_GIFT，由连击聚合统一处理，这里只记录日志
+        """
+        logger.debug(
+            f"[礼物]房间:{self.room_id}，用户名:{message.uname}，连击: {message.gift_name} x{message.total_num}"
+        )
 
     def _on_buy_guard(self, client: blivedm.BLiveClient, message: web_models.GuardBuyMessage):
         """
@@ -197,8 +339,8 @@ class BilibiliHandler(blivedm.BaseHandler):
             gift_img=gift_img
         )
         logger.info(f"[舰队]房间:{self.room_id}，用户名:{message.username}，舰队: {guard_name}，数量:{message.num}，总价:{total_price}元")
-        asyncio.create_task(self.service.broadcast(self.room_id, resp))
-        asyncio.create_task(self._save_guard(message, guard_name))
+        event = self.service.record_event(self.room_id, resp)
+        self.service.dispatch(self.room_id, "paid", event, functools.partial(self._save_guard, message, guard_name, event))
 
     def _on_user_toast_v2(self, client: blivedm.BLiveClient, message: web_models.UserToastV2Message):
         """
@@ -225,46 +367,50 @@ class BilibiliHandler(blivedm.BaseHandler):
             gift_img=gift_img
         )
         logger.info(f"[舰队]房间:{self.room_id}，用户名:{message.username}，舰队: {guard_name}，数量:{message.num}，总价:{total_price}元")
-        asyncio.create_task(self.service.broadcast(self.room_id, resp))
-        asyncio.create_task(self._save_guard(message, guard_name))
+        event = self.service.record_event(self.room_id, resp)
+        self.service.dispatch(self.room_id, "paid", event, functools.partial(self._save_guard, message, guard_name, event))
 
-    async def _save_to_db(self, db_op, error_msg: str):
+    async def _save_to_db(self, db_op, error_msg: str, event: Optional[dict] = None):
         """
         通用的数据库保存辅助方法，包含事务管理和异常处理
+
+        保存成功后把记录 ID 回填到缓冲区中的事件，供历史查询作为分页游标
         """
         async with AsyncSessionLocal() as db:
             try:
-                await db_op(db)
+                db_obj = await db_op(db)
                 await db.commit()
+                if event is not None and db_obj is not None:
+                    event["id"] = db_obj.id
             except Exception as e:
                 await db.rollback()
                 logger.error(f"{error_msg}: {e}")
 
-    async def _save_danmaku(self, message, privilege_name, identity):
+    async def _save_danmaku(self, message, privilege_name, identity, event: Optional[dict] = None):
         """保存弹幕到数据库"""
         async def op(db):
             data = dm_schema.DanmakuCreate(
-                room_id=str(self.room_id),
+                room_id=self.room_id,
                 user_name=message.uname,
-                uid=str(message.uid),
+                uid=message.uid,
                 level=message.medal_level if message.medal_level else 0,
                 privilege_name=privilege_name,
                 identity=identity,
                 face_img=message.face,
                 dm_text=message.msg
             )
-            await crud_danmaku.create_danmaku(db, data)
+            return await crud_danmaku.create_danmaku(db, data)
         
-        await self._save_to_db(op, "保存弹幕失败")
+        await self._save_to_db(op, "保存弹幕失败", event)
 
-    async def _save_super_chat(self, message):
+    async def _save_super_chat(self, message, event: Optional[dict] = None):
         """保存 SC 到数据库"""
         privilege_name = PRIVILEGE_MAP.get(message.guard_level, "普通")
         async def op(db):
             data = dm_schema.SuperChatCreate(
-                room_id=str(self.room_id),
+                room_id=self.room_id,
                 user_name=message.uname,
-                uid=str(message.uid),
+                uid=message.uid,
                 level=message.medal_level if message.medal_level else 0,
                 privilege_name=privilege_name, 
                 identity="普通", 
@@ -272,30 +418,30 @@ class BilibiliHandler(blivedm.BaseHandler):
                 sc_text=message.message,
                 price=message.price
             )
-            await crud_danmaku.create_super_chat(db, data)
+            return await crud_danmaku.create_super_chat(db, data)
             
-        await self._save_to_db(op, "保存SC失败")
+        await self._save_to_db(op, "保存SC失败", event)
 
-    async def _save_gift(self, message, price: float):
-        """保存礼物到数据库"""
+    async def _save_gift(self, message, price: float, event: Optional[dict] = None, num: Optional[int] = None):
+        """保存礼物到数据库 (num 用于连击合计，默认取消息中的数量)"""
         async def op(db):
             data = dm_schema.GiftCreate(
-                room_id=str(self.room_id),
+                room_id=self.room_id,
                 user_name=message.uname,
-                uid=str(message.uid),
+                uid=message.uid,
                 level=message.medal_level if message.medal_level else 0,
                 privilege_name="普通",
                 identity="普通",
                 # face_img=message.face, # 已移除
                 gift_name=message.gift_name,
-                gift_num=message.num,
+                gift_num=message.num if num is None else num,
                 price=price
             )
-            await crud_danmaku.create_gift(db, data)
+            return await crud_danmaku.create_gift(db, data)
             
-        await self._save_to_db(op, "保存礼物失败")
+        await self._save_to_db(op, "保存礼物失败", event)
 
-    async def _save_guard(self, message, privilege_name):
+    async def _save_guard(self, message, privilege_name, event: Optional[dict] = None):
         """保存舰队信息到数据库"""
         async def op(db):
             level = 0
@@ -307,9 +453,9 @@ class BilibiliHandler(blivedm.BaseHandler):
                 face = message.face
             
             data = dm_schema.GiftCreate(
-                room_id=str(self.room_id),
+                room_id=self.room_id,
                 user_name=message.username,
-                uid=str(message.uid),
+                uid=message.uid,
                 level=level, 
                 privilege_name=privilege_name,
                 identity="普通",
@@ -318,9 +464,9 @@ class BilibiliHandler(blivedm.BaseHandler):
                 gift_num=message.num,
                 price=float(message.price) / 1000.0
             )
-            await crud_danmaku.create_gift(db, data)
+            return await crud_danmaku.create_gift(db, data)
             
-        await self._save_to_db(op, "保存舰队失败")
+        await self._save_to_db(op, "保存舰队失败", event)
 
 class BLiveService:
     """
@@ -335,10 +481,52 @@ class BLiveService:
         
         # room_id -> List[WebSocket] (Unified connection list)
         self.connections: Dict[int, Set[WebSocket]] = {}
+        # room_id -> 订阅了实时统计推送的连接
+        self.stats_subscribers: Dict[int, Set[WebSocket]] = {}
+        # 连接 -> 协商的推送编码 (json / compact / msgpack / cbor)
+        self.connection_senders: Dict[WebSocket, ConnectionSender] = {}
         
         # 当前正在监听的房间 ID (单例模式)
         self.current_room_id: Optional[int] = None
 
+        # 直播间初始化信息缓存，切换房间和重连时省去大部分 HTTP 请求
+        self.room_init_cache = blivedm.RoomInitCache(
+            settings.BLIVE_INIT_CACHE_PATH, host_server_ttl=settings.BLIVE_INIT_CACHE_HOST_TTL
+        )
+        # 所有房间共用的 wbi 签名口令 (每个房间的 session 不同，不能按 session 缓存)
+        self.wbi_signer = blivedm.WbiSigner(settings.BLIVE_WBI_KEY_PATH)
+
+        # 从账号池借用账号的房间 (请求时未指定账号)，账号被风控时可以换号
+        self.borrowed_rooms: Set[int] = set()
+        # 账号被风控时把其房间换到其他账号
+        identity_pool.set_throttle_callback(self._on_identity_throttled)
+
+        # 所有房间共用的重连限速和熔断，避免 B站 故障时所有客户端同时重连
+        self.reconnect_bucket = blivedm.utils.TokenBucket(settings.BLIVE_RECONNECT_RATE, settings.BLIVE_RECONNECT_BURST)
+        self.reconnect_breaker = blivedm.utils.CircuitBreaker(
+            settings.BLIVE_BREAKER_THRESHOLD, settings.BLIVE_BREAKER_WINDOW, settings.BLIVE_BREAKER_OPEN
+        )
+
+        # 最近推送事件的环形缓冲区，用于历史查询和新连接回放
+        self.event_buffer = RoomEventBuffer(
+            settings.EVENT_BUFFER_SIZE, settings.EVENT_BUFFER_MAX_ROOMS, settings.EVENT_REPLAY_WINDOW
+        )
+
+        # 事件处理中需要单独运行的协程 (例如补全 SC 头像) 由有界任务管理器持有
+        self.tasks = TaskSupervisor("blive", settings.TASK_MAX_CONCURRENCY, settings.TASK_MAX_PENDING)
+
+        # 推送与保存按优先级通道排队，付费事件总是先处理；积压超过各通道上限时丢弃最旧的
+        self.broadcast_pipeline = PriorityPipeline("broadcast", {"chat": settings.PIPELINE_CHAT_MAX_PENDING})
+        self.persist_pipeline = PriorityPipeline("persist", settings.PIPELINE_PERSIST_MAX_PENDING)
+
+        # room_id -> 礼物连击聚合 (由 BilibiliHandler 创建，停止监听时结算)
+        self.gift_combos: Dict[int, GiftComboAggregator] = {}
+
+        # 重复弹幕折叠 (可选)
+        self.collapser: Optional[DanmakuCollapser] = (
+            DanmakuCollapser(settings.DEDUP_WINDOW, settings.DEDUP_PERSIST_MAX) if settings.DEDUP_ENABLED else None
+        )
+
     async def start_listen(self, room_id: int, user_name: Optional[str] = None, sessdata: Optional[str] = None):
         """
         开始监听指定直播间 (单例模式：自动停止旧房间)
@@ -351,7 +539,8 @@ class BLiveService:
         # 如果请求的房间已经是当前正在监听的房间，且客户端已启动，则直接返回
         if self.current_room_id == room_id and room_id in self.clients:
             logger.info(f"已在监听房间 {room_id}")
-            return
+            info = room_info_service.get_cached(room_id, allow_expired=True) or {}
+            return {"title": info.get("title"), "host_name": info.get("host_name")}
 
         # 如果有其他房间正在监听，先停止它
         if self.current_room_id and self.current_room_id != room_id:
@@ -372,9 +561,26 @@ class BLiveService:
                 else:
                     logger.warning(f"用户 {user_name} 不存在于数据库中")
 
+        # 判断是否应该保存到数据库：只有调用方提供了账号才保存，借用的账号不算
+        should_save_to_db = bool(final_sessdata)
+
+        # 指定的 SESSDATA 属于池中账号时复用其会话；未指定时只有开启借用才按负载分配账号
+        identity: Optional[Identity] = None
+        if settings.IDENTITY_POOL_ENABLED:
+            if final_sessdata:
+                identity = await identity_pool.acquire(room_id, final_sessdata)
+            elif settings.IDENTITY_POOL_BORROW:
+                identity = await identity_pool.acquire(room_id)
+                if identity is not None:
+                    self.borrowed_rooms.add(room_id)
+
         # 如果提供了 SESSDATA，则创建 session
         session: Optional[aiohttp.ClientSession] = None
-        if final_sessdata:
+        if identity is not None:
+            session = identity.session
+            final_sessdata = identity.sessdata
+            logger.info(f"房间 {room_id} 使用账号池中的账号 {identity.user_name}")
+        elif final_sessdata:
             # Explicitly set cookie with domain to ensure it's used correctly
             # Use SimpleCookie to set domain attribute
             from http.cookies import SimpleCookie
@@ -391,82 +597,79 @@ class BLiveService:
 
             session = aiohttp.ClientSession(cookie_jar=cookie_jar, headers={'User-Agent': settings.HEADERS['User-Agent']})
             self.sessions[room_id] = session
-            
-        # 判断是否应该保存到数据库：只有登录状态下才保存
-        should_save_to_db = bool(final_sessdata)
 
-        client = blivedm.BLiveClient(room_id, session=session)
+        # 先解析房间信息 (有缓存时不发请求)，结果预先写入初始化缓存，客户端启动时不再重复请求
+        info = await room_info_service.get_room_info(room_id, session)
+        if info is not None and self.room_init_cache.get('room', str(room_id)) is None:
+            self.room_init_cache.set('room', str(room_id), {'room_id': info['room_id'], 'room_owner_uid': info['uid']})
+
+        client = blivedm.BLiveClient(
+            room_id,
+            session=session,
+            init_cache=self.room_init_cache,
+            wbi_signer=self.wbi_signer,
+            race_connect=settings.BLIVE_RACE_CONNECT,
+            race_delay=settings.BLIVE_RACE_DELAY,
+        )
+        client.set_reconnect_policy(blivedm.utils.BackoffRetryPolicy(
+            settings.BLIVE_RECONNECT_BASE,
+            settings.BLIVE_RECONNECT_MAX,
+            token_bucket=self.reconnect_bucket,
+            circuit_breaker=self.reconnect_breaker,
+        ))
         handler = BilibiliHandler(room_id, self, save_to_db=should_save_to_db)
         client.set_handler(handler)
         self.clients[room_id] = client
         client.start()
-        
-        # 获取并保存房间信息
-        info = await self._fetch_and_save_room_info(room_id, session, save_to_db=should_save_to_db)
-        return info
 
-    async def _fetch_and_save_room_info(self, room_id: int, session: Optional[aiohttp.ClientSession] = None, save_to_db: bool = True) -> Dict[str, Optional[str]]:
-        """
-        获取并保存房间信息到数据库
-        Returns:
-            Dict: 包含房间标题和主播名称
-        """
-        url = f"{settings.BILIBILI_API_ROOM_INFO}?room_id={room_id}"
-        
-        own_session = False
-        title = None
-        host_name = None
-        
-        if session is None:
-            session = aiohttp.ClientSession(headers={'User-Agent': settings.HEADERS['User-Agent']})
-            own_session = True
-            
-        try:
-            async with session.get(url) as resp:
-                data = await resp.json()
-                if data['code'] == 0:
-                    room_info = data['data']
-                    title = room_info['title']
-                    # get_info 接口返回的 uid 是主播 uid
-                    host_uid = room_info['uid']
-                    host_name = await self._fetch_user_name_by_uid(host_uid, session)
-                    
-                    if save_to_db:
-                        async with AsyncSessionLocal() as db:
-                            try:
-                                room_data = room_schema.RoomCreate(
-                                    room_id=str(room_id),
-                                    title=title,
-                                    host=host_name or "Unknown"
-                                )
-                                await crud_room.create_or_update_room(db, room_data)
-                                await db.commit()
-                                logger.info(f"保存房间信息: {title}, 主播: {host_name}")
-                            except Exception as e:
-                                await db.rollback()
-                                logger.error(f"保存房间信息失败: {e}")
-        except Exception as e:
-            logger.error(f"获取房间信息失败: {e}")
-        finally:
-            if own_session:
-                await session.close()
-                
-        return {"title": title, "host_name": host_name}
+        # 后台刷新该房间的礼物面板 (未过期时不发请求)
+        self.tasks.spawn(self._refresh_gift_catalog(room_id, final_sessdata), name=f"gift_catalog-{room_id}")
 
-    async def _fetch_user_name_by_uid(self, uid: int, session: aiohttp.ClientSession) -> str:
+        if info is None:
+            return {"title": None, "host_name": None}
+        # 房间信息在后台保存
+        if should_save_to_db:
+            self.tasks.spawn(self._save_room_info(room_id, info), name=f"room_info-{room_id}")
+        return {"title": info['title'], "host_name": info['host_name']}
+
+    async def _save_room_info(self, room_id: int, info: dict):
         """
-        通过 UID 获取用户名称
+        保存房间信息到数据库
         """
-        # 使用直播用户接口，比主站用户接口风控更低
-        url = f"{settings.BILIBILI_API_LIVE_USER_INFO}?uid={uid}"
+        async with AsyncSessionLocal() as db:
+            try:
+                room_data = room_schema.RoomCreate(
+                    room_id=str(room_id),
+                    title=info['title'],
+                    host=info['host_name'] or "Unknown"
+                )
+                await crud_room.create_or_update_room(db, room_data)
+                await db.commit()
+                logger.info(f"保存房间信息: {info['title']}, 主播: {info['host_name']}")
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"保存房间信息失败: {e}")
+
+    async def _refresh_gift_catalog(self, room_id: int, sessdata: Optional[str] = None):
+        """刷新礼物信息索引，失败时继续使用已有数据"""
         try:
-            async with session.get(url) as resp:
-                data = await resp.json()
-                if data['code'] == 0:
-                    return data['data']['info']['uname']
+            await gift_service.refresh_room(room_id, sessdata)
         except Exception as e:
-            logger.error(f"获取主播名称失败: {e}")
-        return ""
+            logger.warning(f"刷新房间 {room_id} 礼物信息失败: {e}")
+
+    def _on_identity_throttled(self, identity: Identity, room_ids: List[int]):
+        """账号被风控：有其他可用账号时重启借用该账号的房间的监听，由账号池重新分配；调用方指定的账号不更换"""
+        if not identity_pool.has_available(exclude=identity):
+            logger.warning(f"账号 {identity.user_name} 被风控，但没有其他可用账号，继续使用")
+            return
+        for room_id in room_ids:
+            if room_id in self.clients and room_id in self.borrowed_rooms:
+                self.tasks.spawn(self._rotate_identity(room_id), name=f"rotate_identity-{room_id}")
+
+    async def _rotate_identity(self, room_id: int):
+        logger.info(f"房间 {room_id} 更换账号")
+        await self.stop_listen(room_id)
+        await self.start_listen(room_id)
 
     async def stop_listen(self, room_id: int):
         """
@@ -478,16 +681,37 @@ class BLiveService:
         if room_id in self.clients:
             await self.clients[room_id].stop_and_close()
             del self.clients[room_id]
+
+        # 结算进行中的礼物连击，合计记录照常保存
+        combos = self.gift_combos.pop(room_id, None)
+        if combos is not None:
+            combos.flush()
         
         # 如果我们创建了 session，需要手动关闭
         if room_id in self.sessions:
             await self.sessions[room_id].close()
             del self.sessions[room_id]
             
+        identity_pool.release(room_id)
+        self.borrowed_rooms.discard(room_id)
+
         if self.current_room_id == room_id:
             self.current_room_id = None
 
-    async def connect(self, websocket: WebSocket, room_id: int, user_name: Optional[str] = None):
+        if self.collapser is not None:
+            self.collapser.clear(room_id)
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        room_id: int,
+        user_name: Optional[str] = None,
+        history: int = 0,
+        last_seq: Optional[int] = None,
+        stats: bool = False,
+        encoding: Optional[str] = None,
+        epoch: Optional[int] = None,
+    ):
         """
         建立 WebSocket 连接并自动启动监听
         
@@ -495,11 +719,50 @@ class BLiveService:
             websocket (WebSocket): WebSocket 连接对象
             room_id (int): 直播间 ID
             user_name (Optional[str]): 关联用户名
+            history (int): 连接后从缓冲区回放的每类最近事件数量，0 表示不回放
+            last_seq (Optional[int]): 重连时客户端最后收到的 seq，补发之后的事件；
+                epoch 不一致或缺口超出重放窗口时先发送 resync 消息，再按 history 回放
+            stats (bool): 是否订阅定期推送的实时统计 (msg_type=stats)
+            encoding (Optional[str]): 客户端请求的推送编码 (逗号分隔的候选)，不可用时使用 json
+            epoch (Optional[int]): 重连时客户端最后收到的事件的 epoch，与 last_seq 一起传回
         """
         await websocket.accept()
+        encoding = event_codec.negotiate(encoding)
+        sender = ConnectionSender(
+            websocket, encoding, functools.partial(self.disconnect, websocket, room_id),
+            settings.WS_SEND_MAX_PENDING, settings.WS_SEND_TIMEOUT,
+        )
+        self.connection_senders[websocket] = sender
+        # 先取回放快照再加入连接列表，两步之间没有 await，不会漏掉事件
+        replay = None
+        if last_seq is not None:
+            replay = self.event_buffer.since_seq(room_id, last_seq, epoch)
+            if replay is None:
+                resync = {
+                    "msg_type": "resync",
+                    "seq": self.event_buffer.last_seq(room_id),
+                    "epoch": self.event_buffer.epoch,
+                }
+                try:
+                    await sender.send_now(event_codec.encode(resync, encoding))
+                except Exception:
+                    self.disconnect(websocket, room_id)
+                    raise
+        if replay is None:
+            replay = self.get_replay_events(room_id, history) if history > 0 else []
         if room_id not in self.connections:
             self.connections[room_id] = set()
         self.connections[room_id].add(websocket)
+        if stats:
+            self.stats_subscribers.setdefault(room_id, set()).add(websocket)
+        # 回放期间新到的事件先在发送队列中排队，回放完成后再由写任务发送，保证顺序
+        try:
+            for event in replay:
+                await sender.send_now(event_codec.encode(event, encoding))
+        except Exception:
+            self.disconnect(websocket, room_id)
+            raise
+        sender.start()
         # 自动开始监听
         await self.start_listen(room_id, user_name)
 
@@ -514,22 +777,116 @@ class BLiveService:
         if room_id in self.connections:
             if websocket in self.connections[room_id]:
                 self.connections[room_id].remove(websocket)
+        if room_id in self.stats_subscribers:
+            self.stats_subscribers[room_id].discard(websocket)
+        sender = self.connection_senders.pop(websocket, None)
+        if sender is not None:
+            sender.stop()
+
+    def record_event(
+        self, room_id: int, data: Union[dm_schema.DanmakuResponse, dm_schema.GiftResponse], count_stats: bool = True
+    ) -> dict:
+        """
+        序列化推送消息并写入环形缓冲区
+
+        Args:
+            room_id (int): 直播间 ID
+            data: 消息数据对象
+            count_stats (bool): 是否计入实时统计 (合并推送的重复弹幕已逐条计入)
+
+        Returns:
+            dict: 序列化后的事件，广播和保存共用同一份
+        """
+        if data.timestamp <= 0:
+            data.timestamp = time.time()
+        event = data.model_dump()
+        self.event_buffer.append(room_id, event)
+        if count_stats:
+            stats_service.on_event(room_id, event)
+        return event
+
+    def dispatch(self, room_id: int, lane: str, event: dict, save: Optional[Callable[[], Awaitable[None]]] = None):
+        """
+        把事件的推送和保存提交到对应优先级通道
+
+        Args:
+            room_id (int): 直播间 ID
+            lane (str): 优先级通道 paid / gift / chat
+            event (dict): 序列化后的事件
+            save: 保存到数据库的无参协程函数，为 None 时只推送
+        """
+        self.broadcast_pipeline.submit(lane, functools.partial(self.broadcast, room_id, event))
+        if save is not None:
+            self.persist_pipeline.submit(lane, save)
+
+    def pipeline_metrics(self) -> dict:
+        """推送/保存各优先级通道的积压与延迟，以及各队列因积压丢弃的任务总数"""
+        return {
+            "broadcast": self.broadcast_pipeline.snapshot(),
+            "persist": self.persist_pipeline.snapshot(),
+            "dropped": {"broadcast": self.broadcast_pipeline.dropped(), "persist": self.persist_pipeline.dropped()},
+        }
+
+    async def close_pipelines(self):
+        """等待进行中的事件处理任务并结算礼物连击，再关闭推送/保存队列，待保存的数据会先写完"""
+        await self.tasks.shutdown(timeout=settings.TASK_SHUTDOWN_TIMEOUT)
+        for combos in self.gift_combos.values():
+            combos.flush()
+        await self.broadcast_pipeline.close()
+        await self.persist_pipeline.close(drain=True)
+
+    def get_recent_events(self, room_id: int, category: str, limit: int) -> List[dict]:
+        """
+        从环形缓冲区获取最近事件 (按时间正序)
+
+        Args:
+            room_id (int): 直播间 ID
+            category (str): 分类 danmaku / gift / sc
+            limit (int): 最多返回数量
+        """
+        return self.event_buffer.recent(room_id, category, limit)
 
-    async def broadcast(self, room_id: int, data: Union[dm_schema.DanmakuResponse, dm_schema.GiftResponse]):
+    def get_replay_events(self, room_id: int, limit: int) -> List[dict]:
+        """
+        获取各分类最近 limit 条事件，按时间戳合并排序，用于新连接回放
+        """
+        streams = [self.event_buffer.recent(room_id, category, limit) for category in EVENT_CATEGORIES]
+        return list(heapq.merge(*streams, key=lambda e: e["timestamp"]))
+
+    def stats_room_ids(self) -> List[int]:
+        """有统计订阅者的房间"""
+        return [room_id for room_id, subscribers in self.stats_subscribers.items() if subscribers]
+
+    async def broadcast_stats(self, room_id: int, payload: dict):
+        """
+        推送实时统计到订阅了统计的连接
+        """
+        self._enqueue(self.stats_subscribers.get(room_id, ()), payload)
+
+    async def broadcast(self, room_id: int, data: Union[dict, dm_schema.DanmakuResponse, dm_schema.GiftResponse]):
         """
         广播消息到该房间的所有 WebSocket 连接
+
+        只放入各连接的发送队列，不等待客户端 I/O
         
         Args:
             room_id (int): 直播间 ID
-            data: 消息数据对象
+            data: 消息数据对象或已序列化的事件
         """
         if room_id in self.connections:
-            for connection in list(self.connections[room_id]):
-                try:
-                    await connection.send_json(data.model_dump())
-                except Exception as e:
-                    logger.error(f"广播消息到房间 {room_id} 失败: {e}")
-                    self.disconnect(connection, room_id)
+            payload = data if isinstance(data, dict) else data.model_dump()
+            self._enqueue(self.connections[room_id], payload)
+
+    def _enqueue(self, connections: Iterable[WebSocket], payload: dict):
+        # 每种编码只序列化一次；队列已满的连接会被断开，先复制一份连接列表
+        encoded: Dict[str, Union[str, bytes]] = {}
+        for connection in list(connections):
+            sender = self.connection_senders.get(connection)
+            if sender is None:
+                continue
+            if sender.encoding not in encoded:
+                encoded[sender.encoding] = event_codec.encode(payload, sender.encoding)
+            sender.send(encoded[sender.encoding])
 
 # 全局单例
 blive_service : BLiveService = BLiveService()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import Callable, Optional, Union
+
+from fastapi import WebSocket
+from loguru import logger
+
+from backend.utils.task_supervisor import background_tasks
+
+Message = Union[str, bytes]
+
+
+async def send_message(websocket: WebSocket, message: Message):
+    """文本编码用文本帧发送，二进制编码用二进制帧发送"""
+    if isinstance(message, bytes):
+        await websocket.send_bytes(message)
+    else:
+        await websocket.send_text(message)
+
+
+class ConnectionSender:
+    """
+    单个 WebSocket 连接的有界发送队列
+
+    推送通道只把编码好的消息放进各连接的队列，由连接自己的写任务发送，推送通道的 worker 不等待客户端 I/O，
+    一个读得慢的客户端不会拖慢其他连接、房间和通道。队列积压超过 max_pending 或单条消息发送超过 send_timeout 时
+    关闭该连接，客户端可带 last_seq 重连补发。
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        encoding: str,
+        on_close: Callable[[], None],
+        max_pending: int,
+        send_timeout: float,
+    ):
+        self.websocket = websocket
+        self.encoding = encoding
+        self._on_close = on_close
+        self._send_timeout = send_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def start(self):
+        """启动写任务；启动前放入队列的消息会在之后按顺序发送"""
+        if self._task is None and not self.closed:
+            self._task = background_tasks.spawn(self._run(), name="ws-sender")
+
+    def send(self, message: Message) -> bool:
+        """
+        把消息放入发送队列，不等待发送
+
+        Returns:
+            bool: 是否成功入队；队列已满时关闭连接并返回 False
+        """
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._fail(f"发送队列积压超过 {self._queue.maxsize} 条")
+            return False
+        return True
+
+    async def send_now(self, message: Message):
+        """在调用方的任务中直接发送 (用于连接建立时的回放)，同样受 send_timeout 限制"""
+        await asyncio.wait_for(send_message(self.websocket, message), self._send_timeout)
+
+    async def _run(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await asyncio.wait_for(send_message(self.websocket, message), self._send_timeout)
+            except asyncio.TimeoutError:
+                self._fail(f"发送超过 {self._send_timeout} 秒")
+                return
+            except Exception as e:
+                self._fail(str(e))
+                return
+
+    def _fail(self, reason: str):
+        if self.closed:
+            return
+        logger.warning(f"WebSocket 连接推送失败 ({reason})，断开连接")
+        self.stop()
+        self._on_close()
+        background_tasks.spawn(self._close_socket(), name="ws-close")
+
+    async def _close_socket(self):
+        try:
+            # 1013: 服务端暂时无法处理，客户端稍后重连
+            await asyncio.wait_for(self.websocket.close(code=1013), self._send_timeout)
+        except Exception:
+            pass
+
+    def stop(self):
+        """停止写任务并丢弃未发送的消息 (连接已断开时调用)"""
+        self.closed = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
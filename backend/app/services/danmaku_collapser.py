@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from backend.app.schemas import danmaku as dm_schema
+
+# 连续重复的字符 ("66666" / "哈哈哈哈")
+_REPEAT_CHARS = re.compile(r"(.)\1+")
+# 空白与常见标点
+_IGNORED_CHARS = re.compile(r"[\s!！?？.。,，~～、…]+")
+
+
+class CollapseEntry:
+    """
+    一个归一化文本在当前窗口内的重复情况
+    """
+    __slots__ = ("room_id", "key", "last_seen", "count", "pending", "latest", "flush_scheduled")
+
+    def __init__(self, room_id: int, key: str, now: float):
+        self.room_id = room_id
+        self.key = key
+        self.last_seen = now
+        # 窗口内出现的总次数 (含首条)
+        self.count = 1
+        # 已折叠、尚未合并推送的重复条数
+        self.pending = 0
+        # 最近一条重复弹幕，合并推送时以它为模板
+        self.latest: Optional[dm_schema.DanmakuResponse] = None
+        self.flush_scheduled = False
+
+
+class DanmakuCollapser:
+    """
+    重复弹幕折叠
+
+    以归一化文本为键，在滑动窗口 (距上次出现不超过 window 秒) 内只有首条弹幕正常推送，
+    后续重复弹幕累计为 pending，由调用方定期合并成一条带 repeat 次数的弹幕推送。
+    每个键在窗口内最多持久化 persist_max 条重复弹幕 (负数表示全部保存)。
+    """
+
+    def __init__(self, window: float, persist_max: int, max_keys: int = 4096):
+        self.window = window
+        self.persist_max = persist_max
+        self.max_keys = max_keys
+        # (room_id, key) -> entry，按最近出现时间排序，便于从队首淘汰过期键
+        self._entries: "OrderedDict[Tuple[int, str], CollapseEntry]" = OrderedDict()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """归一化：全半角统一、忽略大小写、去掉空白和标点、压缩连续重复字符"""
+        text = unicodedata.normalize("NFKC", text).lower()
+        text = _IGNORED_CHARS.sub("", text)
+        return _REPEAT_CHARS.sub(r"\1", text) or text
+
+    def _evict(self, now: float):
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            expired = now - entry.last_seen > self.window
+            if not expired and len(self._entries) <= self.max_keys:
+                break
+            if entry.pending and not expired:
+                # 键太多时也不丢弃尚未推送的计数，等待合并推送后再淘汰
+                break
+            self._entries.popitem(last=False)
+
+    def add(self, room_id: int, text: str, now: float) -> Optional[CollapseEntry]:
+        """
+        登记一条弹幕
+
+        Args:
+            room_id (int): 直播间 ID
+            text (str): 弹幕内容
+            now (float): 当前时间戳
+
+        Returns:
+            Optional[CollapseEntry]: 首次出现 (应正常推送) 时返回 None，重复弹幕返回所属条目
+        """
+        self._evict(now)
+        key = (room_id, self.normalize(text))
+        entry = self._entries.get(key)
+        if entry is None or now - entry.last_seen > self.window:
+            self._entries[key] = CollapseEntry(room_id, key[1], now)
+            self._entries.move_to_end(key)
+            return None
+
+        entry.last_seen = now
+        entry.count += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def should_persist(self, entry: CollapseEntry) -> bool:
+        """重复弹幕是否仍需保存到数据库"""
+        return self.persist_max < 0 or entry.count - 1 <= self.persist_max
+
+    def take_pending(self, entry: CollapseEntry) -> Optional[dm_schema.DanmakuResponse]:
+        """
+        取出条目累计的重复弹幕，生成合并后的推送数据并清零计数
+
+        Returns:
+            Optional[DanmakuResponse]: 以最近一条重复弹幕为模板、repeat 为累计条数的弹幕；没有累计时返回 None
+        """
+        entry.flush_scheduled = False
+        if not entry.pending or entry.latest is None:
+            return None
+        resp = entry.latest.model_copy(update={"repeat": entry.pending, "timestamp": 0.0})
+        entry.pending = 0
+        entry.latest = None
+        return resp
+
+    def clear(self, room_id: int):
+        for key in [k for k in self._entries if k[0] == room_id]:
+            del self._entries[key]
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional
+
+# 推送消息类型 -> 缓冲区分类
+MSG_TYPE_CATEGORY = {
+    "danmaku": "danmaku",
+    "super_chat": "sc",
+    "gift": "gift",
+    "guard": "gift",
+}
+
+EVENT_CATEGORIES = ("danmaku", "gift", "sc")
+
+
+class RoomEventBuffer:
+    """
+    按房间、分类保存最近推送事件的环形缓冲区
+
+    事件以序列化后的 dict 保存，历史查询和新连接的回放直接读取，不访问数据库。
+    每个事件写入时分配房间内单调递增的 seq，并额外保存在不分类的重放窗口中，
+    供断线重连的客户端按 last_seq 补发。超过 max_rooms 个房间时淘汰最久未写入的房间。
+    seq 只在本进程内有效，服务重启后从 1 重新开始，因此每个事件同时带上进程启动时生成的 epoch，
+    重连时 epoch 不一致说明 last_seq 来自之前的进程，需要客户端重新同步。
+    """
+
+    def __init__(self, maxlen: int = 500, max_rooms: int = 16, replay_window: int = 2000):
+        self.maxlen = maxlen
+        self.max_rooms = max_rooms
+        self.replay_window = replay_window
+        # 进程启动时间 (毫秒)，区分重启前后的 seq
+        self.epoch = int(time.time() * 1000)
+        # room_id -> category -> deque[event]
+        self._rooms: "OrderedDict[int, Dict[str, Deque[dict]]]" = OrderedDict()
+        # room_id -> 按 seq 连续排列的全部事件
+        self._windows: Dict[int, Deque[dict]] = {}
+        # room_id -> 最后分配的 seq (淘汰房间时保留，保证 seq 不回退)
+        self._last_seq: Dict[int, int] = {}
+
+    def append(self, room_id: int, event: dict):
+        """
+        写入一条事件
+
+        Args:
+            room_id (int): 直播间 ID
+            event (dict): 序列化后的推送数据 (需包含 msg_type)，写入时会设置 event["seq"] 和 event["epoch"]
+        """
+        category = MSG_TYPE_CATEGORY.get(event.get("msg_type"))
+        if category is None:
+            return
+
+        buffers = self._rooms.get(room_id)
+        if buffers is None:
+            buffers = self._rooms[room_id] = {c: deque(maxlen=self.maxlen) for c in EVENT_CATEGORIES}
+            self._windows[room_id] = deque(maxlen=self.replay_window)
+            while len(self._rooms) > self.max_rooms:
+                evicted, _ = self._rooms.popitem(last=False)
+                self._windows.pop(evicted, None)
+        else:
+            self._rooms.move_to_end(room_id)
+
+        seq = self._last_seq.get(room_id, 0) + 1
+        self._last_seq[room_id] = seq
+        event["seq"] = seq
+        event["epoch"] = self.epoch
+        buffers[category].append(event)
+        self._windows[room_id].append(event)
+
+    def last_seq(self, room_id: int) -> int:
+        """房间最后分配的 seq，没有事件时为 0"""
+        return self._last_seq.get(room_id, 0)
+
+    def since_seq(self, room_id: int, last_seq: int, epoch: Optional[int] = None) -> Optional[List[dict]]:
+        """
+        获取 seq 大于 last_seq 的事件，用于断线重连补发
+
+        Args:
+            room_id (int): 直播间 ID
+            last_seq (int): 客户端最后收到的 seq
+            epoch (Optional[int]): 客户端最后收到的事件的 epoch
+
+        Returns:
+            Optional[List[dict]]: 缺失的事件；epoch 不一致 (seq 来自服务重启之前) 或缺口超出重放窗口时返回 None
+        """
+        if epoch != self.epoch:
+            return None
+        current = self.last_seq(room_id)
+        if last_seq > current:
+            return None
+        if last_seq == current:
+            return []
+        window = self._windows.get(room_id)
+        if not window or window[0]["seq"] > last_seq + 1:
+            return None
+        # 窗口内 seq 连续，可直接按偏移定位
+        return list(islice(window, last_seq + 1 - window[0]["seq"], None))
+
+    def recent(self, room_id: int, category: str, limit: int) -> List[dict]:
+        """
+        获取最近的事件，按时间正序排列
+
+        Args:
+            room_id (int): 直播间 ID
+            category (str): 分类 danmaku / gift / sc
+            limit (int): 最多返回数量
+
+        Returns:
+            List[dict]: 事件列表
+        """
+        buffers = self._rooms.get(room_id)
+        if buffers is None or limit <= 0:
+            return []
+        # deque 不支持切片且按下标访问中间元素为 O(n)，从右侧反向迭代取 limit 个
+        events = list(islice(reversed(buffers[category]), limit))
+        events.reverse()
+        return events
+
+    def size(self, room_id: int, category: str) -> int:
+        buffers = self._rooms.get(room_id)
+        return len(buffers[category]) if buffers is not None else 0
+
+    def clear(self, room_id: int):
+        self._rooms.pop(room_id, None)
+        self._windows.pop(room_id, None)
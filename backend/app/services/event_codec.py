@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import enum
+import json
+from typing import Dict, Optional, Union
+
+# msgpack / cbor2 是可选依赖，没有安装时这两种编码不可用，协商时退回 json
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+
+class MsgType(enum.IntEnum):
+    DANMAKU = 1
+    SUPER_CHAT = 2
+    GIFT = 3
+    GUARD = 4
+
+
+class GuardLevel(enum.IntEnum):
+    """与 B站 guard_level 一致"""
+    NONE = 0
+    GOVERNOR = 1  # 总督
+    ADMIRAL = 2  # 提督
+    CAPTAIN = 3  # 舰长
+
+
+class IdentityType(enum.IntEnum):
+    NORMAL = 0  # 普通
+    ADMIN = 1  # 房管
+    HOST = 2  # 主播
+
+
+MSG_TYPE_CODES: Dict[str, MsgType] = {
+    "danmaku": MsgType.DANMAKU,
+    "super_chat": MsgType.SUPER_CHAT,
+    "gift": MsgType.GIFT,
+    "guard": MsgType.GUARD,
+}
+GUARD_LEVEL_CODES: Dict[str, GuardLevel] = {
+    "总督": GuardLevel.GOVERNOR,
+    "提督": GuardLevel.ADMIRAL,
+    "舰长": GuardLevel.CAPTAIN,
+}
+IDENTITY_CODES: Dict[str, IdentityType] = {
+    "房管": IdentityType.ADMIN,
+    "主播": IdentityType.HOST,
+}
+
+# 推送编码：json 为原有格式 (文本帧)；compact 为紧凑信封的 JSON (文本帧)；msgpack / cbor 为紧凑信封的二进制帧
+ENCODING_JSON = "json"
+ENCODING_COMPACT = "compact"
+ENCODING_MSGPACK = "msgpack"
+ENCODING_CBOR = "cbor"
+
+
+def available_encodings() -> list:
+    """当前环境可用的推送编码"""
+    encodings = [ENCODING_JSON, ENCODING_COMPACT]
+    if msgpack is not None:
+        encodings.append(ENCODING_MSGPACK)
+    if cbor2 is not None:
+        encodings.append(ENCODING_CBOR)
+    return encodings
+
+
+def negotiate(requested: Optional[str]) -> str:
+    """
+    协商推送编码
+
+    Args:
+        requested (Optional[str]): 客户端请求的编码，可以是逗号分隔的候选列表 (按优先级)
+
+    Returns:
+        str: 第一个可用的候选，都不可用时为 json
+    """
+    if not requested:
+        return ENCODING_JSON
+    available = available_encodings()
+    for encoding in requested.split(","):
+        encoding = encoding.strip().lower()
+        if encoding in available:
+            return encoding
+    return ENCODING_JSON
+
+
+class EventEnvelope:
+    """
+    推送事件的紧凑信封
+
+    消息类型、舰队等级、直播间身份用整数表示，字段名缩写，值为空或默认值的字段不输出。
+    字段：t 消息类型 / id 记录 ID (历史查询的分页游标，入库前为空) / s seq / e epoch / ts 时间戳 / u uid / n 用户名 /
+    f 头像 / lv 粉丝牌等级 / g 舰队等级 / i 身份 / x 弹幕内容或礼物名称 / p 价值(元) / c 数量 / gi 礼物图标 / r 折叠条数 / cid、cn、cp、cd 连击 ID、累计数量、累计价值、是否结束
+    """
+
+    __slots__ = (
+        "t", "id", "s", "e", "ts", "u", "n", "f", "lv", "g", "i", "x", "p", "c", "gi", "r", "cid", "cn", "cp", "cd",
+    )
+
+    def __init__(self, event: dict):
+        msg_type = MSG_TYPE_CODES[event["msg_type"]]
+        self.t = int(msg_type)
+        self.id = event.get("id")
+        self.s = event.get("seq")
+        self.e = event.get("epoch")
+        self.ts = event.get("timestamp")
+        self.u = event.get("uid")
+        self.n = event.get("user_name")
+        self.f = event.get("face_img")
+        self.lv = event.get("level")
+        self.g = int(GUARD_LEVEL_CODES.get(event.get("privilege_name"), GuardLevel.NONE))
+        self.i = int(IDENTITY_CODES.get(event.get("identity"), IdentityType.NORMAL))
+        if msg_type in (MsgType.DANMAKU, MsgType.SUPER_CHAT):
+            self.x = event.get("dm_text")
+            self.c = None
+            self.gi = None
+        else:
+            self.x = event.get("gift_type")
+            self.c = event.get("num")
+            self.gi = event.get("gift_img")
+        self.p = event.get("price")
+        self.r = event.get("repeat") if event.get("repeat", 1) != 1 else None
+        self.cid = event.get("combo_id")
+        self.cn = event.get("combo_num") if self.cid else None
+        self.cp = event.get("combo_price") if self.cid else None
+        self.cd = event.get("combo_done") if self.cid else None
+
+    def to_dict(self) -> dict:
+        return {
+            name: value for name in self.__slots__
+            if (value := getattr(self, name)) is not None and value != "" and (value != 0 or name in ("t", "s"))
+        }
+
+
+def to_wire(event: dict, encoding: str) -> dict:
+    """推送事件转成紧凑信封，其他消息 (stats、resync 等) 原样返回"""
+    if encoding == ENCODING_JSON or event.get("msg_type") not in MSG_TYPE_CODES:
+        return event
+    return EventEnvelope(event).to_dict()
+
+
+def encode(event: dict, encoding: str) -> Union[str, bytes]:
+    """
+    按协商的编码序列化一条推送消息，同一事件对同一编码只需调用一次，结果发给所有该编码的连接
+
+    Args:
+        event (dict): 序列化后的推送数据
+        encoding (str): negotiate 返回的编码
+
+    Returns:
+        Union[str, bytes]: json / compact 为文本，msgpack / cbor 为二进制
+    """
+    payload = to_wire(event, encoding)
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    if encoding == ENCODING_CBOR:
+        return cbor2.dumps(payload)
+    # 与 starlette 的 send_json 一致
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from loguru import logger
+
+# 优先级从高到低：付费事件 (SC / 上舰 / 金瓜子礼物)、免费礼物、弹幕
+LANES = ("paid", "gift", "chat")
+
+Job = Callable[[], Awaitable[None]]
+
+
+class LaneMetrics:
+    """
+    单个优先级通道的计数与排队延迟 (从提交到处理完成)
+    """
+
+    def __init__(self, samples: int = 1024):
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.max_latency = 0.0
+        self._latencies: Deque[float] = deque(maxlen=samples)
+
+    def observe(self, latency: float):
+        self.completed += 1
+        self.max_latency = max(self.max_latency, latency)
+        self._latencies.append(latency)
+
+    def to_dict(self, pending: int) -> dict:
+        latencies = sorted(self._latencies)
+        count = len(latencies)
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "pending": pending,
+            "latency_avg_ms": round(sum(latencies) / count * 1000, 2) if count else 0.0,
+            "latency_p95_ms": round(latencies[min(count - 1, int(count * 0.95))] * 1000, 2) if count else 0.0,
+            "latency_max_ms": round(self.max_latency * 1000, 2),
+        }
+
+
+class PriorityPipeline:
+    """
+    带优先级通道的串行任务队列
+
+    单个 worker 按提交顺序处理任务，但总是先取高优先级通道，保证弹幕刷屏时付费事件不会排在大量弹幕之后。
+    可为通道设置积压上限，超过时丢弃该通道最旧的任务 (用于在压力下舍弃弹幕推送)。
+    worker 在首次提交任务时启动。
+    """
+
+    def __init__(self, name: str, max_pending: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.max_pending = max_pending or {}
+        self._queues: Dict[str, Deque[Tuple[float, Job]]] = {lane: deque() for lane in LANES}
+        self.metrics: Dict[str, LaneMetrics] = {lane: LaneMetrics() for lane in LANES}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._busy = False
+
+    def submit(self, lane: str, job: Job):
+        """
+        提交任务
+
+        Args:
+            lane (str): 优先级通道 paid / gift / chat
+            job: 无参协程函数
+        """
+        queue = self._queues[lane]
+        metrics = self.metrics[lane]
+        limit = self.max_pending.get(lane)
+        if limit is not None and limit > 0 and len(queue) >= limit:
+            queue.popleft()
+            metrics.dropped += 1
+            if metrics.dropped == 1 or metrics.dropped % 100 == 0:
+                logger.warning(f"[{self.name}] {lane} 通道积压已达上限 {limit}，已丢弃 {metrics.dropped} 个最旧的任务")
+        queue.append((time.perf_counter(), job))
+        metrics.submitted += 1
+        self._wakeup.set()
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def _next(self) -> Optional[Tuple[str, float, Job]]:
+        for lane in LANES:
+            queue = self._queues[lane]
+            if queue:
+                submitted_at, job = queue.popleft()
+                return lane, submitted_at, job
+        return None
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def dropped(self) -> int:
+        """因积压超过上限丢弃的任务总数"""
+        return sum(metrics.dropped for metrics in self.metrics.values())
+
+    async def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            lane, submitted_at, job = item
+            self._busy = True
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"[{self.name}] {lane} 通道任务执行失败: {e}")
+            finally:
+                self._busy = False
+            self.metrics[lane].observe(time.perf_counter() - submitted_at)
+
+    async def close(self, drain: bool = False):
+        """
+        停止 worker
+
+        Args:
+            drain (bool): 是否先处理完积压的任务 (用于关闭时把待保存的数据写完)
+        """
+        if drain and self._worker is not None and not self._worker.done():
+            while self.pending() or self._busy:
+                await asyncio.sleep(0.05)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def snapshot(self) -> dict:
+        """各通道的计数与延迟"""
+        return {lane: self.metrics[lane].to_dict(len(self._queues[lane])) for lane in LANES}
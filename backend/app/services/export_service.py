@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Optional
+
+from loguru import logger
+
+from backend.app.crud.danmaku import crud_danmaku
+from backend.app.models import danmaku as dm_model
+from backend.app.schemas import danmaku as dm_schema
+from backend.database.db import AsyncReadSessionLocal
+from backend.utils.timezone import timezone
+
+# 导出文件的统一列
+EXPORT_FIELDS = (
+    "msg_type", "id", "timestamp", "user_name", "uid", "level",
+    "privilege_name", "identity", "text", "gift_name", "gift_num", "price",
+)
+
+
+def _danmaku_row(r) -> dict:
+    return {
+        "msg_type": "danmaku", "id": r.id, "timestamp": timezone.to_timestamp(r.create_time),
+        "user_name": r.user_name, "uid": r.uid, "level": r.level, "privilege_name": r.privilege_name,
+        "identity": r.identity, "text": r.dm_text, "gift_name": None, "gift_num": None, "price": 0.0,
+    }
+
+
+def _gift_row(r) -> dict:
+    return {
+        "msg_type": "guard" if r.gift_name in dm_schema.GUARD_GIFT_NAMES else "gift", "id": r.id,
+        "timestamp": timezone.to_timestamp(r.create_time), "user_name": r.user_name, "uid": r.uid,
+        "level": r.level, "privilege_name": r.privilege_name, "identity": None, "text": None,
+        "gift_name": r.gift_name, "gift_num": r.gift_num, "price": r.price,
+    }
+
+
+def _super_chat_row(r) -> dict:
+    return {
+        "msg_type": "super_chat", "id": r.id, "timestamp": timezone.to_timestamp(r.create_time),
+        "user_name": r.user_name, "uid": r.uid, "level": r.level, "privilege_name": r.privilege_name,
+        "identity": r.identity, "text": r.sc_text, "gift_name": None, "gift_num": None, "price": r.price,
+    }
+
+
+# 导出类型 -> (模型, 查询列, 行转换函数)
+EXPORT_SOURCES = {
+    "danmaku": (dm_model.Danmaku, crud_danmaku.DANMAKU_PAGE_COLUMNS, _danmaku_row),
+    "gift": (dm_model.Gift, crud_danmaku.GIFT_PAGE_COLUMNS, _gift_row),
+    "sc": (dm_model.SuperChat, crud_danmaku.SUPER_CHAT_PAGE_COLUMNS, _super_chat_row),
+}
+
+
+class ExportService:
+    """
+    历史记录导出服务
+    以服务端游标分批读取，边读边编码 (可选 gzip 压缩) 输出，内存占用与导出总量无关
+    """
+    BATCH_SIZE = 1000
+
+    async def iter_export(
+        self,
+        room_id: int,
+        types: Iterable[str],
+        fmt: str = "ndjson",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        gzip: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        按批次生成导出内容
+
+        Args:
+            room_id (int): 房间号
+            types (Iterable[str]): 导出的记录类型 (danmaku / gift / sc)，按顺序依次输出
+            fmt (str): 输出格式 ndjson 或 csv
+            since (Optional[datetime]): 起始时间 (含)
+            until (Optional[datetime]): 结束时间 (不含)
+            gzip (bool): 是否 gzip 压缩
+
+        Yields:
+            bytes: 导出内容分块
+        """
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+
+        def emit(text: str) -> bytes:
+            data = text.encode("utf-8")
+            return compressor.compress(data) if compressor else data
+
+        if fmt == "csv":
+            # 带 BOM，方便 Excel 直接打开中文内容
+            chunk = emit("\ufeff" + ",".join(EXPORT_FIELDS) + "\r\n")
+            if chunk:
+                yield chunk
+
+        total = 0
+        async with AsyncReadSessionLocal() as db:
+            for msg_type in types:
+                model, columns, to_row = EXPORT_SOURCES[msg_type]
+                result = await crud_danmaku.stream_events(
+                    db, model, columns, room_id, since, until, batch_size=self.BATCH_SIZE
+                )
+                async for rows in result.partitions():
+                    chunk = emit(self._encode(fmt, (to_row(r) for r in rows)))
+                    total += len(rows)
+                    if chunk:
+                        yield chunk
+
+        if compressor:
+            yield compressor.flush()
+        logger.info(f"导出房间 {room_id} 历史记录完成: {total} 条, 格式 {fmt}{' (gzip)' if gzip else ''}")
+
+    @staticmethod
+    def _encode(fmt: str, rows: Iterable[dict]) -> str:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+            writer.writerows(rows)
+            return buffer.getvalue()
+        return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+export_service : ExportService = ExportService()
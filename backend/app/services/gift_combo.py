@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+from backend.blivedm.blivedm.models import web as web_models
+from backend.app.schemas import danmaku as dm_schema
+
+
+class GiftCombo:
+    """
+    一次礼物连击的累计状态
+    """
+    __slots__ = (
+        "key", "combo_id", "message", "resp", "event", "num", "price", "count",
+        "emitted_num", "emitted_price", "last_emit", "settle_handle", "update_handle",
+    )
+
+    def __init__(self, key: Tuple, message: web_models.GiftMessage, resp: dm_schema.GiftResponse):
+        self.key = key
+        self.combo_id = message.batch_combo_id or uuid.uuid4().hex
+        # 首条礼物的消息和推送数据，用户信息、礼物信息以它为准
+        self.message = message
+        self.resp = resp
+        # 最近一次推送的事件，保存合计记录后回填 ID
+        self.event: Optional[dict] = None
+        self.num = 0
+        self.price = 0.0
+        self.count = 0
+        # 已推送的累计数量/价值，增量推送时用于计算差值
+        self.emitted_num = 0
+        self.emitted_price = 0.0
+        self.last_emit = 0.0
+        self.settle_handle: Optional[asyncio.TimerHandle] = None
+        self.update_handle: Optional[asyncio.TimerHandle] = None
+
+
+class GiftComboAggregator:
+    """
+    礼物连击聚合
+
+    以 (uid, gift_id, batch_combo_id) 为键累计礼物：首条礼物立即推送，之后至多每 update_interval 秒
+    推送一次增量更新；settle 秒内没有新礼物时连击结束，推送最后的增量 (没有新增时改为回调 on_done 通知结束)
+    并回调 on_settle (用于保存一条合计记录)。
+    """
+
+    def __init__(
+        self,
+        settle: float,
+        update_interval: float,
+        on_update: Callable[[GiftCombo, bool], None],
+        on_settle: Callable[[GiftCombo], None],
+        on_done: Optional[Callable[[GiftCombo], None]] = None,
+    ):
+        """
+        Args:
+            settle (float): 超过该时长 (秒) 没有新礼物视为连击结束
+            update_interval (float): 增量推送的最小间隔 (秒)
+            on_update: 推送回调 (combo, final)，回调返回后当前累计值记为已推送
+            on_settle: 连击结束回调，在最后一次推送之后调用
+            on_done: 连击结束时上次推送之后没有新礼物的回调 (此时不调用 on_update，不产生数量为 0 的增量)
+        """
+        self.settle = settle
+        self.update_interval = update_interval
+        self.on_update = on_update
+        self.on_settle = on_settle
+        self.on_done = on_done
+        self._combos: Dict[Tuple, GiftCombo] = {}
+
+    @staticmethod
+    def make_key(message: web_models.GiftMessage) -> Tuple:
+        return message.uid, message.gift_id, message.batch_combo_id
+
+    def add(self, message: web_models.GiftMessage, price: float, resp: dm_schema.GiftResponse):
+        """
+        登记一条礼物消息
+
+        Args:
+            message (GiftMessage): 礼物消息
+            price (float): 该条消息的价值 (元)
+            resp (GiftResponse): 该条消息的推送数据，连击首条的作为后续推送的模板
+        """
+        loop = asyncio.get_running_loop()
+        key = self.make_key(message)
+        combo = self._combos.get(key)
+        is_new = combo is None
+        if is_new:
+            combo = self._combos[key] = GiftCombo(key, message, resp)
+
+        combo.num += message.num
+        # 金瓜子换算的价值精确到 0.001 元，避免累加误差
+        combo.price = round(combo.price + price, 3)
+        combo.count += 1
+
+        if combo.settle_handle is not None:
+            combo.settle_handle.cancel()
+        combo.settle_handle = loop.call_later(self.settle, self._settle, key)
+
+        if is_new:
+            self._emit(combo, final=False)
+        elif combo.update_handle is None:
+            delay = max(0.0, combo.last_emit + self.update_interval - time.monotonic())
+            combo.update_handle = loop.call_later(delay, self._scheduled_update, key)
+
+    def _scheduled_update(self, key: Tuple):
+        combo = self._combos.get(key)
+        if combo is None:
+            return
+        combo.update_handle = None
+        self._emit(combo, final=False)
+
+    def _emit(self, combo: GiftCombo, final: bool):
+        if combo.num == combo.emitted_num:
+            if final and self.on_done is not None:
+                self.on_done(combo)
+            return
+        self.on_update(combo, final)
+        combo.emitted_num = combo.num
+        combo.emitted_price = combo.price
+        combo.last_emit = time.monotonic()
+
+    def _settle(self, key: Tuple):
+        combo = self._combos.pop(key, None)
+        if combo is None:
+            return
+        if combo.update_handle is not None:
+            combo.update_handle.cancel()
+            combo.update_handle = None
+        self._emit(combo, final=True)
+        self.on_settle(combo)
+
+    def flush(self):
+        """立即结束所有进行中的连击 (停止监听或关闭时调用)"""
+        for key in list(self._combos):
+            combo = self._combos[key]
+            if combo.settle_handle is not None:
+                combo.settle_handle.cancel()
+            self._settle(key)
+
+    @property
+    def active(self) -> int:
+        return len(self._combos)
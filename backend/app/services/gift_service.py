@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 import aiohttp
+import hashlib
+import json
 import logging
-from typing import Optional, List
+import time
+from typing import Dict, Optional, List, Tuple
 from backend.app.schemas import danmaku as dm_schema
 from backend.app.crud.danmaku import crud_danmaku
 from backend.app.crud.auth import crud_auth
-from backend.database.db import AsyncSessionLocal
+from backend.database.db import AsyncSessionLocal, AsyncReadSessionLocal
 from backend.core.conf import settings
-from backend.app.models import danmaku as dm_model
 
 logger = logging.getLogger(__name__)
 
@@ -15,39 +17,122 @@ class GiftService:
     """
     礼物服务
     负责获取和保存直播间礼物配置信息
+
+    礼物信息在内存中按礼物 ID 和名称建立索引，处理礼物消息时直接查询，不访问数据库。
+    各房间的礼物面板按 GIFT_CATALOG_TTL 刷新，内容没有变化 (ETag 或内容摘要相同) 时跳过写库。
     """
-    
-    async def fetch_and_save(self, room_id: int, user_name: Optional[str] = None) -> List[dm_model.GiftInfoRoom]:
+
+    def __init__(self):
+        self._by_id: Dict[int, dm_schema.GiftInfoRoomResponse] = {}
+        self._by_name: Dict[str, dm_schema.GiftInfoRoomResponse] = {}
+        self._loaded = False
+        # room_id -> (刷新时间, ETag, 内容摘要, 该房间的礼物名称)
+        self._rooms: Dict[int, Tuple[float, Optional[str], str, List[str]]] = {}
+
+    def _index(self, gifts: List[dm_schema.GiftInfoRoomResponse]):
+        for gift in gifts:
+            self._by_name[gift.name] = gift
+            if gift.gift_id:
+                self._by_id[gift.gift_id] = gift
+
+    async def load(self):
+        """从数据库加载全部礼物信息到内存索引"""
+        async with AsyncReadSessionLocal() as db:
+            gifts = await crud_danmaku.get_all_gift_info_room(db)
+        self._by_id.clear()
+        self._by_name.clear()
+        self._index([dm_schema.GiftInfoRoomResponse.model_validate(g) for g in gifts])
+        self._loaded = True
+        logger.info(f"加载 {len(self._by_name)} 个礼物信息到内存索引")
+
+    async def get_all(self) -> List[dm_schema.GiftInfoRoomResponse]:
+        """全部礼物信息 (按数据库 ID 排序)"""
+        if not self._loaded:
+            await self.load()
+        return sorted(self._by_name.values(), key=lambda g: g.id)
+
+    def lookup(self, gift_id: Optional[int] = None, name: Optional[str] = None) -> Optional[dm_schema.GiftInfoRoomResponse]:
+        """
+        按礼物 ID (优先) 或名称查询礼物信息，只读内存索引
+
+        Args:
+            gift_id (Optional[int]): B站礼物 ID
+            name (Optional[str]): 礼物名称
+
+        Returns:
+            Optional[GiftInfoRoomResponse]: 未收录时返回 None
         """
-        获取指定直播间的礼物列表并保存到数据库
+        if gift_id:
+            gift = self._by_id.get(gift_id)
+            if gift is not None:
+                return gift
+        if name:
+            return self._by_name.get(name)
+        return None
+
+    async def fetch_and_save(self, room_id: int, user_name: Optional[str] = None) -> List[dm_schema.GiftInfoRoomResponse]:
+        """
+        获取指定直播间的礼物列表并保存到数据库 (忽略刷新间隔)
 
         Args:
             room_id (int): 直播间 ID
             user_name (Optional[str]): 关联的用户名 (用于获取 SESSDATA)
 
         Returns:
-            List[dm_model.GiftInfoRoom]: 保存的礼物信息列表
+            List[GiftInfoRoomResponse]: 该房间礼物面板中的礼物信息列表
 
         Raises:
             RuntimeError: API 请求失败或其他错误
         """
-        url = f"{settings.BILIBILI_API_GIFT_LIST}?platform=pc&room_id={room_id}"
-
-        cookies = None
-        async with AsyncSessionLocal() as db:
-            if user_name:
+        sessdata = None
+        if user_name:
+            async with AsyncSessionLocal() as db:
                 user = await crud_auth.get_user_by_name(db, user_name)
                 if user and user.sessdata:
-                    cookies = {'SESSDATA': user.sessdata}
+                    sessdata = user.sessdata
+        return await self.refresh_room(room_id, sessdata, force=True)
+
+    async def refresh_room(self, room_id: int, sessdata: Optional[str] = None, force: bool = False) -> List[dm_schema.GiftInfoRoomResponse]:
+        """
+        刷新指定直播间的礼物面板
 
+        距上次刷新不足 GIFT_CATALOG_TTL 时直接返回缓存；礼物面板没有变化时只更新刷新时间，不写数据库。
+
+        Args:
+            room_id (int): 直播间 ID
+            sessdata (Optional[str]): 请求使用的 SESSDATA
+            force (bool): 是否忽略刷新间隔
+
+        Returns:
+            List[GiftInfoRoomResponse]: 该房间礼物面板中的礼物信息列表
+
+        Raises:
+            RuntimeError: API 请求失败或其他错误
+        """
+        if not self._loaded:
+            await self.load()
+
+        state = self._rooms.get(room_id)
+        if state is not None and not force and time.monotonic() - state[0] < settings.GIFT_CATALOG_TTL:
+            return self._room_gifts(state[3])
+
+        url = f"{settings.BILIBILI_API_GIFT_LIST}?platform=pc&room_id={room_id}"
+        cookies = {'SESSDATA': sessdata} if sessdata else None
         headers = {
             "User-Agent": settings.HEADERS.get("User-Agent"),
             "Referer": f"https://live.bilibili.com/{room_id}",
         }
+        if state is not None and state[1]:
+            headers["If-None-Match"] = state[1]
 
         try:
             async with aiohttp.ClientSession(cookies=cookies, headers=headers) as session:
                 async with session.get(url) as resp:
+                    if resp.status == 304 and state is not None:
+                        self._rooms[room_id] = (time.monotonic(), state[1], state[2], state[3])
+                        logger.info(f"房间 {room_id} 礼物列表未变化 (ETag)")
+                        return self._room_gifts(state[3])
+                    etag = resp.headers.get("ETag")
                     data = await resp.json()
                     if data.get("code") != 0:
                         error_msg = f"API错误: code={data.get('code')}, message={data.get('message')}"
@@ -55,48 +140,60 @@ class GiftService:
                         raise RuntimeError(error_msg)
                     api_data = data.get("data", {})
 
-            gifts: list[dm_schema.GiftInfoRoomCreate] = []
-
-            gift_config = api_data.get("gift_config", {})
-            
-            base_list = []
-            if isinstance(gift_config.get("base_config"), dict):
-                base_list = gift_config.get("base_config", {}).get("list", []) or []
-                
-            room_list = []
-            if isinstance(gift_config.get("room_config"), dict):
-                room_list = gift_config.get("room_config", {}).get("list", []) or []
-                
-            merged = base_list + room_list
-
-            seen_names = set()
-            unique_gifts = []
-            
-            for gift in merged:
-                name = gift.get("name")
-                if name in seen_names:
-                    continue
-                seen_names.add(name)
-                
-                price = float(gift.get("price", 0))/1000.0
-                coin_type = gift.get("coin_type") or "gold"
-                img = gift.get("img_basic") or gift.get("img_dynamic") or ""
-                unique_gifts.append(dm_schema.GiftInfoRoomCreate(
-                    name=name, price=price, coin_type=coin_type, img=img
-                ))
+            unique_gifts = self._parse_gift_config(api_data.get("gift_config", {}))
+            names = list(unique_gifts)
+            digest = hashlib.sha1(
+                json.dumps([g.model_dump() for g in unique_gifts.values()], ensure_ascii=False).encode("utf-8")
+            ).hexdigest()
+            if state is not None and state[2] == digest:
+                self._rooms[room_id] = (time.monotonic(), etag, digest, names)
+                logger.info(f"房间 {room_id} 礼物列表未变化，跳过保存")
+                return self._room_gifts(names)
 
             async with AsyncSessionLocal() as db:
                 async with db.begin():
                     try:
-                        saved = await crud_danmaku.replace_gift_info_room(db, unique_gifts)
-                        logger.info(f"成功保存 {len(saved)} 个礼物信息到数据库 (去重前 {len(merged)} 个)")
-                        return saved
+                        saved = await crud_danmaku.upsert_gift_info_room(db, list(unique_gifts.values()))
+                        gifts = [dm_schema.GiftInfoRoomResponse.model_validate(g) for g in saved]
+                        logger.info(f"成功保存 {len(saved)} 个礼物信息到数据库")
                     except Exception as e:
                         logger.error(f"保存礼物信息到数据库失败: {e}")
                         raise e
-                        
+
+            self._index(gifts)
+            self._rooms[room_id] = (time.monotonic(), etag, digest, names)
+            return self._room_gifts(names)
+
         except Exception as e:
             logger.error(f"获取或保存礼物信息流程异常: {e}")
             raise e
 
+    @staticmethod
+    def _parse_gift_config(gift_config: dict) -> Dict[str, dm_schema.GiftInfoRoomCreate]:
+        """合并通用礼物和房间礼物，按名称去重 (先出现的优先)"""
+        base_list = []
+        if isinstance(gift_config.get("base_config"), dict):
+            base_list = gift_config.get("base_config", {}).get("list", []) or []
+
+        room_list = []
+        if isinstance(gift_config.get("room_config"), dict):
+            room_list = gift_config.get("room_config", {}).get("list", []) or []
+
+        unique_gifts: Dict[str, dm_schema.GiftInfoRoomCreate] = {}
+        for gift in base_list + room_list:
+            name = gift.get("name")
+            if not name or name in unique_gifts:
+                continue
+            unique_gifts[name] = dm_schema.GiftInfoRoomCreate(
+                gift_id=gift.get("id"),
+                name=name,
+                price=float(gift.get("price", 0))/1000.0,
+                coin_type=gift.get("coin_type") or "gold",
+                img=gift.get("img_basic") or gift.get("img_dynamic") or "",
+            )
+        return unique_gifts
+
+    def _room_gifts(self, names: List[str]) -> List[dm_schema.GiftInfoRoomResponse]:
+        return [self._by_name[name] for name in names if name in self._by_name]
+
 gift_service : GiftService = GiftService()
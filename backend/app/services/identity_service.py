@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+from backend.app.crud.auth import crud_auth
+from backend.app.services.stats_service import SlidingCounter
+from backend.core.conf import settings
+from backend.database.db import AsyncReadSessionLocal
+from backend.utils.task_supervisor import background_tasks
+
+# 风控相关的返回码：-352 风控校验失败，-412 请求被拦截
+THROTTLE_CODES = (-352, -412)
+
+
+class Identity:
+    """
+    账号池中的一个账号 (对应一条 Auth 记录)，持有预先建好的会话，该账号的所有房间共用
+    """
+
+    __slots__ = (
+        "auth_id", "user_name", "uid", "sessdata", "session", "rooms", "requests", "strikes", "cooldown_until",
+    )
+
+    def __init__(self, auth_id: int, user_name: str, uid: Optional[str], sessdata: str):
+        self.auth_id = auth_id
+        self.user_name = user_name
+        self.uid = uid
+        self.sessdata = sessdata
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.rooms: set = set()
+        # 最近 60 秒的请求数 (1 秒一桶)
+        self.requests = SlidingCounter(1, 60)
+        # 连续被风控的次数，决定冷却时间
+        self.strikes = 0
+        self.cooldown_until = 0.0
+
+    def is_cooling(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def used_budget(self, now: float) -> int:
+        return int(self.requests.total(now))
+
+    def snapshot(self) -> dict:
+        return {
+            "user_name": self.user_name,
+            "uid": self.uid,
+            "rooms": sorted(self.rooms),
+            "requests_last_minute": self.used_budget(time.time()),
+            "strikes": self.strikes,
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+        }
+
+
+class IdentityPool:
+    """
+    账号池服务
+    为数据库中的每个账号维护一个预热好的会话，按负载 (房间数、最近请求数) 给直播间分配账号。
+
+    每个会话通过 aiohttp TraceConfig 记录请求数 (每分钟预算 IDENTITY_REQUEST_BUDGET) 和风控返回 (HTTP 412、
+    code -352/-412)；被风控的账号按指数退避冷却，冷却期间不再分配，并通知 BLiveService 把其房间换到其他账号。
+    """
+
+    def __init__(self):
+        # auth_id -> Identity
+        self._identities: Dict[int, Identity] = {}
+        # room_id -> 分配的账号
+        self._room_identity: Dict[int, Identity] = {}
+        # 已从数据库删除但仍有房间在用的账号，房间释放后关闭会话
+        self._retired: List[Identity] = []
+        self._loaded = False
+        self._on_throttled: Optional[Callable[[Identity, List[int]], None]] = None
+
+    def set_throttle_callback(self, callback: Callable[[Identity, List[int]], None]):
+        """设置账号被风控时的回调 (identity, 该账号正在使用的房间)"""
+        self._on_throttled = callback
+
+    def invalidate(self):
+        """账号有增删改时调用，下次分配前重新加载"""
+        self._loaded = False
+
+    async def load(self):
+        """从数据库加载账号，为新账号创建会话，关闭已删除账号的会话"""
+        async with AsyncReadSessionLocal() as db:
+            auths = await crud_auth.get_all_users(db)
+
+        current: Dict[int, Identity] = {}
+        for auth in auths:
+            if not auth.sessdata:
+                continue
+            identity = self._identities.pop(auth.id, None)
+            if identity is not None and identity.sessdata != auth.sessdata:
+                # SESSDATA 变了，旧会话等房间释放后关闭
+                self._retire(identity)
+                identity = None
+            if identity is None:
+                identity = Identity(auth.id, auth.user_name, auth.uid, auth.sessdata)
+                identity.session = self._create_session(identity)
+            identity.user_name = auth.user_name
+            current[auth.id] = identity
+
+        for identity in self._identities.values():
+            self._retire(identity)
+        self._identities = current
+        self._loaded = True
+        logger.info(f"账号池加载 {len(current)} 个账号")
+
+    def _retire(self, identity: Identity):
+        if identity.rooms:
+            self._retired.append(identity)
+        elif identity.session is not None:
+            self._close_soon(identity)
+
+    @staticmethod
+    def _close_soon(identity: Identity):
+        session, identity.session = identity.session, None
+        if session is not None and not session.closed:
+            background_tasks.spawn(session.close(), name="identity-session-close")
+
+    def _create_session(self, identity: Identity) -> aiohttp.ClientSession:
+        cookie = SimpleCookie()
+        cookie["SESSDATA"] = identity.sessdata
+        cookie["SESSDATA"]["domain"] = "bilibili.com"
+        cookie_jar = aiohttp.CookieJar()
+        cookie_jar.update_cookies(cookie)
+
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(_session, _ctx, _params):
+            identity.requests.add(1, time.time())
+
+        async def on_request_end(_session, _ctx, params: aiohttp.TraceRequestEndParams):
+            await self._check_response(identity, params.response)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        return aiohttp.ClientSession(
+            cookie_jar=cookie_jar,
+            headers={"User-Agent": settings.HEADERS["User-Agent"]},
+            trace_configs=[trace_config],
+        )
+
+    async def _check_response(self, identity: Identity, response: aiohttp.ClientResponse):
+        if response.status == 412:
+            self.report_throttled(identity, -412)
+            return
+        if response.status != 200 or "json" not in response.content_type:
+            return
+        # 读出的内容会缓存在 response 中，调用方之后仍可正常读取
+        body = await response.read()
+        try:
+            data = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            return
+        code = data.get("code") if isinstance(data, dict) else None
+        if code in THROTTLE_CODES:
+            self.report_throttled(identity, code)
+            return
+        if identity.strikes and not identity.is_cooling(time.monotonic()):
+            identity.strikes = 0
+
+    def report_throttled(self, identity: Identity, code: int):
+        """
+        记录账号被风控，开始冷却并通知回调
+
+        Args:
+            identity (Identity): 账号
+            code (int): 风控返回码
+        """
+        now = time.monotonic()
+        if identity.is_cooling(now):
+            # 冷却期间在途请求的风控结果不重复计算
+            return
+        identity.strikes += 1
+        cooldown = min(
+            settings.IDENTITY_COOLDOWN_BASE * 2 ** (identity.strikes - 1), settings.IDENTITY_COOLDOWN_MAX
+        )
+        identity.cooldown_until = now + cooldown
+        logger.warning(f"账号 {identity.user_name} 被风控 (code={code})，冷却 {cooldown:.0f} 秒")
+        if self._on_throttled is not None and identity.rooms:
+            self._on_throttled(identity, sorted(identity.rooms))
+
+    def _pick(self, exclude: Optional[Identity] = None) -> Optional[Identity]:
+        now = time.monotonic()
+        wall_now = time.time()
+        candidates = [
+            identity for identity in self._identities.values()
+            if identity is not exclude
+            and not identity.is_cooling(now)
+            and identity.used_budget(wall_now) < settings.IDENTITY_REQUEST_BUDGET
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda identity: (len(identity.rooms), identity.used_budget(wall_now)))
+
+    def has_available(self, exclude: Optional[Identity] = None) -> bool:
+        """除 exclude 外是否还有可分配的账号"""
+        return self._pick(exclude) is not None
+
+    async def acquire(self, room_id: int, sessdata: Optional[str] = None) -> Optional[Identity]:
+        """
+        为直播间分配账号
+
+        Args:
+            room_id (int): 直播间 ID
+            sessdata (Optional[str]): 指定的 SESSDATA，属于池中账号时使用该账号的会话，否则返回 None
+
+        Returns:
+            Optional[Identity]: 分配的账号，没有可用账号时返回 None
+        """
+        if not self._loaded:
+            await self.load()
+        self.release(room_id)
+
+        if sessdata:
+            identity = next((i for i in self._identities.values() if i.sessdata == sessdata), None)
+            if identity is not None and identity.is_cooling(time.monotonic()):
+                logger.warning(f"指定的账号 {identity.user_name} 正在冷却")
+        else:
+            identity = self._pick()
+        if identity is None:
+            return None
+
+        identity.rooms.add(room_id)
+        self._room_identity[room_id] = identity
+        return identity
+
+    def release(self, room_id: int):
+        """直播间停止监听时释放账号"""
+        identity = self._room_identity.pop(room_id, None)
+        if identity is None:
+            return
+        identity.rooms.discard(room_id)
+        if not identity.rooms and identity in self._retired:
+            self._retired.remove(identity)
+            self._close_soon(identity)
+
+    def get(self, room_id: int) -> Optional[Identity]:
+        return self._room_identity.get(room_id)
+
+    def snapshot(self) -> List[dict]:
+        """各账号的状态，用于 /api/v1/identities"""
+        return [identity.snapshot() for identity in self._identities.values()]
+
+    async def close(self):
+        """关闭所有会话"""
+        for identity in [*self._identities.values(), *self._retired]:
+            if identity.session is not None and not identity.session.closed:
+                await identity.session.close()
+        self._identities.clear()
+        self._retired.clear()
+        self._room_identity.clear()
+        self._loaded = False
+
+identity_pool : IdentityPool = IdentityPool()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from backend.app.crud.danmaku import crud_danmaku
+from backend.app.crud.rollup import crud_rollup
+from backend.app.models import danmaku as dm_model
+from backend.app.services.rollup_service import WATERMARK_NAME, floor_time
+from backend.core.conf import settings
+from backend.database.db import AsyncReadSessionLocal, AsyncSessionLocal, engine
+from backend.utils.timezone import timezone
+
+# 表名 -> 模型
+RETENTION_MODELS = {
+    model.__tablename__: model for model in (dm_model.Danmaku, dm_model.Gift, dm_model.SuperChat)
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+
+class RetentionService:
+    """
+    数据保留与归档服务
+
+    按 RETENTION_DAYS 把各表超过保留天数的记录按天追加写入
+    {RETENTION_ARCHIVE_DIR}/{表名}/{YYYY-MM-DD}.ndjson.gz (多个 gzip 成员顺序拼接，可直接用 gzip 读取)，
+    落盘后再以小批次删除，避免长事务阻塞实时写入；删除完成后增量回收空闲页。
+    写入归档与删除之间若进程中断，重跑时同一批记录会再次追加，可按 id 去重。
+    """
+
+    def __init__(self):
+        self.archive_dir: Path = settings.RETENTION_ARCHIVE_DIR
+
+    def archive_path(self, table: str, day: date) -> Path:
+        return self.archive_dir / table / f"{day.isoformat()}.ndjson.gz"
+
+    def list_archives(self) -> Dict[str, List[str]]:
+        """列出已有归档：表名 -> 日期列表"""
+        archives = {}
+        for table in RETENTION_MODELS:
+            directory = self.archive_dir / table
+            if directory.exists():
+                archives[table] = sorted(p.name.split(".")[0] for p in directory.glob("*.ndjson.gz"))
+        return archives
+
+    def _write_archive(self, table: str, rows: List[dict]):
+        by_day: Dict[date, List[dict]] = {}
+        for row in rows:
+            by_day.setdefault(row["create_time"].date(), []).append(row)
+        for day, day_rows in by_day.items():
+            path = self.archive_path(table, day)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                    for row in day_rows:
+                        f.write((json.dumps(row, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    async def _cutoff(self, days: int) -> Optional[datetime]:
+        """
+        保留期截止时间 (按天对齐)；不会超过分时汇总进度，避免删除尚未汇总的记录。
+        汇总尚未运行过时返回 None
+        """
+        cutoff = floor_time(timezone.now(), "day") - timedelta(days=days)
+        if settings.ROLLUP_ENABLED:
+            async with AsyncReadSessionLocal() as db:
+                watermark = await crud_rollup.get_watermark(db, WATERMARK_NAME)
+            if watermark is None:
+                return None
+            cutoff = min(cutoff, floor_time(timezone.to_local(watermark), "day"))
+        return cutoff
+
+    async def archive_table(self, table: str, days: int) -> int:
+        """
+        归档并删除一张表中超过保留天数的记录
+
+        Args:
+            table (str): 表名
+            days (int): 保留天数
+
+        Returns:
+            int: 归档的记录数
+        """
+        model = RETENTION_MODELS[table]
+        cutoff = await self._cutoff(days)
+        if cutoff is None:
+            return 0
+        total = 0
+        while True:
+            async with AsyncReadSessionLocal() as db:
+                rows = await crud_danmaku.get_expired_rows(db, model, cutoff, settings.RETENTION_BATCH_SIZE)
+            if not rows:
+                break
+            await asyncio.to_thread(self._write_archive, table, rows)
+            async with AsyncSessionLocal() as db:
+                await crud_danmaku.delete_by_ids(db, model, [row["id"] for row in rows])
+                await db.commit()
+            total += len(rows)
+            # 批次之间让出写连接
+            await asyncio.sleep(0)
+        if total:
+            logger.info(f"表 {table} 归档 {total} 条早于 {cutoff:%Y-%m-%d} 的记录")
+        return total
+
+    async def vacuum(self):
+        """
+        回收删除后的空闲页
+
+        只在 auto_vacuum=INCREMENTAL 时执行有页数上限的 incremental_vacuum，每次只短暂占用写连接。
+        旧数据库需要先执行迁移 (alembic upgrade head) 切换为增量回收模式，后台任务不会执行完整 VACUUM
+        """
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            auto_vacuum = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+            if auto_vacuum != 2:
+                logger.warning("数据库未开启 auto_vacuum=INCREMENTAL，跳过空闲页回收，请执行 alembic upgrade head")
+                return
+            # execute 只 step 一次 (只回收一页)，executescript 会把语句执行完
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(settings.RETENTION_VACUUM_PAGES)});")
+
+    async def run_once(self) -> int:
+        """按保留策略处理所有表，返回归档的记录总数"""
+        total = 0
+        for table, days in settings.RETENTION_DAYS.items():
+            if table not in RETENTION_MODELS:
+                logger.warning(f"保留策略中的表 {table} 不存在，已跳过")
+                continue
+            if days > 0:
+                total += await self.archive_table(table, days)
+        if total:
+            await self.vacuum()
+        return total
+
+    async def run(self):
+        """后台循环：定期执行归档"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"数据归档失败: {e}")
+            await asyncio.sleep(settings.RETENTION_INTERVAL)
+
+retention_service : RetentionService = RetentionService()
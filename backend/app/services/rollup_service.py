@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from datetime import datetime, timedelta
+
+from loguru import logger
+
+from backend.app.crud.rollup import GRANULARITY_FORMATS, crud_rollup
+from backend.core.conf import settings
+from backend.database.db import AsyncReadSessionLocal, AsyncSessionLocal
+from backend.utils.timezone import timezone
+
+# rollup_state 中记录事件汇总进度的名称
+WATERMARK_NAME = "events"
+
+
+def floor_time(t: datetime, granularity: str) -> datetime:
+    """把时间向下对齐到粒度的时间桶起点"""
+    t = t.replace(second=0, microsecond=0)
+    if granularity in ("hour", "day"):
+        t = t.replace(minute=0)
+    if granularity == "day":
+        t = t.replace(hour=0)
+    return t
+
+
+class RollupService:
+    """
+    分时汇总服务
+    后台定期把已完整的分钟内的原始事件汇总到 room_rollup / room_gift_rollup 表 (分钟、小时、天三种粒度)，
+    分析接口只读汇总表。汇总进度 (watermark) 持久化在 rollup_state 表，重启后从断点继续；
+    首次运行时从最早的事件开始按天分批回填。
+    """
+
+    async def compact_once(self) -> int:
+        """
+        汇总 watermark 到当前完整分钟之间的事件
+
+        Returns:
+            int: 本次处理的批次数 (每批最多一天)
+        """
+        end = floor_time(timezone.now() - timedelta(seconds=settings.ROLLUP_GRACE_SECONDS), "minute")
+
+        async with AsyncReadSessionLocal() as db:
+            watermark = await crud_rollup.get_watermark(db, WATERMARK_NAME)
+            if watermark is None:
+                watermark = await crud_rollup.get_earliest_event_time(db)
+        if watermark is None:
+            return 0
+        watermark = floor_time(timezone.to_local(watermark), "minute")
+
+        steps = 0
+        while watermark < end:
+            # 每批不跨天，回填大量历史数据时单个写事务也保持较小
+            step_end = min(end, floor_time(watermark, "day") + timedelta(days=1))
+            # 只有新的分钟从原始事件聚合；小时/天由分钟汇总累加，独立发送者由保存的发送者集合增量计算，
+            # 不再每分钟重扫整个小时/天的原始事件
+            results = {}
+            async with AsyncReadSessionLocal() as db:
+                minute_rollups, minute_gifts = await crud_rollup.aggregate(db, "minute", watermark, step_end)
+                minute_senders = await crud_rollup.get_minute_senders(db, watermark, step_end)
+                results["minute"] = (watermark, (minute_rollups, minute_gifts, None))
+                for granularity in GRANULARITY_FORMATS:
+                    if granularity == "minute":
+                        continue
+                    start = floor_time(watermark, granularity)
+                    results[granularity] = (start, await crud_rollup.derive(
+                        db, granularity, start, watermark, step_end, minute_rollups, minute_gifts, minute_senders
+                    ))
+
+            # 聚合查询走只读连接，写连接只用于覆盖汇总行，不阻塞实时写入
+            async with AsyncSessionLocal() as db:
+                for granularity, (start, (rollups, gifts, senders)) in results.items():
+                    await crud_rollup.replace_buckets(db, granularity, start, rollups, gifts, senders)
+                    if granularity != "minute":
+                        await crud_rollup.prune_senders(db, granularity, floor_time(step_end, granularity))
+                await crud_rollup.set_watermark(db, WATERMARK_NAME, step_end)
+                await db.commit()
+
+            watermark = step_end
+            steps += 1
+            await asyncio.sleep(0)
+        return steps
+
+    async def run(self):
+        """后台循环：定期执行汇总"""
+        while True:
+            try:
+                steps = await self.compact_once()
+                if steps > 1:
+                    logger.info(f"分时汇总完成 {steps} 批")
+            except Exception as e:
+                logger.error(f"分时汇总失败: {e}")
+            await asyncio.sleep(settings.ROLLUP_INTERVAL)
+
+rollup_service : RollupService = RollupService()
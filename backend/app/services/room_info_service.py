@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+
+from backend.core.conf import settings
+
+
+class RoomInfoService:
+    """
+    直播间信息服务
+    解析短号、获取标题和主播名称，结果按 ROOM_INFO_TTL 缓存 (短号和真实房间号都可命中)
+
+    单个房间优先用 getInfoByRoom 一次取回房间和主播信息；批量查询时已知主播 uid 的房间
+    合并为一次 get_status_info_by_uids 请求，其余房间并发请求。同一房间的并发查询只发一次请求。
+    """
+
+    def __init__(self):
+        # room_id (请求的房间号或真实房间号) -> (获取时间, 房间信息)，过期条目保留用于批量刷新
+        self._cache: Dict[int, Tuple[float, dict]] = {}
+        self._inflight: Dict[int, asyncio.Future] = {}
+
+    def get_cached(self, room_id: int, allow_expired: bool = False) -> Optional[dict]:
+        entry = self._cache.get(room_id)
+        if entry is None:
+            return None
+        if not allow_expired and time.monotonic() - entry[0] >= settings.ROOM_INFO_TTL:
+            return None
+        return entry[1]
+
+    def _store(self, info: dict, *room_ids: int):
+        now = time.monotonic()
+        for room_id in {info["room_id"], info["short_id"], *room_ids}:
+            if room_id:
+                self._cache[room_id] = (now, info)
+
+    async def get_room_info(
+        self, room_id: int, session: Optional[aiohttp.ClientSession] = None, force: bool = False
+    ) -> Optional[dict]:
+        """
+        获取直播间信息
+
+        Args:
+            room_id (int): 房间号 (可以是短号)
+            session (Optional[aiohttp.ClientSession]): 请求使用的会话，为 None 时临时创建
+            force (bool): 是否忽略缓存
+
+        Returns:
+            Optional[dict]: {room_id, short_id, uid, title, host_name, live_status}，获取失败返回 None
+        """
+        if not force:
+            info = self.get_cached(room_id)
+            if info is not None:
+                return info
+
+        future = self._inflight.get(room_id)
+        if future is None:
+            future = self._inflight[room_id] = asyncio.ensure_future(self._fetch_one(room_id, session))
+            future.add_done_callback(lambda _: self._inflight.pop(room_id, None))
+        return await asyncio.shield(future)
+
+    async def get_room_infos(
+        self, room_ids: Iterable[int], session: Optional[aiohttp.ClientSession] = None
+    ) -> Dict[int, Optional[dict]]:
+        """
+        批量获取直播间信息
+
+        Args:
+            room_ids (Iterable[int]): 房间号列表
+            session (Optional[aiohttp.ClientSession]): 请求使用的会话，为 None 时临时创建
+
+        Returns:
+            Dict[int, Optional[dict]]: 房间号 -> 房间信息 (获取失败为 None)
+        """
+        result: Dict[int, Optional[dict]] = {}
+        # 主播 uid -> 请求的房间号
+        by_uid: Dict[int, int] = {}
+        unknown: List[int] = []
+        for room_id in dict.fromkeys(room_ids):
+            info = self.get_cached(room_id)
+            if info is not None:
+                result[room_id] = info
+                continue
+            stale = self.get_cached(room_id, allow_expired=True)
+            if stale is not None and stale.get("uid"):
+                by_uid[stale["uid"]] = room_id
+            else:
+                unknown.append(room_id)
+
+        own_session = session is None
+        if own_session:
+            session = aiohttp.ClientSession(headers={"User-Agent": settings.HEADERS["User-Agent"]})
+        try:
+            if by_uid:
+                infos = await self._fetch_by_uids(list(by_uid), session)
+                for uid, room_id in by_uid.items():
+                    info = infos.get(uid)
+                    if info is None:
+                        unknown.append(room_id)
+                    else:
+                        self._store(info, room_id)
+                        result[room_id] = info
+
+            semaphore = asyncio.Semaphore(settings.ROOM_INFO_CONCURRENCY)
+
+            async def fetch(room_id: int):
+                async with semaphore:
+                    result[room_id] = await self.get_room_info(room_id, session)
+
+            await asyncio.gather(*(fetch(room_id) for room_id in unknown))
+        finally:
+            if own_session:
+                await session.close()
+        return result
+
+    async def _fetch_one(self, room_id: int, session: Optional[aiohttp.ClientSession]) -> Optional[dict]:
+        own_session = session is None
+        if own_session:
+            session = aiohttp.ClientSession(headers={"User-Agent": settings.HEADERS["User-Agent"]})
+        try:
+            info = await self._fetch_by_room(room_id, session)
+            if info is None:
+                info = await self._fetch_by_room_fallback(room_id, session)
+            if info is not None:
+                self._store(info, room_id)
+            return info
+        finally:
+            if own_session:
+                await session.close()
+
+    async def _get_json(self, session: aiohttp.ClientSession, method: str, url: str, **kwargs) -> Optional[dict]:
+        try:
+            async with session.request(method, url, **kwargs) as resp:
+                data = await resp.json(content_type=None)
+        except Exception as e:
+            logger.error(f"请求 {url} 失败: {e}")
+            return None
+        if data.get("code") != 0:
+            logger.warning(f"请求 {url} 失败: code={data.get('code')}, message={data.get('message')}")
+            return None
+        return data.get("data")
+
+    async def _fetch_by_room(self, room_id: int, session: aiohttp.ClientSession) -> Optional[dict]:
+        """一次请求获取房间和主播信息"""
+        data = await self._get_json(session, "GET", settings.BILIBILI_API_ROOM_INFO_BY_ROOM, params={"room_id": room_id})
+        try:
+            room_info = data["room_info"]
+            return {
+                "room_id": room_info["room_id"],
+                "short_id": room_info.get("short_id", 0),
+                "uid": room_info["uid"],
+                "title": room_info.get("title"),
+                "host_name": data["anchor_info"]["base_info"]["uname"],
+                "live_status": room_info.get("live_status", 0),
+            }
+        except (KeyError, TypeError):
+            return None
+
+    async def _fetch_by_room_fallback(self, room_id: int, session: aiohttp.ClientSession) -> Optional[dict]:
+        """Room/get_info + 主播信息，两次请求"""
+        data = await self._get_json(session, "GET", settings.BILIBILI_API_ROOM_INFO, params={"room_id": room_id})
+        if not data or "uid" not in data:
+            return None
+        host = await self._get_json(session, "GET", settings.BILIBILI_API_LIVE_USER_INFO, params={"uid": data["uid"]})
+        return {
+            "room_id": data["room_id"],
+            "short_id": data.get("short_id", 0),
+            "uid": data["uid"],
+            "title": data.get("title"),
+            "host_name": ((host or {}).get("info") or {}).get("uname", ""),
+            "live_status": data.get("live_status", 0),
+        }
+
+    async def _fetch_by_uids(self, uids: List[int], session: aiohttp.ClientSession) -> Dict[int, dict]:
+        """按主播 uid 批量获取房间信息，一次请求"""
+        data = await self._get_json(session, "POST", settings.BILIBILI_API_ROOM_STATUS_BY_UIDS, json={"uids": uids})
+        if not isinstance(data, dict):
+            return {}
+        return {
+            int(uid): {
+                "room_id": item["room_id"],
+                "short_id": item.get("short_id", 0),
+                "uid": int(uid),
+                "title": item.get("title"),
+                "host_name": item.get("uname", ""),
+                "live_status": item.get("live_status", 0),
+            }
+            for uid, item in data.items()
+        }
+
+room_info_service : RoomInfoService = RoomInfoService()
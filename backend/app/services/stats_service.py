@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import heapq
+import json
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from backend.core.conf import settings
+
+# 舰队名称 -> 舰队等级
+GUARD_LEVEL_MAP = {"总督": 1, "提督": 2, "舰长": 3}
+
+
+class SlidingCounter:
+    """
+    按固定时间粒度分桶的滑动窗口计数器
+
+    写入 O(1)，过期桶在写入/读取时从队首淘汰
+    """
+
+    def __init__(self, bucket_seconds: int, window_buckets: int):
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        # [桶序号, 累计值]
+        self._buckets: Deque[List[float]] = deque()
+
+    def _evict(self, current: int):
+        while self._buckets and self._buckets[0][0] <= current - self.window_buckets:
+            self._buckets.popleft()
+
+    def add(self, value: float, now: float):
+        index = int(now // self.bucket_seconds)
+        if self._buckets and self._buckets[-1][0] == index:
+            self._buckets[-1][1] += value
+        else:
+            self._buckets.append([index, value])
+        self._evict(index)
+
+    def total(self, now: float, buckets: Optional[int] = None) -> float:
+        """最近 buckets 个桶 (默认整个窗口) 的累计值"""
+        current = int(now // self.bucket_seconds)
+        self._evict(current)
+        span = self.window_buckets if buckets is None else buckets
+        return sum(value for index, value in self._buckets if index > current - span)
+
+    def series(self, now: float) -> List[Tuple[int, float]]:
+        """窗口内各桶的 (起始时间戳, 累计值)"""
+        self._evict(int(now // self.bucket_seconds))
+        return [(int(index * self.bucket_seconds), value) for index, value in self._buckets]
+
+
+class TopK:
+    """
+    维护累计值最大的 K 个键
+
+    totals 保存全部键的累计值；前 K 名用 dict + 最小堆维护，堆中的过期条目延迟清理，
+    每次更新 O(log K)
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.totals: Dict[int, float] = {}
+        self._members: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+
+    def add(self, key: int, value: float):
+        total = self.totals.get(key, 0.0) + value
+        self.totals[key] = total
+
+        if key in self._members or len(self._members) < self.k:
+            self._members[key] = total
+            heapq.heappush(self._heap, (total, key))
+        else:
+            self._drop_stale()
+            min_total, min_key = self._heap[0]
+            if total <= min_total:
+                return
+            heapq.heapreplace(self._heap, (total, key))
+            del self._members[min_key]
+            self._members[key] = total
+
+        # 过期条目过多时重建堆
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(v, k) for k, v in self._members.items()]
+            heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        while self._heap and self._members.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def top(self) -> List[Tuple[int, float]]:
+        """按累计值降序返回前 K 名 (key, total)"""
+        return sorted(self._members.items(), key=lambda item: item[1], reverse=True)
+
+
+class RoomStats:
+    """
+    单个直播间的实时统计
+    """
+
+    def __init__(self, room_id: int, top_k: int):
+        self.room_id = room_id
+        self.started_at = time.time()
+        self.danmaku_count = 0
+        self.gift_count = 0
+        self.super_chat_count = 0
+        self.total_revenue = 0.0
+        self.guard_counts: Dict[int, int] = {1: 0, 2: 0, 3: 0}
+        self.gifters = TopK(top_k)
+        self.user_names: Dict[int, str] = {}
+        # 最近 60 秒的消息数 (1 秒一桶)
+        self.messages = SlidingCounter(1, 60)
+        # 最近 60 分钟的营收 (1 分钟一桶)
+        self.revenue = SlidingCounter(60, 60)
+
+    def on_event(self, event: dict, now: float):
+        msg_type = event.get("msg_type")
+        price = float(event.get("price") or 0.0)
+
+        if msg_type == "danmaku":
+            self.danmaku_count += 1
+            self.messages.add(1, now)
+            return
+
+        if msg_type == "super_chat":
+            self.super_chat_count += 1
+            self.messages.add(1, now)
+        elif msg_type == "gift":
+            self.gift_count += 1
+        elif msg_type == "guard":
+            level = GUARD_LEVEL_MAP.get(event.get("privilege_name"))
+            if level is not None:
+                self.guard_counts[level] += int(event.get("num") or 1)
+        else:
+            return
+
+        if price <= 0:
+            return
+        self.total_revenue += price
+        self.revenue.add(price, now)
+        uid = event.get("uid")
+        if uid:
+            uid = int(uid)
+            self.user_names[uid] = event.get("user_name", "")
+            self.gifters.add(uid, price)
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "room_id": self.room_id,
+            "started_at": self.started_at,
+            "danmaku_count": self.danmaku_count,
+            "gift_count": self.gift_count,
+            "super_chat_count": self.super_chat_count,
+            "total_revenue": round(self.total_revenue, 2),
+            "guard_counts": {str(level): count for level, count in self.guard_counts.items()},
+            "msg_rate": round(self.messages.total(now) / self.messages.window_buckets, 2),
+            "revenue_last_minute": round(self.revenue.total(now, buckets=1), 2),
+            "revenue_per_minute": [
+                {"timestamp": ts, "revenue": round(value, 2)} for ts, value in self.revenue.series(now)
+            ],
+            "top_gifters": [
+                {"uid": str(uid), "user_name": self.user_names.get(uid, ""), "total": round(total, 2)}
+                for uid, total in self.gifters.top()
+            ],
+        }
+
+    def to_state(self) -> dict:
+        """持久化用的累计状态 (不含滑动窗口)"""
+        return {
+            "started_at": self.started_at,
+            "danmaku_count": self.danmaku_count,
+            "gift_count": self.gift_count,
+            "super_chat_count": self.super_chat_count,
+            "total_revenue": self.total_revenue,
+            "guard_counts": self.guard_counts,
+            "gifters": {str(uid): total for uid, total in self.gifters.totals.items()},
+            "user_names": {str(uid): name for uid, name in self.user_names.items()},
+        }
+
+    def load_state(self, state: dict):
+        self.started_at = state.get("started_at", self.started_at)
+        self.danmaku_count = state.get("danmaku_count", 0)
+        self.gift_count = state.get("gift_count", 0)
+        self.super_chat_count = state.get("super_chat_count", 0)
+        self.total_revenue = state.get("total_revenue", 0.0)
+        for level, count in state.get("guard_counts", {}).items():
+            self.guard_counts[int(level)] = count
+        self.user_names = {int(uid): name for uid, name in state.get("user_names", {}).items()}
+        for uid, total in state.get("gifters", {}).items():
+            self.gifters.add(int(uid), total)
+
+
+class StatsService:
+    """
+    实时统计服务
+    由 BLiveService 推送的事件增量更新各房间的滑动窗口统计，定期推送到订阅的 WebSocket 并持久化快照
+    """
+
+    def __init__(self):
+        self.rooms: Dict[int, RoomStats] = {}
+        self.snapshot_dir = settings.STATS_SNAPSHOT_DIR
+        self._dirty: set = set()
+
+    def _snapshot_path(self, room_id: int):
+        return self.snapshot_dir / f"{room_id}.json"
+
+    def get_room(self, room_id: int) -> RoomStats:
+        """获取房间统计，首次访问时从快照恢复"""
+        stats = self.rooms.get(room_id)
+        if stats is None:
+            stats = self.rooms[room_id] = RoomStats(room_id, settings.STATS_TOP_K)
+            path = self._snapshot_path(room_id)
+            if path.exists():
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        stats.load_state(json.load(f))
+                    logger.info(f"从快照恢复房间 {room_id} 统计数据")
+                except Exception as e:
+                    logger.warning(f"读取房间 {room_id} 统计快照失败: {e}")
+        return stats
+
+    def on_event(self, room_id: int, event: dict):
+        """
+        处理一条推送事件
+
+        Args:
+            room_id (int): 直播间 ID
+            event (dict): 序列化后的推送数据
+        """
+        self.get_room(room_id).on_event(event, event.get("timestamp") or time.time())
+        self._dirty.add(room_id)
+
+    def snapshot(self, room_id: int) -> dict:
+        return self.get_room(room_id).snapshot(time.time())
+
+    def reset(self, room_id: int):
+        """清空房间统计 (包括快照文件)"""
+        self.rooms.pop(room_id, None)
+        self._dirty.discard(room_id)
+        path = self._snapshot_path(room_id)
+        if path.exists():
+            path.unlink()
+
+    def save_snapshots(self):
+        """把有变化的房间统计写入快照文件"""
+        if not self._dirty:
+            return
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        for room_id in list(self._dirty):
+            stats = self.rooms.get(room_id)
+            if stats is None:
+                continue
+            try:
+                tmp_path = self._snapshot_path(room_id).with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(stats.to_state(), f, ensure_ascii=False)
+                tmp_path.replace(self._snapshot_path(room_id))
+            except Exception as e:
+                logger.error(f"保存房间 {room_id} 统计快照失败: {e}")
+        self._dirty.clear()
+
+    async def run(self, publish: Callable[[int, dict], Awaitable[None]], room_ids: Callable[[], List[int]]):
+        """
+        后台循环：定期推送统计并持久化快照
+
+        Args:
+            publish: 推送函数 (room_id, payload)
+            room_ids: 返回当前需要推送统计的房间列表
+        """
+        last_save = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(settings.STATS_PUSH_INTERVAL)
+                try:
+                    for room_id in room_ids():
+                        await publish(room_id, {"msg_type": "stats", **self.snapshot(room_id)})
+                    if time.monotonic() - last_save >= settings.STATS_SNAPSHOT_INTERVAL:
+                        self.save_snapshots()
+                        last_save = time.monotonic()
+                except Exception as e:
+                    logger.error(f"推送统计数据失败: {e}")
+        finally:
+            self.save_snapshots()
+
+stats_service : StatsService = StatsService()
@@ -1,3 +1,4 @@
 # -*- coding: utf-8 -*-
 from .web import *
 from .open_live import *
+from .multiplex import *
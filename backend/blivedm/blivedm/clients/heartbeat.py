@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import weakref
+from typing import *
+
+__all__ = (
+    'HeartbeatWheel',
+    'get_default_heartbeat_wheel',
+)
+
+logger = logging.getLogger('blivedm')
+
+HeartbeatCallback = Callable[[], Optional[Awaitable]]
+
+
+class HeartbeatHandle:
+    """
+    注册到时间轮的心跳任务，调用cancel()取消
+    """
+
+    __slots__ = ('_wheel', '_slot', 'callback')
+
+    def __init__(self, wheel: 'HeartbeatWheel', slot: dict, callback: HeartbeatCallback):
+        self._wheel = wheel
+        self._slot: Optional[dict] = slot
+        self.callback = callback
+
+    @property
+    def cancelled(self) -> bool:
+        return self._slot is None
+
+    def cancel(self):
+        if self._slot is None:
+            return
+        self._slot.pop(self, None)
+        self._slot = None
+        self._wheel._on_cancel()  # noqa
+
+
+class HeartbeatWheel:
+    """
+    所有客户端共用的心跳时间轮
+
+    整个时间轮只有一个定时器，每个tick执行到期槽里的回调，回调返回的协程合并到一个任务里并发执行。
+    注册时放到同一间隔里任务最少的槽，这样大量客户端同时连接时心跳也会均匀分散在整个间隔内
+
+    :param tick: 时间轮的精度（秒），心跳间隔会取整到tick的整数倍
+    """
+
+    def __init__(self, tick: float = 1.0):
+        self._tick = tick
+        # 间隔的tick数 -> 槽列表，每个槽是 handle -> None 的dict（保持插入顺序、O(1)删除）
+        self._groups: Dict[int, List[Dict[HeartbeatHandle, None]]] = {}
+        self._size = 0
+        self._tick_no = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_time = 0.0
+        self._timer_handle: Optional[asyncio.TimerHandle] = None
+        # 防止批量发送的任务被垃圾回收
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def tick(self) -> float:
+        return self._tick
+
+    def __len__(self):
+        return self._size
+
+    def register(self, interval: float, callback: HeartbeatCallback) -> HeartbeatHandle:
+        """
+        注册定时心跳，第一次调用在interval内
+
+        :param interval: 调用间隔（秒）
+        :param callback: 回调函数，可以返回一个awaitable（如发送心跳的协程），会在本tick的批量任务里执行
+        :return: 用来取消的handle
+        """
+        n_slots = max(1, round(interval / self._tick))
+        slots = self._groups.get(n_slots)
+        if slots is None:
+            slots = self._groups[n_slots] = [{} for _ in range(n_slots)]
+
+        # 选任务最少的槽，相同时选最晚到期的，保证第一次调用不早于其他客户端
+        current = self._tick_no % n_slots
+        slot_index = min(
+            range(n_slots),
+            key=lambda i: (len(slots[i]), -((i - current - 1) % n_slots))
+        )
+        slot = slots[slot_index]
+        handle = HeartbeatHandle(self, slot, callback)
+        slot[handle] = None
+        self._size += 1
+
+        if self._timer_handle is None:
+            self._start()
+        return handle
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._next_time = self._loop.time() + self._tick
+        self._timer_handle = self._loop.call_at(self._next_time, self._on_tick)
+
+    def _on_cancel(self):
+        self._size -= 1
+        if self._size == 0 and self._timer_handle is not None:
+            self._timer_handle.cancel()
+            self._timer_handle = None
+
+    def _on_tick(self):
+        self._tick_no += 1
+        awaitables = []
+        for n_slots, slots in self._groups.items():
+            slot = slots[self._tick_no % n_slots]
+            for handle in tuple(slot):
+                try:
+                    res = handle.callback()
+                except Exception:  # noqa
+                    logger.exception('heartbeat callback %r failed:', handle.callback)
+                    continue
+                if res is not None:
+                    awaitables.append(res)
+
+        if awaitables:
+            task = self._loop.create_task(self._run_batch(awaitables))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+        if self._size == 0:
+            self._timer_handle = None
+            return
+        # 按绝对时间调度，避免误差累积
+        self._next_time += self._tick
+        now = self._loop.time()
+        if self._next_time < now:
+            self._next_time = now
+        self._timer_handle = self._loop.call_at(self._next_time, self._on_tick)
+
+    @staticmethod
+    async def _run_batch(awaitables: List[Awaitable]):
+        results = await asyncio.gather(*awaitables, return_exceptions=True)
+        for res in results:
+            if isinstance(res, BaseException) and not isinstance(res, asyncio.CancelledError):
+                logger.error('heartbeat failed: %r', res)
+
+
+_default_wheels: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, HeartbeatWheel]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_default_heartbeat_wheel() -> HeartbeatWheel:
+    """
+    获取当前事件循环共用的心跳时间轮
+    """
+    loop = asyncio.get_running_loop()
+    wheel = _default_wheels.get(loop)
+    if wheel is None:
+        wheel = _default_wheels[loop] = HeartbeatWheel()
+    return wheel
@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import collections
+import json
+import logging
+import struct
+from typing import *
+
+import aiohttp
+
+from . import packets, web, ws_base
+from .. import handlers, utils
+
+__all__ = (
+    'MultiplexClient',
+)
+
+logger = logging.getLogger('blivedm')
+
+
+class _RoomView:
+    """
+    传给消息处理器的client，room_id是消息所属的房间，其他属性转发给实际的连接
+    """
+
+    __slots__ = ('_connection', '_room_id')
+
+    def __init__(self, connection: '_MultiplexConnection', room_id: int):
+        self._connection = connection
+        self._room_id = room_id
+
+    @property
+    def room_id(self) -> int:
+        return self._room_id
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def _get_command_room_id(command: dict) -> Optional[int]:
+    """
+    从业务消息里取房间ID，取不到返回None
+    """
+    for container in (command, command.get('data', None)):
+        if not isinstance(container, dict):
+            continue
+        for key in ('roomid', 'room_id', 'real_room_id'):
+            room_id = container.get(key, None)
+            if room_id:
+                try:
+                    return int(room_id)
+                except (TypeError, ValueError):
+                    pass
+    return None
+
+
+class _MultiplexConnection(web.BLiveClient):
+    """
+    复用的连接，认证时用主房间，认证成功后用REGISTER订阅其他房间
+
+    :param owner: 所属的MultiplexClient
+    :param room_id: 主房间ID
+    :param register_timeout: 等待REGISTER_REPLY的超时时间（秒）
+    """
+
+    def __init__(self, owner: 'MultiplexClient', room_id: int, *, register_timeout: float, **kwargs):
+        super().__init__(room_id, **kwargs)
+        self._owner = owner
+        self._register_timeout = register_timeout
+
+        self._extra_rooms: Dict[int, 'handlers.HandlerInterface'] = {}
+        """请求的房间ID -> 消息处理器，包括还没订阅成功的"""
+        self._registered: Dict[int, int] = {}
+        """已订阅成功的真实房间ID -> 请求的房间ID"""
+        self._pending: Deque[Tuple[int, int]] = collections.deque()
+        """已发送REGISTER还没收到回复的 (请求的房间ID, 真实房间ID)，回复按发送顺序到达"""
+        self._released: Set[int] = set()
+        """本连接上已取消订阅的真实房间ID，UNREGISTER生效前还可能收到这些房间的消息"""
+        self._authed = False
+        self._register_timer_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # 防止发送任务被垃圾回收
+        self._send_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def room_count(self) -> int:
+        return 1 + len(self._extra_rooms)
+
+    @property
+    def extra_room_ids(self) -> List[int]:
+        return list(self._extra_rooms)
+
+    def add_extra_room(self, room_id: int, handler: 'handlers.HandlerInterface'):
+        self._extra_rooms[room_id] = handler
+        if self._authed:
+            self._schedule_flush()
+
+    def remove_extra_room(self, room_id: int) -> Optional['handlers.HandlerInterface']:
+        handler = self._extra_rooms.pop(room_id, None)
+        for real_room_id, requested_room_id in list(self._registered.items()):
+            if requested_room_id == room_id:
+                del self._registered[real_room_id]
+                self._released.add(real_room_id)
+                self._send_packet_soon(real_room_id, ws_base.Operation.UNREGISTER)
+        return handler
+
+    def _schedule_flush(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_registers())
+
+            def on_done(_fu):
+                self._flush_task = None
+            self._flush_task.add_done_callback(on_done)
+
+    async def _flush_registers(self):
+        """
+        把所有还没订阅的房间的REGISTER包写进一帧发送
+        """
+        requested = {room_id for room_id, _ in self._pending}
+        requested.update(self._registered.values())
+        room_ids = [room_id for room_id in self._extra_rooms if room_id not in requested]
+        if not room_ids:
+            return
+
+        real_room_ids = await asyncio.gather(*(self._resolve_room_id(room_id) for room_id in room_ids))
+        if self._websocket is None or self._websocket.closed or not self._authed:
+            return
+
+        writer = packets.PacketWriter()
+        for room_id, real_room_id in zip(room_ids, real_room_ids):
+            if room_id not in self._extra_rooms:
+                # 等待期间被移除了
+                continue
+            # 协议没有公开，包体按认证包的字段格式发送
+            writer.write({'roomid': real_room_id}, ws_base.Operation.REGISTER)
+            self._pending.append((room_id, real_room_id))
+        if len(writer) == 0:
+            return
+
+        try:
+            await self._websocket.send_bytes(writer.getvalue())
+        except (ConnectionResetError, aiohttp.ClientConnectionError) as e:
+            logger.warning('room=%d _flush_registers() failed: %r', self.room_id, e)
+            return
+        if self._register_timer_handle is None:
+            self._register_timer_handle = asyncio.get_running_loop().call_later(
+                self._register_timeout, self._on_register_timeout
+            )
+
+    async def _resolve_room_id(self, room_id: int) -> int:
+        """
+        短号转真实房间ID，优先用init_room的缓存
+        """
+        room_cache = self._init_cache.get('room', str(room_id))
+        if room_cache is not None:
+            return room_cache['room_id']
+        try:
+            async with self._session.get(
+                web.ROOM_INIT_URL,
+                headers={'User-Agent': utils.USER_AGENT},
+                params={'room_id': room_id},
+            ) as res:
+                data = await res.json()
+                if res.status == 200 and data['code'] == 0:
+                    self._init_cache.set('room', str(room_id), {
+                        'room_id': data['data']['room_id'],
+                        'room_owner_uid': data['data']['uid'],
+                    })
+                    return data['data']['room_id']
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError, ValueError, KeyError):
+            logger.exception('room=%d _resolve_room_id(%d) failed:', self.room_id, room_id)
+        return room_id
+
+    def _send_packet_soon(self, room_id: int, operation: int):
+        if self._websocket is None or self._websocket.closed:
+            return
+
+        async def send():
+            try:
+                await self._websocket.send_bytes(self._make_packet({'roomid': room_id}, operation))
+            except (ConnectionResetError, aiohttp.ClientConnectionError, AttributeError):
+                pass
+        task = asyncio.create_task(send())
+        self._send_tasks.add(task)
+        task.add_done_callback(self._send_tasks.discard)
+
+    def _cancel_register_timer(self):
+        if self._register_timer_handle is not None:
+            self._register_timer_handle.cancel()
+            self._register_timer_handle = None
+
+    def _on_register_timeout(self):
+        self._register_timer_handle = None
+        if not self._pending:
+            return
+        logger.warning('room=%d REGISTER timed out, pending=%s', self.room_id, list(self._pending))
+        self._owner._disable_multiplex('register timeout')  # noqa
+
+    def take_extra_rooms(self) -> Dict[int, 'handlers.HandlerInterface']:
+        """
+        取出所有其他房间，并取消订阅，用于降级为每个房间一个连接
+        """
+        self._cancel_register_timer()
+        for real_room_id in self._registered:
+            self._send_packet_soon(real_room_id, ws_base.Operation.UNREGISTER)
+        extra_rooms = self._extra_rooms
+        self._extra_rooms = {}
+        self._released.update(self._registered)
+        self._released.update(real_room_id for _, real_room_id in self._pending)
+        self._registered.clear()
+        self._pending.clear()
+        return extra_rooms
+
+    async def _on_ws_close(self):
+        await super()._on_ws_close()
+        self._authed = False
+        self._cancel_register_timer()
+        self._registered.clear()
+        # 新连接不会收到旧订阅的消息
+        self._released.clear()
+        if self._pending:
+            self._pending.clear()
+            if self._owner.multiplex_supported is None:
+                # 还没确认过支持复用，发了REGISTER后没回复就断开了，可能是服务器不支持
+                self._owner._disable_multiplex('connection closed before REGISTER_REPLY')  # noqa
+        # 重连认证后重新订阅所有其他房间
+
+    async def _parse_ws_message(self, data: bytes):
+        try:
+            header = ws_base.HeaderTuple(*ws_base.HEADER_STRUCT.unpack_from(data, 0))
+        except struct.error:
+            await super()._parse_ws_message(data)
+            return
+        if header.operation not in (ws_base.Operation.REGISTER_REPLY, ws_base.Operation.CHANGE_ROOM_REPLY):
+            await super()._parse_ws_message(data)
+            return
+
+        offset = 0
+        while offset < len(data):
+            header = ws_base.HeaderTuple(*ws_base.HEADER_STRUCT.unpack_from(data, offset))
+            body = data[offset + header.raw_header_size: offset + header.pack_len]
+            self._on_register_reply(body)
+            offset += header.pack_len
+
+    async def _parse_business_message(self, header: ws_base.HeaderTuple, body: bytes):
+        await super()._parse_business_message(header, body)
+        if header.operation == ws_base.Operation.AUTH_REPLY:
+            # 认证失败会抛出AuthError，到这里说明认证成功
+            self._authed = True
+            if self._extra_rooms:
+                self._schedule_flush()
+
+    def _on_register_reply(self, body: bytes):
+        if not self._pending:
+            logger.warning('room=%d unexpected REGISTER_REPLY, body=%s', self.room_id, body)
+            return
+        room_id, real_room_id = self._pending.popleft()
+        if not self._pending:
+            self._cancel_register_timer()
+
+        try:
+            reply = json.loads(body.decode('utf-8')) if body else {}
+        except ValueError:
+            reply = {}
+        code = reply.get('code', 0) if isinstance(reply, dict) else 0
+        if code != 0:
+            logger.warning('room=%d REGISTER room %d failed, reply=%s', self.room_id, room_id, reply)
+            handler = self._extra_rooms.pop(room_id, None)
+            if handler is not None:
+                self._owner._start_dedicated(room_id, handler)  # noqa
+            return
+        if room_id in self._extra_rooms:
+            self._registered[real_room_id] = room_id
+            self._owner._on_register_success()  # noqa
+
+    def _handle_command(self, command: dict):
+        if not (self._registered or self._pending or self._released):
+            # 没有订阅过其他房间，和普通客户端一样
+            super()._handle_command(command)
+            return
+
+        room_id = _get_command_room_id(command)
+        requested_room_id = self._registered.get(room_id, None)
+        if requested_room_id is not None:
+            handler = self._extra_rooms.get(requested_room_id, None)
+            if handler is not None:
+                try:
+                    handler.handle(_RoomView(self, room_id), command)  # noqa
+                except Exception as e:
+                    logger.exception('room=%d _handle_command() failed, command=%s', requested_room_id, command,
+                                     exc_info=e)
+            return
+
+        if room_id is None:
+            if self._registered:
+                # 分不清是哪个房间的消息，复用不可靠，降级后当成主房间的消息
+                self._owner._disable_multiplex(f"unroutable command {command.get('cmd', '')}")  # noqa
+        elif room_id != self.room_id:
+            # 还没订阅成功或已取消订阅的房间的消息，不能当成主房间的消息
+            logger.debug('room=%d dropped command of unregistered room=%d, cmd=%s', self.room_id, room_id,
+                         command.get('cmd', ''))
+            return
+        super()._handle_command(command)
+
+
+class MultiplexClient:
+    """
+    实验性的复用客户端，多个房间共用一条WebSocket连接
+
+    每条连接用第一个房间认证，其他房间通过REGISTER订阅。B站没有公开这部分协议，只有服务器回复了REGISTER_REPLY、
+    并且消息里能取到房间ID时才能复用。出现以下情况时关闭复用，所有房间降级为每个房间一个连接：
+
+    - 等待REGISTER_REPLY超时，或者回复前连接断开
+    - 复用的连接上收到了取不到房间ID的消息
+
+    :param session: 所有连接共用的cookie、连接池，None表示自己创建
+    :param rooms_per_connection: 每条连接最多订阅的房间数
+    :param register_timeout: 等待REGISTER_REPLY的超时时间（秒）
+    :param client_kwargs: 创建BLiveClient的其他参数
+    """
+
+    def __init__(
+        self,
+        *,
+        session: Optional[aiohttp.ClientSession] = None,
+        rooms_per_connection: int = 8,
+        register_timeout: float = 5.0,
+        **client_kwargs,
+    ):
+        if session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+            self._own_session = True
+        else:
+            self._session = session
+            self._own_session = False
+        self._rooms_per_connection = rooms_per_connection
+        self._register_timeout = register_timeout
+        self._client_kwargs = client_kwargs
+
+        self._connections: Dict[int, _MultiplexConnection] = {}
+        """主房间ID -> 复用的连接"""
+        self._extra_room_to_connection: Dict[int, _MultiplexConnection] = {}
+        """其他房间ID -> 所在的连接"""
+        self._dedicated: Dict[int, web.BLiveClient] = {}
+        """降级后单独连接的房间"""
+        self._multiplex_supported: Optional[bool] = None
+        """None表示还不知道服务器是否支持"""
+
+    @property
+    def multiplex_supported(self) -> Optional[bool]:
+        """
+        服务器是否支持复用，None表示还没有确认
+        """
+        return self._multiplex_supported
+
+    @property
+    def room_ids(self) -> List[int]:
+        return [*self._connections, *self._extra_room_to_connection, *self._dedicated]
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._connections) + len(self._dedicated)
+
+    def add_room(self, room_id: int, handler: 'handlers.HandlerInterface'):
+        """
+        添加并开始监听一个房间，需要在事件循环中调用
+
+        :param room_id: URL中的房间ID，可以用短ID
+        :param handler: 这个房间的消息处理器
+        """
+        if room_id in self.room_ids:
+            logger.warning('room=%d is already added', room_id)
+            return
+
+        if self._multiplex_supported is False:
+            self._start_dedicated(room_id, handler)
+            return
+
+        connection = min(self._connections.values(), key=lambda conn: conn.room_count, default=None)
+        if connection is not None and connection.room_count < self._rooms_per_connection:
+            connection.add_extra_room(room_id, handler)
+            self._extra_room_to_connection[room_id] = connection
+            return
+
+        connection = _MultiplexConnection(
+            self, room_id, register_timeout=self._register_timeout, session=self._session, **self._client_kwargs
+        )
+        connection.set_handler(handler)
+        self._connections[room_id] = connection
+        connection.start()
+
+    async def remove_room(self, room_id: int):
+        """
+        停止监听一个房间
+        """
+        connection = self._extra_room_to_connection.pop(room_id, None)
+        if connection is not None:
+            connection.remove_extra_room(room_id)
+            return
+
+        client = self._dedicated.pop(room_id, None)
+        if client is not None:
+            await client.stop_and_close()
+            return
+
+        connection = self._connections.pop(room_id, None)
+        if connection is not None:
+            # 主房间移除后关闭连接，其他房间重新分配
+            extra_rooms = connection.take_extra_rooms()
+            for extra_room_id in extra_rooms:
+                self._extra_room_to_connection.pop(extra_room_id, None)
+            await connection.stop_and_close()
+            for extra_room_id, handler in extra_rooms.items():
+                self.add_room(extra_room_id, handler)
+
+    async def stop_and_close(self):
+        """
+        停止所有连接并释放资源，调用后本客户端将不可用
+        """
+        clients: List[web.BLiveClient] = [*self._connections.values(), *self._dedicated.values()]
+        self._connections.clear()
+        self._extra_room_to_connection.clear()
+        self._dedicated.clear()
+        await asyncio.gather(*(client.stop_and_close() for client in clients), return_exceptions=True)
+        if self._own_session:
+            await self._session.close()
+
+    def _on_register_success(self):
+        if self._multiplex_supported is None:
+            logger.info('MultiplexClient: server accepted REGISTER, multiplexing enabled')
+        self._multiplex_supported = True
+
+    def _disable_multiplex(self, reason: str):
+        """
+        关闭复用，所有其他房间改为单独连接
+        """
+        if self._multiplex_supported is not False:
+            logger.warning('MultiplexClient: multiplexing disabled, reason=%s', reason)
+        self._multiplex_supported = False
+        for connection in self._connections.values():
+            for room_id, handler in connection.take_extra_rooms().items():
+                self._extra_room_to_connection.pop(room_id, None)
+                self._start_dedicated(room_id, handler)
+
+    def _start_dedicated(self, room_id: int, handler: 'handlers.HandlerInterface'):
+        self._extra_room_to_connection.pop(room_id, None)
+        client = web.BLiveClient(room_id, session=self._session, **self._client_kwargs)
+        client.set_handler(handler)
+        self._dedicated[room_id] = client
+        client.start()
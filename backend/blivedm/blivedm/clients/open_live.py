@@ -10,7 +10,7 @@ from typing import *
 
 import aiohttp
 
-from . import ws_base
+from . import heartbeat, ws_base
 
 __all__ = (
     'OpenLiveClient',
@@ -36,6 +36,7 @@ class OpenLiveClient(ws_base.WebSocketClientBase):
     :param session: cookie、连接池
     :param heartbeat_interval: 发送连接心跳包的间隔时间（秒）
     :param game_heartbeat_interval: 发送项目心跳包的间隔时间（秒）
+    :param heartbeat_wheel: 定时发送连接心跳包和项目心跳包的时间轮，None表示使用当前事件循环共用的时间轮
     """
 
     def __init__(
@@ -48,8 +49,9 @@ class OpenLiveClient(ws_base.WebSocketClientBase):
         session: Optional[aiohttp.ClientSession] = None,
         heartbeat_interval=30,
         game_heartbeat_interval=20,
+        heartbeat_wheel: Optional[heartbeat.HeartbeatWheel] = None,
     ):
-        super().__init__(session, heartbeat_interval)
+        super().__init__(session, heartbeat_interval, heartbeat_wheel)
 
         self._access_key_id = access_key_id
         self._access_key_secret = access_key_secret
@@ -70,8 +72,8 @@ class OpenLiveClient(ws_base.WebSocketClientBase):
         """项目场次ID"""
 
         # 在运行时初始化的字段
-        self._game_heartbeat_timer_handle: Optional[asyncio.TimerHandle] = None
-        """发项目心跳包定时器的handle"""
+        self._game_heartbeat_handle: Optional[heartbeat.HeartbeatHandle] = None
+        """项目心跳注册到时间轮的handle"""
 
     @property
     def room_owner_uid(self) -> Optional[int]:
@@ -115,9 +117,9 @@ class OpenLiveClient(ws_base.WebSocketClientBase):
         if self.is_running:
             logger.warning('room=%s is calling close(), but client is running', self.room_id)
 
-        if self._game_heartbeat_timer_handle is not None:
-            self._game_heartbeat_timer_handle.cancel()
-            self._game_heartbeat_timer_handle = None
+        if self._game_heartbeat_handle is not None:
+            self._game_heartbeat_handle.cancel()
+            self._game_heartbeat_handle = None
         await self._end_game()
 
         await super().close()
@@ -155,8 +157,8 @@ class OpenLiveClient(ws_base.WebSocketClientBase):
         if not await self._start_game():
             return False
 
-        if self._game_id != '' and self._game_heartbeat_timer_handle is None:
-            self._game_heartbeat_timer_handle = asyncio.get_running_loop().call_later(
+        if self._game_id != '' and self._game_heartbeat_handle is None:
+            self._game_heartbeat_handle = self._get_heartbeat_wheel().register(
                 self._game_heartbeat_interval, self._on_send_game_heartbeat
             )
         return True
@@ -224,14 +226,11 @@ class OpenLiveClient(ws_base.WebSocketClientBase):
             return False
         return True
 
-    def _on_send_game_heartbeat(self):
+    def _on_send_game_heartbeat(self) -> Awaitable:
         """
-        定时发送项目心跳包的回调
+        时间轮定时调用，返回发送项目心跳包的协程
         """
-        self._game_heartbeat_timer_handle = asyncio.get_running_loop().call_later(
-            self._game_heartbeat_interval, self._on_send_game_heartbeat
-        )
-        asyncio.create_task(self._send_game_heartbeat())
+        return self._send_game_heartbeat()
 
     async def _send_game_heartbeat(self):
         """
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import functools
+import json
+import struct
+from typing import *
+
+__all__ = (
+    'HEADER_STRUCT',
+    'make_packet',
+    'get_static_packet',
+    'PacketWriter',
+)
+
+HEADER_STRUCT = struct.Struct('>I2H2I')
+HEADER_SIZE = HEADER_STRUCT.size
+
+# 客户端发的包都是这个协议版本和序号
+CLIENT_PROTO_VER = 1
+CLIENT_SEQ_ID = 1
+
+# 不引用ws_base.Operation，避免循环导入
+_OP_HEARTBEAT = 2
+
+
+def _encode_body(data: Union[dict, str, bytes]) -> bytes:
+    if isinstance(data, dict):
+        return json.dumps(data).encode('utf-8')
+    elif isinstance(data, str):
+        return data.encode('utf-8')
+    return data
+
+
+def make_packet(data: Union[dict, str, bytes], operation: int) -> bytes:
+    """
+    创建一个要发送给服务器的包
+
+    :param data: 包体JSON数据
+    :param operation: 操作码，见ws_base.Operation
+    :return: 整个包的数据
+    """
+    body = _encode_body(data)
+    # 单个包直接pack再拼接比写进预分配的缓冲区再复制出来更快
+    return HEADER_STRUCT.pack(
+        HEADER_SIZE + len(body), HEADER_SIZE, CLIENT_PROTO_VER, operation, CLIENT_SEQ_ID
+    ) + body
+
+
+@functools.lru_cache(maxsize=64)
+def get_static_packet(operation: int, body: bytes = b'{}') -> bytes:
+    """
+    获取内容固定的包，同样的参数只编码一次
+
+    :param operation: 操作码，见ws_base.Operation
+    :param body: 包体
+    :return: 整个包的数据，不可变，可以在所有客户端间共用
+    """
+    return make_packet(body, operation)
+
+
+HEARTBEAT_PACKET = get_static_packet(_OP_HEARTBEAT)
+"""心跳包内容固定，所有客户端共用"""
+
+
+class PacketWriter:
+    """
+    把多个包连续写进一个预分配的缓冲区，包头用pack_into直接写入，用于一次发送多个包
+
+    :param capacity: 缓冲区初始大小（字节），不够时自动扩容
+    """
+
+    __slots__ = ('_buffer', '_size')
+
+    def __init__(self, capacity: int = 4096):
+        self._buffer = bytearray(capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size: int):
+        capacity = len(self._buffer)
+        if self._size + size <= capacity:
+            return
+        while capacity < self._size + size:
+            capacity *= 2
+        self._buffer.extend(bytes(capacity - len(self._buffer)))
+
+    def write(self, data: Union[dict, str, bytes], operation: int) -> 'PacketWriter':
+        """
+        追加一个包
+
+        :param data: 包体JSON数据
+        :param operation: 操作码，见ws_base.Operation
+        :return: self，方便链式调用
+        """
+        body = _encode_body(data)
+        pack_len = HEADER_SIZE + len(body)
+        self._reserve(pack_len)
+        offset = self._size
+        HEADER_STRUCT.pack_into(
+            self._buffer, offset, pack_len, HEADER_SIZE, CLIENT_PROTO_VER, operation, CLIENT_SEQ_ID
+        )
+        self._buffer[offset + HEADER_SIZE: offset + pack_len] = body
+        self._size += pack_len
+        return self
+
+    def write_packet(self, packet: bytes) -> 'PacketWriter':
+        """
+        追加一个已经编码好的包，例如get_static_packet的返回值
+
+        :param packet: 整个包的数据
+        :return: self，方便链式调用
+        """
+        self._reserve(len(packet))
+        self._buffer[self._size: self._size + len(packet)] = packet
+        self._size += len(packet)
+        return self
+
+    def getvalue(self) -> bytes:
+        """
+        返回已写入的所有包的数据
+        """
+        with memoryview(self._buffer) as view:
+            return bytes(view[:self._size])
+
+    def clear(self):
+        """
+        清空已写入的内容，保留缓冲区以便复用
+        """
+        self._size = 0
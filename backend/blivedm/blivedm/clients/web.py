@@ -2,19 +2,25 @@
 import asyncio
 import datetime
 import hashlib
+import http.cookies
+import json
 import logging
+import os
+import time
 import urllib
-import weakref
 from typing import *
 
 import aiohttp
 import yarl
 
-from . import ws_base
+from . import heartbeat, ws_base
 from .. import utils
 
 __all__ = (
     'BLiveClient',
+    'HostSelector',
+    'RoomInitCache',
+    'WbiSigner',
 )
 
 logger = logging.getLogger('blivedm')
@@ -28,32 +34,62 @@ DEFAULT_DANMAKU_SERVER_LIST = [
     {'host': 'broadcastlv.chat.bilibili.com', 'port': 2243, 'wss_port': 443, 'ws_port': 2244}
 ]
 
-_session_to_wbi_signer = weakref.WeakKeyDictionary()
-
+class WbiSigner:
+    """
+    wbi签名
 
-def _get_wbi_signer(session: aiohttp.ClientSession) -> '_WbiSigner':
-    wbi_signer = _session_to_wbi_signer.get(session, None)
-    if wbi_signer is None:
-        wbi_signer = _session_to_wbi_signer[session] = _WbiSigner(session)
-    return wbi_signer
+    wbi口令和登录状态无关，整个进程共用一个口令，同一时间只有一个刷新请求。
+    指定path时口令和刷新时间会持久化到JSON文件，进程重启后在有效期内不用重新请求
 
+    :param path: 持久化文件路径，None表示只缓存在内存
+    """
 
-class _WbiSigner:
     WBI_KEY_INDEX_TABLE = [
         46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35,
         27, 43, 5, 49, 33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13
     ]
     """wbi密码表"""
     WBI_KEY_TTL = datetime.timedelta(hours=11, minutes=59, seconds=30)
+    SIGN_FILTER_TABLE = str.maketrans('', '', "!'()*")
+    """签名前要从参数值中去掉的字符"""
 
-    def __init__(self, session: aiohttp.ClientSession):
-        self._session = session
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None):
+        self._path = path
 
         self._wbi_key = ''
         """缓存的wbi鉴权口令"""
         self._refresh_future: Optional[Awaitable] = None
         """用来避免同时刷新"""
-        self._last_refresh_time: Optional[datetime.datetime] = None
+        self._last_refresh_time: Optional[float] = None
+        """上次刷新的时间戳，用墙上时间，方便持久化"""
+        self._load()
+
+    def _load(self):
+        if self._path is None or not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            wbi_key = data.get('wbi_key', '')
+            last_refresh_time = data.get('last_refresh_time', None)
+        except (OSError, ValueError):
+            logger.exception('WbiSigner failed to load %s:', self._path)
+            return
+        if wbi_key and last_refresh_time is not None:
+            self._wbi_key = wbi_key
+            self._last_refresh_time = last_refresh_time
+
+    def _save(self):
+        if self._path is None:
+            return
+        tmp_path = f'{self._path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'wbi_key': self._wbi_key, 'last_refresh_time': self._last_refresh_time}, f)
+            os.replace(tmp_path, self._path)
+        except OSError:
+            logger.exception('WbiSigner failed to save %s:', self._path)
 
     @property
     def wbi_key(self):
@@ -65,35 +101,42 @@ class _WbiSigner:
     def reset(self):
         self._wbi_key = ''
         self._last_refresh_time = None
+        self._save()
 
     @property
     def need_refresh_wbi_key(self):
         return self._wbi_key == '' or (
             self._last_refresh_time is not None
-            and datetime.datetime.now() - self._last_refresh_time >= self.WBI_KEY_TTL
+            and time.time() - self._last_refresh_time >= self.WBI_KEY_TTL.total_seconds()
         )
 
-    def refresh_wbi_key(self) -> Awaitable:
+    def refresh_wbi_key(self, session: aiohttp.ClientSession) -> Awaitable:
+        """
+        刷新wbi口令，已经在刷新时返回正在进行的刷新，不会重复请求
+
+        :param session: 发请求用的session
+        """
         if self._refresh_future is None:
-            self._refresh_future = asyncio.create_task(self._do_refresh_wbi_key())
+            self._refresh_future = asyncio.create_task(self._do_refresh_wbi_key(session))
 
             def on_done(_fu):
                 self._refresh_future = None
             self._refresh_future.add_done_callback(on_done)
 
-        return self._refresh_future
+        return asyncio.shield(self._refresh_future)
 
-    async def _do_refresh_wbi_key(self):
-        wbi_key = await self._get_wbi_key()
+    async def _do_refresh_wbi_key(self, session: aiohttp.ClientSession):
+        wbi_key = await self._get_wbi_key(session)
         if wbi_key == '':
             return
 
         self._wbi_key = wbi_key
-        self._last_refresh_time = datetime.datetime.now()
+        self._last_refresh_time = time.time()
+        self._save()
 
-    async def _get_wbi_key(self):
+    async def _get_wbi_key(self, session: aiohttp.ClientSession):
         try:
-            async with self._session.get(
+            async with session.get(
                 WBI_INIT_URL,
                 headers={'User-Agent': utils.USER_AGENT},
             ) as res:
@@ -114,33 +157,22 @@ class _WbiSigner:
             return ''
 
         shuffled_key = img_key + sub_key
-        wbi_key = []
-        for index in self.WBI_KEY_INDEX_TABLE:
-            if index < len(shuffled_key):
-                wbi_key.append(shuffled_key[index])
-        return ''.join(wbi_key)
+        return ''.join(
+            shuffled_key[index]
+            for index in self.WBI_KEY_INDEX_TABLE
+            if index < len(shuffled_key)
+        )
 
     def add_wbi_sign(self, params: dict):
         if self._wbi_key == '':
             return params
 
-        wts = str(int(datetime.datetime.now().timestamp()))
-        params_to_sign = {**params, 'wts': wts}
-
-        # 按key字典序排序
-        params_to_sign = {
-            key: params_to_sign[key]
-            for key in sorted(params_to_sign.keys())
-        }
-        # 过滤一些字符
-        for key, value in params_to_sign.items():
-            value = ''.join(
-                ch
-                for ch in str(value)
-                if ch not in "!'()*"
-            )
-            params_to_sign[key] = value
-
+        wts = str(int(time.time()))
+        # 按key字典序排序，过滤一些字符
+        params_to_sign = sorted(
+            (key, str(value).translate(self.SIGN_FILTER_TABLE))
+            for key, value in (*params.items(), ('wts', wts))
+        )
         str_to_sign = urllib.parse.urlencode(params_to_sign) + self._wbi_key
         w_rid = hashlib.md5(str_to_sign.encode('utf-8')).hexdigest()
         return {
@@ -150,6 +182,177 @@ class _WbiSigner:
         }
 
 
+_default_wbi_signer = WbiSigner()
+"""没有指定签名器的客户端共用的进程内签名器"""
+
+
+class RoomInitCache:
+    """
+    init_room结果的缓存，避免每次启动、重新init_room都要请求几个HTTP接口
+
+    按身份（SESSDATA的摘要）缓存uid、buvid，按房间缓存真实房间ID、主播uid，按房间+身份缓存弹幕服务器列表和token。
+    指定path时缓存会持久化到JSON文件，进程重启后仍然有效
+
+    :param path: 持久化文件路径，None表示只缓存在内存
+    :param identity_ttl: uid、buvid的有效期（秒）
+    :param room_ttl: 真实房间ID、主播uid的有效期（秒）
+    :param host_server_ttl: 弹幕服务器列表和token的有效期（秒）
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, os.PathLike]] = None,
+        *,
+        identity_ttl: float = 7 * 24 * 3600,
+        room_ttl: float = 24 * 3600,
+        host_server_ttl: float = 30 * 60,
+    ):
+        self._path = path
+        self._ttls = {
+            'identity': identity_ttl,
+            'room': room_ttl,
+            'host_server': host_server_ttl,
+        }
+        self._data: Dict[str, Dict[str, dict]] = {kind: {} for kind in self._ttls}
+        """kind -> key -> {'expire': 过期时间戳, 'value': 缓存的值}"""
+        self._load()
+
+    def _load(self):
+        if self._path is None or not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            for kind in self._ttls:
+                self._data[kind] = {
+                    key: entry for key, entry in data.get(kind, {}).items()
+                    if entry.get('expire', 0) > now
+                }
+        except (OSError, ValueError):
+            logger.exception('RoomInitCache failed to load %s:', self._path)
+
+    def _save(self):
+        if self._path is None:
+            return
+        tmp_path = f'{self._path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self._path)
+        except OSError:
+            logger.exception('RoomInitCache failed to save %s:', self._path)
+
+    def get(self, kind: str, key: str) -> Optional[dict]:
+        """
+        获取未过期的缓存
+
+        :param kind: identity / room / host_server
+        :param key: 缓存键
+        """
+        entry = self._data[kind].get(key, None)
+        if entry is None:
+            return None
+        if entry['expire'] <= time.time():
+            del self._data[kind][key]
+            return None
+        return entry['value']
+
+    def set(self, kind: str, key: str, value: dict):
+        """
+        写入缓存，有效期按kind决定
+        """
+        self._data[kind][key] = {'expire': time.time() + self._ttls[kind], 'value': value}
+        self._save()
+
+    def invalidate(self, kind: str, key: str):
+        if self._data[kind].pop(key, None) is not None:
+            self._save()
+
+
+_default_init_cache = RoomInitCache()
+"""没有指定缓存的客户端共用的进程内缓存"""
+
+
+class HostSelector:
+    """
+    按连接耗时和失败记录给弹幕服务器排序
+
+    连接耗时（TCP + TLS + WebSocket握手）取指数移动平均，失败次数按半衰期指数衰减。
+    得分 = 平均耗时 + 衰减后的失败次数 * failure_penalty，得分低的优先。没测过的服务器按default_latency计
+
+    :param default_latency: 没有测速记录时的估计耗时（秒）
+    :param failure_penalty: 每次失败相当于增加的耗时（秒）
+    :param failure_half_life: 失败记录的半衰期（秒）
+    :param ewma_alpha: 耗时移动平均中新样本的权重
+    """
+
+    def __init__(
+        self,
+        *,
+        default_latency: float = 0.5,
+        failure_penalty: float = 5.0,
+        failure_half_life: float = 120.0,
+        ewma_alpha: float = 0.3,
+    ):
+        self._default_latency = default_latency
+        self._failure_penalty = failure_penalty
+        self._failure_half_life = failure_half_life
+        self._ewma_alpha = ewma_alpha
+        self._latencies: Dict[str, float] = {}
+        """host -> 平均连接耗时"""
+        self._failures: Dict[str, Tuple[float, float]] = {}
+        """host -> (失败计数, 上次更新的时间)"""
+
+    @staticmethod
+    def host_key(host_server: dict) -> str:
+        return f"{host_server['host']}:{host_server['wss_port']}"
+
+    def _decayed_failures(self, key: str, now: float) -> float:
+        count, update_time = self._failures.get(key, (0.0, now))
+        return count * 0.5 ** ((now - update_time) / self._failure_half_life)
+
+    def score(self, key: str, now: Optional[float] = None) -> float:
+        if now is None:
+            now = time.monotonic()
+        latency = self._latencies.get(key, self._default_latency)
+        return latency + self._decayed_failures(key, now) * self._failure_penalty
+
+    def rank(self, host_server_list: List[dict]) -> List[dict]:
+        """
+        按得分从好到差排序，得分相同时保持原顺序
+        """
+        now = time.monotonic()
+        return sorted(host_server_list, key=lambda host_server: self.score(self.host_key(host_server), now))
+
+    def record_success(self, key: str, latency: float):
+        old = self._latencies.get(key, None)
+        self._latencies[key] = latency if old is None else old + self._ewma_alpha * (latency - old)
+
+    def record_failure(self, key: str):
+        now = time.monotonic()
+        self._failures[key] = (self._decayed_failures(key, now) + 1, now)
+
+    def snapshot(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        return {
+            key: {
+                'latency': self._latencies.get(key, None),
+                'failures': round(self._decayed_failures(key, now), 3),
+                'score': round(self.score(key, now), 3),
+            }
+            for key in {*self._latencies, *self._failures}
+        }
+
+
+_default_host_selector = HostSelector()
+
+_close_tasks: Set[asyncio.Task] = set()
+"""关闭竞速落败连接的任务，防止被垃圾回收"""
+"""没有指定选择器的客户端共用的服务器测速记录"""
+
+
 class BLiveClient(ws_base.WebSocketClientBase):
     """
     web端客户端
@@ -158,6 +361,13 @@ class BLiveClient(ws_base.WebSocketClientBase):
     :param uid: B站用户ID，0表示未登录，None表示自动获取
     :param session: cookie、连接池
     :param heartbeat_interval: 发送心跳包的间隔时间（秒）
+    :param heartbeat_wheel: 定时发送心跳包的时间轮，None表示使用当前事件循环共用的时间轮
+    :param init_cache: init_room结果的缓存，None表示使用进程内共用的缓存
+    :param wbi_signer: wbi签名器，None表示使用进程内共用的签名器
+    :param host_selector: 弹幕服务器选择器，None表示使用进程内共用的选择器
+    :param race_connect: 是否同时尝试排名前两位的服务器：第一个连接在race_delay秒内没有成功时开始连接第二个，
+        先成功的保留
+    :param race_delay: 竞速连接时启动第二个连接前等待的时间（秒）
     """
 
     def __init__(
@@ -167,9 +377,23 @@ class BLiveClient(ws_base.WebSocketClientBase):
         uid: Optional[int] = None,
         session: Optional[aiohttp.ClientSession] = None,
         heartbeat_interval=30,
+        heartbeat_wheel: Optional[heartbeat.HeartbeatWheel] = None,
+        init_cache: Optional[RoomInitCache] = None,
+        wbi_signer: Optional[WbiSigner] = None,
+        host_selector: Optional[HostSelector] = None,
+        race_connect: bool = False,
+        race_delay: float = 0.3,
     ):
-        super().__init__(session, heartbeat_interval)
-        self._wbi_signer = _get_wbi_signer(self._session)
+        super().__init__(session, heartbeat_interval, heartbeat_wheel)
+        self._host_selector = host_selector if host_selector is not None else _default_host_selector
+        self._race_connect = race_connect
+        self._race_delay = race_delay
+        self._current_host: Optional[str] = None
+        """当前连接的服务器，重连时记为失败一次"""
+        self._wbi_signer = wbi_signer if wbi_signer is not None else _default_wbi_signer
+        self._init_cache = init_cache if init_cache is not None else _default_init_cache
+        self._refresh_host_server = False
+        """下次init_room时不使用缓存的弹幕服务器，重连失败或认证失败后置为True"""
 
         self._tmp_room_id = room_id
         """用来init_room的临时房间ID，可以用短ID"""
@@ -212,30 +436,100 @@ class BLiveClient(ws_base.WebSocketClientBase):
         """
         初始化连接房间需要的字段
 
+        优先使用缓存，互不依赖的请求（uid、buvid、房间信息、wbi口令）并发执行，最后获取弹幕服务器
+
         :return: True代表没有降级，如果需要降级后还可用，重载这个函数返回True
         """
-        if self._uid is None:
-            if not await self._init_uid():
-                logger.warning('room=%d _init_uid() failed', self._tmp_room_id)
-                self._uid = 0
+        identity = self._get_identity_key()
+        identity_cache = self._init_cache.get('identity', identity) or {}
+        if self._uid is None and 'uid' in identity_cache:
+            self._uid = identity_cache['uid']
+        if self._get_buvid() == '' and identity_cache.get('buvid'):
+            self._set_buvid(identity_cache['buvid'])
+
+        host_key = f'{self._tmp_room_id}:{identity}'
+        if self._refresh_host_server:
+            self._refresh_host_server = False
+            self._init_cache.invalidate('host_server', host_key)
+        host_cache = self._init_cache.get('host_server', host_key)
+
+        uid_res, buvid_res, room_res, _ = await asyncio.gather(
+            self._init_uid_if_needed(),
+            self._init_buvid_if_needed(),
+            self._init_room_id_and_owner_cached(),
+            # 需要请求弹幕服务器时提前刷新wbi口令
+            self._refresh_wbi_key_if_needed() if host_cache is None else asyncio.sleep(0),
+        )
+        if uid_res and buvid_res and (
+            identity_cache.get('uid', None) != self._uid or identity_cache.get('buvid', '') != self._get_buvid()
+        ):
+            self._init_cache.set('identity', identity, {'uid': self._uid, 'buvid': self._get_buvid()})
+
+        res = room_res
+        if host_cache is not None:
+            self._host_server_list = host_cache['host_list']
+            self._host_server_token = host_cache['token']
+        elif await self._init_host_server():
+            self._init_cache.set('host_server', host_key, {
+                'host_list': self._host_server_list,
+                'token': self._host_server_token,
+            })
+        else:
+            res = False
+            # 失败了则降级
+            self._host_server_list = DEFAULT_DANMAKU_SERVER_LIST
+            self._host_server_token = None
+        return res
+
+    def _get_identity_key(self) -> str:
+        """
+        用SESSDATA的摘要区分身份，未登录为anonymous
+        """
+        cookies = self._session.cookie_jar.filter_cookies(yarl.URL(UID_INIT_URL))
+        sessdata_cookie = cookies.get('SESSDATA', None)
+        if sessdata_cookie is None or sessdata_cookie.value == '':
+            return 'anonymous'
+        return hashlib.sha256(sessdata_cookie.value.encode('utf-8')).hexdigest()[:16]
+
+    async def _init_uid_if_needed(self):
+        if self._uid is not None:
+            return True
+        if not await self._init_uid():
+            logger.warning('room=%d _init_uid() failed', self._tmp_room_id)
+            self._uid = 0
+            return False
+        return True
+
+    async def _init_buvid_if_needed(self):
+        if self._get_buvid() != '':
+            return True
+        if not await self._init_buvid():
+            logger.warning('room=%d _init_buvid() failed', self._tmp_room_id)
+            return False
+        return True
 
-        if self._get_buvid() == '':
-            if not await self._init_buvid():
-                logger.warning('room=%d _init_buvid() failed', self._tmp_room_id)
+    async def _init_room_id_and_owner_cached(self):
+        room_key = str(self._tmp_room_id)
+        room_cache = self._init_cache.get('room', room_key)
+        if room_cache is not None:
+            self._room_id = room_cache['room_id']
+            self._room_owner_uid = room_cache['room_owner_uid']
+            return True
 
-        res = True
         if not await self._init_room_id_and_owner():
-            res = False
             # 失败了则降级
             self._room_id = self._tmp_room_id
             self._room_owner_uid = 0
+            return False
+        self._init_cache.set('room', room_key, {
+            'room_id': self._room_id,
+            'room_owner_uid': self._room_owner_uid,
+        })
+        return True
 
-        if not await self._init_host_server():
-            res = False
-            # 失败了则降级
-            self._host_server_list = DEFAULT_DANMAKU_SERVER_LIST
-            self._host_server_token = None
-        return res
+    async def _refresh_wbi_key_if_needed(self):
+        if self._wbi_signer.need_refresh_wbi_key:
+            await self._wbi_signer.refresh_wbi_key(self._session)
 
     async def _init_uid(self):
         cookies = self._session.cookie_jar.filter_cookies(yarl.URL(UID_INIT_URL))
@@ -282,6 +576,12 @@ class BLiveClient(ws_base.WebSocketClientBase):
             return ''
         return buvid_cookie.value
 
+    def _set_buvid(self, buvid: str):
+        cookie = http.cookies.SimpleCookie()
+        cookie['buvid3'] = buvid
+        cookie['buvid3']['domain'] = 'bilibili.com'
+        self._session.cookie_jar.update_cookies(cookie)
+
     async def _init_buvid(self):
         try:
             async with self._session.get(
@@ -327,7 +627,7 @@ class BLiveClient(ws_base.WebSocketClientBase):
 
     async def _init_host_server(self):
         if self._wbi_signer.need_refresh_wbi_key:
-            await self._wbi_signer.refresh_wbi_key()
+            await self._wbi_signer.refresh_wbi_key(self._session)
             # 如果没刷新成功先用旧的key
             if self._wbi_signer.wbi_key == '':
                 logger.exception('room=%d _init_host_server() failed: no wbi key', self._room_id)
@@ -376,15 +676,95 @@ class BLiveClient(ws_base.WebSocketClientBase):
         reinit_period = max(3, len(self._host_server_list or ()))
         if retry_count > 0 and retry_count % reinit_period == 0:
             self._need_init_room = True
+        if retry_count > 0 and self._need_init_room:
+            # 重连失败或认证失败后重新init_room，这时缓存的弹幕服务器和token可能已经失效
+            self._refresh_host_server = True
         await super()._on_before_ws_connect(retry_count)
 
     def _get_ws_url(self, retry_count) -> str:
         """
         返回WebSocket连接的URL，可以在这里做故障转移和负载均衡
         """
-        host_server = self._host_server_list[retry_count % len(self._host_server_list)]
+        return self._make_ws_url(self._host_selector.rank(self._host_server_list)[0])
+
+    @staticmethod
+    def _make_ws_url(host_server: dict) -> str:
         return f"wss://{host_server['host']}:{host_server['wss_port']}/sub"
 
+    async def _ws_connect(self, retry_count) -> aiohttp.ClientWebSocketResponse:
+        """
+        连接得分最好的弹幕服务器，开启竞速时同时尝试前两位
+        """
+        if retry_count > 0 and self._current_host is not None:
+            # 上次的连接断开了或者没连上
+            self._host_selector.record_failure(self._current_host)
+        self._current_host = None
+
+        host_server_list = self._host_selector.rank(self._host_server_list)
+        if self._race_connect and len(host_server_list) > 1:
+            key, websocket = await self._race_ws_connect(host_server_list[:2])
+        else:
+            key, websocket = await self._timed_ws_connect(host_server_list[0])
+        self._current_host = key
+        return websocket
+
+    async def _timed_ws_connect(self, host_server: dict) -> Tuple[str, aiohttp.ClientWebSocketResponse]:
+        key = self._host_selector.host_key(host_server)
+        start_time = time.monotonic()
+        try:
+            websocket = await self._open_websocket(self._make_ws_url(host_server))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._host_selector.record_failure(key)
+            raise
+        self._host_selector.record_success(key, time.monotonic() - start_time)
+        return key, websocket
+
+    async def _race_ws_connect(self, host_server_list: List[dict]) -> Tuple[str, aiohttp.ClientWebSocketResponse]:
+        """
+        依次启动连接，前一个在race_delay秒内没有成功就启动下一个，返回最先成功的连接
+        """
+        pending: Set[asyncio.Task] = set()
+        error: Optional[BaseException] = None
+        try:
+            for index, host_server in enumerate(host_server_list):
+                pending.add(asyncio.create_task(self._timed_ws_connect(host_server)))
+                is_last = index == len(host_server_list) - 1
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, timeout=None if is_last else self._race_delay, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not done:
+                        # 超时了，启动下一个
+                        break
+                    winner: Optional[asyncio.Task] = None
+                    for task in done:
+                        if task.exception() is not None:
+                            error = task.exception()
+                        elif winner is None:
+                            winner = task
+                        else:
+                            # 同一轮里多个连接都成功了，只保留第一个
+                            self._close_race_loser(task)
+                    if winner is not None:
+                        return winner.result()
+                    if not is_last and not pending:
+                        # 都失败了，立即启动下一个
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(self._close_race_loser)
+        raise error
+
+    @staticmethod
+    def _close_race_loser(task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None:
+            return
+        _key, websocket = task.result()
+        close_task = asyncio.create_task(websocket.close())
+        _close_tasks.add(close_task)
+        close_task.add_done_callback(_close_tasks.discard)
+
     async def _send_auth(self):
         """
         发送认证包
@@ -10,6 +10,7 @@ from typing import *
 import aiohttp
 import brotli
 
+from . import heartbeat, packets
 from .. import handlers, utils
 
 logger = logging.getLogger('blivedm')
@@ -18,7 +19,8 @@ USER_AGENT = (
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
 )
 
-HEADER_STRUCT = struct.Struct('>I2H2I')
+HEADER_STRUCT = packets.HEADER_STRUCT
+HEARTBEAT_PACKET = packets.HEARTBEAT_PACKET
 
 
 class HeaderTuple(NamedTuple):
@@ -85,12 +87,14 @@ class WebSocketClientBase:
 
     :param session: cookie、连接池
     :param heartbeat_interval: 发送心跳包的间隔时间（秒）
+    :param heartbeat_wheel: 定时发送心跳包的时间轮，None表示使用当前事件循环共用的时间轮
     """
 
     def __init__(
         self,
         session: Optional[aiohttp.ClientSession] = None,
         heartbeat_interval: float = 30,
+        heartbeat_wheel: Optional[heartbeat.HeartbeatWheel] = None,
     ):
         if session is None:
             self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
@@ -101,6 +105,7 @@ class WebSocketClientBase:
             assert self._session.loop is asyncio.get_event_loop()  # noqa
 
         self._heartbeat_interval = heartbeat_interval
+        self._heartbeat_wheel = heartbeat_wheel
 
         self._need_init_room = True
         self._handler: Optional[handlers.HandlerInterface] = None
@@ -116,8 +121,8 @@ class WebSocketClientBase:
         """WebSocket连接"""
         self._network_future: Optional[asyncio.Future] = None
         """网络协程的future"""
-        self._heartbeat_timer_handle: Optional[asyncio.TimerHandle] = None
-        """发心跳包定时器的handle"""
+        self._heartbeat_handle: Optional[heartbeat.HeartbeatHandle] = None
+        """注册到心跳时间轮的handle"""
 
     @property
     def is_running(self) -> bool:
@@ -148,7 +153,8 @@ class WebSocketClientBase:
         """
         设置重连间隔时间增长策略
 
-        :param get_reconnect_interval: 一个可调用对象，输入重试次数 (retry_count, total_retry_count)，返回间隔时间
+        :param get_reconnect_interval: 一个可调用对象，输入重试次数 (retry_count, total_retry_count)，返回间隔时间。
+            如果有on_success方法，每次连接成功后会调用，见utils.BackoffRetryPolicy
         """
         self._get_reconnect_interval = get_reconnect_interval
 
@@ -219,20 +225,7 @@ class WebSocketClientBase:
         :param operation: 操作码，见Operation
         :return: 整个包的数据
         """
-        if isinstance(data, dict):
-            body = json.dumps(data).encode('utf-8')
-        elif isinstance(data, str):
-            body = data.encode('utf-8')
-        else:
-            body = data
-        header = HEADER_STRUCT.pack(*HeaderTuple(
-            pack_len=HEADER_STRUCT.size + len(body),
-            raw_header_size=HEADER_STRUCT.size,
-            ver=1,
-            operation=operation,
-            seq_id=1
-        ))
-        return header + body
+        return packets.make_packet(data, operation)
 
     async def _network_coroutine_wrapper(self):
         """
@@ -266,20 +259,21 @@ class WebSocketClientBase:
                 await self._on_before_ws_connect(retry_count)
 
                 # 连接
-                async with self._session.ws_connect(
-                    self._get_ws_url(retry_count),
-                    headers={'User-Agent': utils.USER_AGENT},  # web端的token也会签名UA
-                    receive_timeout=self._heartbeat_interval + 5,
-                ) as websocket:
+                websocket = await self._ws_connect(retry_count)
+                async with websocket:
                     self._websocket = websocket
                     await self._on_ws_connect()
 
                     # 处理消息
+                    is_first_message = True
                     message: aiohttp.WSMessage
                     async for message in websocket:
                         await self._on_ws_message(message)
                         # 至少成功处理1条消息
                         retry_count = 0
+                        if is_first_message:
+                            is_first_message = False
+                            self._on_reconnect_policy_success()
 
             except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
                 # 掉线重连
@@ -301,10 +295,35 @@ class WebSocketClientBase:
             )
             await asyncio.sleep(self._get_reconnect_interval(retry_count, total_retry_count))
 
+    def _on_reconnect_policy_success(self):
+        """
+        连接成功后通知重连策略（如果策略有on_success方法），用来重置退避时间、关闭熔断
+        """
+        on_success = getattr(self._get_reconnect_interval, 'on_success', None)
+        if on_success is not None:
+            on_success()
+
+    async def _wait_reconnect_gate(self):
+        """
+        重连之前再检查一次重连策略（如果策略有get_connect_delay方法）。安排重连之后熔断器可能已经打开，
+        或者半开状态只放行一个试探的重连，这时继续等待
+        """
+        get_connect_delay = getattr(self._get_reconnect_interval, 'get_connect_delay', None)
+        if get_connect_delay is None:
+            return
+        while True:
+            delay = get_connect_delay()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
     async def _on_before_ws_connect(self, retry_count):
         """
         在每次建立连接之前调用，可以用来初始化房间
         """
+        if retry_count > 0:
+            await self._wait_reconnect_gate()
+
         if not self._need_init_room:
             return
 
@@ -318,12 +337,28 @@ class WebSocketClientBase:
         """
         raise NotImplementedError
 
+    async def _ws_connect(self, retry_count) -> aiohttp.ClientWebSocketResponse:
+        """
+        建立WebSocket连接，默认连接_get_ws_url返回的URL。需要测速、竞速连接时可以重载这个函数
+        """
+        return await self._open_websocket(self._get_ws_url(retry_count))
+
+    async def _open_websocket(self, url: str) -> aiohttp.ClientWebSocketResponse:
+        """
+        连接指定URL的WebSocket
+        """
+        return await self._session.ws_connect(
+            url,
+            headers={'User-Agent': utils.USER_AGENT},  # web端的token也会签名UA
+            receive_timeout=self._heartbeat_interval + 5,
+        )
+
     async def _on_ws_connect(self):
         """
         WebSocket连接成功
         """
         await self._send_auth()
-        self._heartbeat_timer_handle = asyncio.get_running_loop().call_later(
+        self._heartbeat_handle = self._get_heartbeat_wheel().register(
             self._heartbeat_interval, self._on_send_heartbeat
         )
 
@@ -331,9 +366,9 @@ class WebSocketClientBase:
         """
         WebSocket连接断开
         """
-        if self._heartbeat_timer_handle is not None:
-            self._heartbeat_timer_handle.cancel()
-            self._heartbeat_timer_handle = None
+        if self._heartbeat_handle is not None:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
 
     async def _send_auth(self):
         """
@@ -341,18 +376,18 @@ class WebSocketClientBase:
         """
         raise NotImplementedError
 
-    def _on_send_heartbeat(self):
+    def _get_heartbeat_wheel(self) -> heartbeat.HeartbeatWheel:
+        if self._heartbeat_wheel is None:
+            self._heartbeat_wheel = heartbeat.get_default_heartbeat_wheel()
+        return self._heartbeat_wheel
+
+    def _on_send_heartbeat(self) -> Optional[Awaitable]:
         """
-        定时发送心跳包的回调
+        时间轮定时调用，返回的协程由时间轮和同一tick的其他心跳一起执行
         """
         if self._websocket is None or self._websocket.closed:
-            self._heartbeat_timer_handle = None
-            return
-
-        self._heartbeat_timer_handle = asyncio.get_running_loop().call_later(
-            self._heartbeat_interval, self._on_send_heartbeat
-        )
-        asyncio.create_task(self._send_heartbeat())
+            return None
+        return self._send_heartbeat()
 
     async def _send_heartbeat(self):
         """
@@ -362,7 +397,7 @@ class WebSocketClientBase:
             return
 
         try:
-            await self._websocket.send_bytes(self._make_packet({}, Operation.HEARTBEAT))
+            await self._websocket.send_bytes(HEARTBEAT_PACKET)
         except (ConnectionResetError, aiohttp.ClientConnectionError) as e:
             logger.warning('room=%d _send_heartbeat() failed: %r', self.room_id, e)
         except Exception:  # noqa
@@ -469,7 +504,7 @@ class WebSocketClientBase:
             body = json.loads(body.decode('utf-8'))
             if body['code'] != AuthReplyCode.OK:
                 raise AuthError(f"auth reply error, code={body['code']}, body={body}")
-            await self._websocket.send_bytes(self._make_packet({}, Operation.HEARTBEAT))
+            await self._websocket.send_bytes(HEARTBEAT_PACKET)
 
         else:
             # 未知消息
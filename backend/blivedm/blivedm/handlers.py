@@ -13,7 +13,6 @@ __all__ = (
 logger = logging.getLogger('blivedm')
 
 logged_unknown_cmds = {
-    'COMBO_SEND',
     'ENTRY_EFFECT',
     'HOT_RANK_CHANGED',
     'HOT_RANK_CHANGED_V2',
@@ -96,6 +95,8 @@ class BaseHandler(HandlerInterface):
         'DANMU_MSG_MIRROR': __danmu_msg_mirror_callback,
         # 礼物
         'SEND_GIFT': _make_msg_callback('_on_gift', web_models.GiftMessage),
+        # 礼物连击
+        'COMBO_SEND': _make_msg_callback('_on_combo_send', web_models.ComboSendMessage),
         # 上舰
         'GUARD_BUY': _make_msg_callback('_on_buy_guard', web_models.GuardBuyMessage),
         # 另一个上舰消息
@@ -160,6 +161,9 @@ class BaseHandler(HandlerInterface):
     def _on_gift(self, client: ws_base.WebSocketClientBase, message: web_models.GiftMessage):
         """礼物"""
 
+    def _on_combo_send(self, client: ws_base.WebSocketClientBase, message: web_models.ComboSendMessage):
+        """礼物连击"""
+
     def _on_buy_guard(self, client: ws_base.WebSocketClientBase, message: web_models.GuardBuyMessage):
         """上舰"""
 
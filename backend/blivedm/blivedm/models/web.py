@@ -10,6 +10,7 @@ __all__ = (
     'HeartbeatMessage',
     'DanmakuMessage',
     'GiftMessage',
+    'ComboSendMessage',
     'GuardBuyMessage',
     'SuperChatMessage',
     'SuperChatDeleteMessage',
@@ -317,6 +318,8 @@ class GiftMessage:
     """盲盒信息"""
     r_price: int = 0
     """实际价值(1000 = 1元 = 10电池),盲盒:爆出道具的价值"""
+    batch_combo_id: str = ''
+    """连击ID，同一次连击的礼物相同，非连击时为空"""
 
     @classmethod
     def from_command(cls, data: dict):
@@ -361,6 +364,50 @@ class GiftMessage:
             medal_ruid=medal_ruid,
             blind_gift=blind_gift,
             r_price=r_price,
+            batch_combo_id=data.get('batch_combo_id', '') or '',
+        )
+
+
+@dataclasses.dataclass
+class ComboSendMessage:
+    """
+    礼物连击消息
+    """
+
+    uid: int = 0
+    """用户ID"""
+    uname: str = ''
+    """用户名"""
+    gift_id: int = 0
+    """礼物ID"""
+    gift_name: str = ''
+    """礼物名"""
+    action: str = ''
+    """目前遇到的有'投喂'、'赠送'"""
+    combo_num: int = 0
+    """本次连击的连击数"""
+    total_num: int = 0
+    """本次连击累计的礼物数量"""
+    batch_combo_id: str = ''
+    """连击ID，与 GiftMessage.batch_combo_id 对应"""
+    batch_combo_num: int = 0
+    """批量连击数"""
+    combo_total_coin: int = 0
+    """本次连击累计的瓜子数"""
+
+    @classmethod
+    def from_command(cls, data: dict):
+        return cls(
+            uid=data['uid'],
+            uname=data['uname'],
+            gift_id=data['gift_id'],
+            gift_name=data['gift_name'],
+            action=data.get('action', ''),
+            combo_num=data.get('combo_num', 0),
+            total_num=data.get('total_num', 0),
+            batch_combo_id=data.get('batch_combo_id', ''),
+            batch_combo_num=data.get('batch_combo_num', 0),
+            combo_total_coin=data.get('combo_total_coin', 0),
         )
 
 
@@ -1,4 +1,13 @@
 # -*- coding: utf-8 -*-
+import collections
+import enum
+import logging
+import random
+import time
+from typing import *
+
+logger = logging.getLogger('blivedm')
+
 USER_AGENT = (
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
 )
@@ -17,3 +26,203 @@ def make_linear_retry_policy(start_interval: float, interval_step: float, max_in
             max_interval
         )
     return get_interval
+
+
+class TokenBucket:
+    """
+    令牌桶，多个客户端共用时限制整个进程的重连速率
+
+    用GCRA实现，预约令牌时不阻塞，而是返回需要额外等待的时间
+
+    :param rate: 每秒产生的令牌数
+    :param capacity: 桶容量，即允许的突发数量
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self._interval = 1 / rate
+        self._burst_tolerance = (capacity - 1) * self._interval
+        self._tat = 0.0
+        """理论到达时间"""
+
+    def reserve(self, delay: float = 0.0) -> float:
+        """
+        预约一个令牌
+
+        :param delay: 计划在多少秒后使用令牌
+        :return: 在delay的基础上还需要等待的时间
+        """
+        at = time.monotonic() + delay
+        tat = max(self._tat, at)
+        wait = max(0.0, tat - self._burst_tolerance - at)
+        self._tat = tat + self._interval
+        return wait
+
+
+class CircuitState(enum.Enum):
+    CLOSED = 'closed'
+    """正常"""
+    OPEN = 'open'
+    """熔断中，所有重连等到熔断结束"""
+    HALF_OPEN = 'half_open'
+    """熔断结束，只放行一个试探的重连，成功则恢复正常，失败则重新熔断"""
+
+
+class CircuitBreaker:
+    """
+    熔断器，多个客户端共用时，整个进程短时间内失败太多次就暂停所有重连，避免被B站限流（-352、-412）
+
+    :param failure_threshold: window秒内失败多少次触发熔断
+    :param window: 统计失败次数的时间窗口（秒）
+    :param open_duration: 熔断持续时间（秒）
+    """
+
+    def __init__(self, failure_threshold: int = 20, window: float = 10.0, open_duration: float = 30.0):
+        self._failure_threshold = failure_threshold
+        self._window = window
+        self._open_duration = open_duration
+
+        self._state = CircuitState.CLOSED
+        self._failure_times: Deque[float] = collections.deque()
+        self._open_until = 0.0
+        self._probe_until = 0.0
+        """半开状态下试探的重连结果出来之前，其他重连等到这个时间"""
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() >= self._open_until:
+            self._set_state(CircuitState.HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: CircuitState):
+        if state != self._state:
+            logger.warning('CircuitBreaker state %s -> %s', self._state.value, state.value)
+            self._state = state
+
+    def record_failure(self, is_probe: bool = False):
+        """
+        :param is_probe: 是否是半开状态下放行的试探重连失败了。半开状态下只有试探失败才重新熔断，
+                         熔断之前就已开始的其他连接失败不算
+        """
+        now = time.monotonic()
+        if self.state == CircuitState.HALF_OPEN:
+            if is_probe:
+                # 试探失败，重新熔断
+                self._open(now)
+            return
+
+        self._failure_times.append(now)
+        while self._failure_times and self._failure_times[0] <= now - self._window:
+            self._failure_times.popleft()
+        if self._state == CircuitState.CLOSED and len(self._failure_times) >= self._failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float):
+        self._open_until = now + self._open_duration
+        self._probe_until = 0.0
+        self._failure_times.clear()
+        self._set_state(CircuitState.OPEN)
+
+    def record_success(self):
+        if self.state != CircuitState.CLOSED:
+            self._set_state(CircuitState.CLOSED)
+
+    def get_delay(self, delay: float = 0.0) -> float:
+        """
+        安排重连时调用，估计需要额外等待的时间，不占用试探名额。真正连接之前还要通过acquire()
+
+        :param delay: 计划在多少秒后重连
+        :return: 在delay的基础上还需要等待的时间
+        """
+        now = time.monotonic()
+        state = self.state
+        if state == CircuitState.OPEN:
+            # 熔断结束后在一个统计窗口内分散开，避免所有客户端同时到达试探闸门
+            return max(0.0, self._open_until - now - delay) + random.uniform(0, self._window)
+        if state == CircuitState.HALF_OPEN and self._probe_until > now + delay:
+            return self._probe_until - now - delay + random.uniform(0, 1)
+        return 0.0
+
+    def acquire(self) -> float:
+        """
+        连接之前调用，检查此刻是否可以连接。半开状态下只有第一个调用者获得试探名额
+
+        :return: 0表示可以连接，否则为还需要等待的时间，等待之后应该再次调用
+        """
+        now = time.monotonic()
+        state = self.state
+        if state == CircuitState.OPEN:
+            return self._open_until - now + random.uniform(0, 1)
+        if state == CircuitState.HALF_OPEN:
+            if self._probe_until <= now:
+                # 放行这一个，其他的等试探结果，试探一直没有结果时window秒后再放行一个
+                self._probe_until = now + self._window
+                return 0.0
+            return self._probe_until - now + random.uniform(0, 1)
+        return 0.0
+
+
+class BackoffRetryPolicy:
+    """
+    去相关抖动的指数退避重连策略，可选共用令牌桶和熔断器。每个客户端应该使用单独的实例
+
+    连接成功后客户端会调用on_success，退避时间恢复到初始值。客户端每次重连之前会调用get_connect_delay，
+    等待期间熔断器可能已经打开，或者半开状态的试探名额已被其他客户端占用，这时要继续等待
+
+    :param base_interval: 初始间隔（秒）
+    :param max_interval: 最大间隔（秒）
+    :param token_bucket: 共用的令牌桶，用来限制整个进程的重连速率
+    :param circuit_breaker: 共用的熔断器
+    """
+
+    def __init__(
+        self,
+        base_interval: float = 1.0,
+        max_interval: float = 60.0,
+        token_bucket: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._base_interval = base_interval
+        self._max_interval = max_interval
+        self._token_bucket = token_bucket
+        self._circuit_breaker = circuit_breaker
+        self._last_interval = base_interval
+        self._is_probe = False
+        """上次连接是否占用了熔断器半开状态的试探名额"""
+
+    def __call__(self, retry_count: int, _total_retry_count: int) -> float:
+        if self._circuit_breaker is not None and retry_count > 1:
+            # retry_count为1说明之前连接正常，只是掉线了，不算重连失败
+            self._circuit_breaker.record_failure(self._is_probe)
+        self._is_probe = False
+
+        if retry_count <= 1:
+            interval = random.uniform(0, self._base_interval)
+            self._last_interval = self._base_interval
+        else:
+            interval = min(self._max_interval, random.uniform(self._base_interval, self._last_interval * 3))
+            self._last_interval = interval
+
+        if self._circuit_breaker is not None:
+            interval += self._circuit_breaker.get_delay(interval)
+        if self._token_bucket is not None:
+            interval += self._token_bucket.reserve(interval)
+        return interval
+
+    def get_connect_delay(self) -> float:
+        """
+        重连之前调用
+
+        :return: 0表示可以连接，否则为还需要等待的时间，等待之后应该再次调用
+        """
+        if self._circuit_breaker is None:
+            return 0.0
+        is_half_open = self._circuit_breaker.state == CircuitState.HALF_OPEN
+        delay = self._circuit_breaker.acquire()
+        self._is_probe = is_half_open and delay == 0.0
+        return delay
+
+    def on_success(self):
+        self._last_interval = self._base_interval
+        self._is_probe = False
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.record_success()
@@ -31,6 +31,8 @@ class Settings(BaseSettings):
     # Bilibili API 配置
     BILIBILI_API_ROOM_INFO: str = "https://api.live.bilibili.com/room/v1/Room/get_info"
     BILIBILI_API_LIVE_USER_INFO: str = "https://api.live.bilibili.com/live_user/v1/Master/info"
+    BILIBILI_API_ROOM_INFO_BY_ROOM: str = "https://api.live.bilibili.com/xlive/web-room/v1/index/getInfoByRoom"
+    BILIBILI_API_ROOM_STATUS_BY_UIDS: str = "https://api.live.bilibili.com/room/v1/Room/get_status_info_by_uids"
     BILIBILI_API_GIFT_LIST: str = "https://api.live.bilibili.com/xlive/web-room/v1/giftPanel/roomGiftList"
     QR_GENERATE_URL: str = "https://passport.bilibili.com/x/passport-login/web/qrcode/generate"
     QR_POLL_URL: str = "https://passport.bilibili.com/x/passport-login/web/qrcode/poll"
@@ -46,6 +48,118 @@ class Settings(BaseSettings):
     # 数据库配置
     DATABASE_URL: str = "sqlite:///dmjdb.db"
 
+    # SQLite 存储调优 (连接建立时通过 PRAGMA 应用)
+    SQLITE_TUNING_ENABLED: bool = True
+    SQLITE_JOURNAL_MODE: Literal["DELETE", "TRUNCATE", "PERSIST", "WAL"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 字节，0 表示关闭 mmap
+    SQLITE_CACHE_SIZE: int = -64000  # 负数表示 KiB，约 64MB
+    SQLITE_TEMP_STORE: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+    SQLITE_BUSY_TIMEOUT: int = 5000  # 毫秒
+    SQLITE_AUTO_VACUUM: Literal["NONE", "FULL", "INCREMENTAL"] = "INCREMENTAL"  # 只对新建的数据库文件生效
+    # 写连接常驻 (单连接串行写入)，读操作走独立的只读连接池
+    SQLITE_WRITER_POOL_TIMEOUT: float = 30.0  # 秒
+    SQLITE_READ_POOL_SIZE: int = 4
+    SQLITE_READ_POOL_MAX_OVERFLOW: int = 4
+
+    # 历史记录查询
+    HISTORY_MAX_PAGE_SIZE: int = 500
+
+    # 最近事件环形缓冲区 (每个房间每类事件保留的条数 / 最多缓存的房间数)
+    EVENT_BUFFER_SIZE: int = 500
+    EVENT_BUFFER_MAX_ROOMS: int = 16
+    # 断线重连补发窗口 (每个房间按 seq 保留的事件数)
+    EVENT_REPLAY_WINDOW: int = 2000
+
+    # 事件处理后台任务：同时运行上限 / 积压上限 (超过时拒绝新任务) / 关闭时等待的最长时间
+    TASK_MAX_CONCURRENCY: int = 64
+    TASK_MAX_PENDING: int = 1000
+    TASK_SHUTDOWN_TIMEOUT: float = 10.0  # 秒
+
+    # 事件推送/保存优先级通道：弹幕推送积压超过该条数时丢弃最旧的 (0 表示不限制)，付费事件不受影响
+    PIPELINE_CHAT_MAX_PENDING: int = 2000
+    # 保存队列各通道的积压上限 (0 表示不限制)，写库长时间跟不上时丢弃最旧的待保存记录，避免内存无限增长
+    PIPELINE_PERSIST_MAX_PENDING: dict[str, int] = {
+        "paid": 50000,
+        "gift": 20000,
+        "chat": 20000,
+    }
+
+    # WebSocket 推送：每个连接的发送队列上限 (条) / 单条消息发送超时 (秒)，超过时断开该连接，客户端可重连补发
+    WS_SEND_MAX_PENDING: int = 1000
+    WS_SEND_TIMEOUT: float = 10.0
+
+    # 重复弹幕折叠：窗口内相同 (归一化后) 的弹幕只推送首条，其余合并为一条带 repeat 次数的弹幕定期推送
+    DEDUP_ENABLED: bool = False
+    DEDUP_WINDOW: float = 5.0  # 秒，距同一内容上次出现超过该时长后重新计数
+    DEDUP_FLUSH_INTERVAL: float = 1.0  # 秒，合并推送的间隔
+    DEDUP_PERSIST_MAX: int = -1  # 每个内容在窗口内最多保存的重复弹幕条数，负数表示全部保存
+
+    # 直播间初始化信息缓存 (真实房间号、主播、buvid、弹幕服务器)，持久化后重启也能直接连接
+    BLIVE_INIT_CACHE_PATH: Path = BACKEND_DIR / "data" / "room_init_cache.json"
+    BLIVE_INIT_CACHE_HOST_TTL: float = 30 * 60  # 秒，弹幕服务器 token 的缓存时间
+    # wbi 签名口令，所有房间共用，持久化后重启不用重新获取 (有效期约 12 小时)
+    BLIVE_WBI_KEY_PATH: Path = BACKEND_DIR / "data" / "wbi_key.json"
+    # 弹幕服务器按连接耗时和失败记录选择；竞速连接时同时尝试前两位服务器，先连上的保留
+    # 默认关闭：延迟高于 BLIVE_RACE_DELAY 的网络上每次连接都会变成两个
+    BLIVE_RACE_CONNECT: bool = False
+    BLIVE_RACE_DELAY: float = 0.3  # 秒，第一个连接在该时间内没有成功时启动第二个
+    # 掉线重连：去相关抖动的指数退避，所有房间共用令牌桶限速，短时间失败过多时熔断
+    BLIVE_RECONNECT_BASE: float = 1.0  # 秒
+    BLIVE_RECONNECT_MAX: float = 60.0  # 秒
+    BLIVE_RECONNECT_RATE: float = 5.0  # 每秒最多重连次数 (整个进程)
+    BLIVE_RECONNECT_BURST: int = 10
+    BLIVE_BREAKER_THRESHOLD: int = 20  # 窗口内失败次数达到该值时熔断
+    BLIVE_BREAKER_WINDOW: float = 10.0  # 秒
+    BLIVE_BREAKER_OPEN: float = 30.0  # 秒，熔断持续时间
+
+    # 直播间信息 (标题、主播) 缓存时间 / 批量查询的并发请求数与房间数上限
+    ROOM_INFO_TTL: float = 300.0  # 秒
+    ROOM_INFO_CONCURRENCY: int = 4
+    ROOM_INFO_BATCH_MAX: int = 50
+
+    # 账号池：按负载给直播间分配数据库中的账号，每个账号限制每分钟请求数，被风控 (-352/-412) 后指数退避冷却并换号
+    IDENTITY_POOL_ENABLED: bool = True
+    # 未指定账号的请求也从池中借用账号 (默认关闭：匿名请求只用匿名连接，不借用已保存的账号)
+    IDENTITY_POOL_BORROW: bool = False
+    IDENTITY_REQUEST_BUDGET: int = 120  # 每个账号每分钟最多请求数
+    IDENTITY_COOLDOWN_BASE: float = 60.0  # 秒，第一次被风控的冷却时间
+    IDENTITY_COOLDOWN_MAX: float = 1800.0  # 秒
+
+    # 礼物信息：各房间礼物面板的刷新间隔
+    GIFT_CATALOG_TTL: float = 6 * 3600  # 秒
+
+    # 礼物连击聚合：同一用户同一连击的礼物合并推送增量更新，连击结束后保存一条合计记录
+    GIFT_COMBO_ENABLED: bool = True
+    GIFT_COMBO_SETTLE: float = 3.0  # 秒，超过该时长没有新礼物视为连击结束
+    GIFT_COMBO_UPDATE_INTERVAL: float = 0.5  # 秒，连击增量推送的最小间隔
+
+    # 实时统计
+    STATS_TOP_K: int = 10
+    STATS_PUSH_INTERVAL: float = 5.0  # 秒，WebSocket 推送统计的间隔
+    STATS_SNAPSHOT_INTERVAL: float = 60.0  # 秒，统计快照持久化间隔
+    STATS_SNAPSHOT_DIR: Path = BACKEND_DIR / "data" / "stats"
+
+    # 分时汇总 (分钟/小时/天)，供分析接口查询
+    ROLLUP_ENABLED: bool = True
+    ROLLUP_INTERVAL: float = 60.0  # 秒，后台汇总间隔
+    ROLLUP_GRACE_SECONDS: float = 10.0  # 秒，只汇总早于 now - grace 的完整分钟，等待异步写入落库
+    ANALYTICS_MAX_BUCKETS: int = 1440
+
+    # 数据保留与归档：超过保留天数的记录按天归档为 gzip NDJSON 后从数据库删除
+    # 默认关闭，开启后才会删除数据库中的旧记录 (升级后不会在未确认的情况下丢失可查询的历史)
+    RETENTION_ENABLED: bool = False
+    RETENTION_DAYS: dict[str, int] = {  # 表名 -> 保留天数，0 表示永久保留
+        "danmu": 30,
+        "gift": 0,
+        "superchat": 0,
+    }
+    RETENTION_ARCHIVE_DIR: Path = BACKEND_DIR / "data" / "archive"
+    RETENTION_BATCH_SIZE: int = 500  # 每个删除事务的行数，较小的批次不会长时间占用写连接
+    RETENTION_INTERVAL: float = 3600.0  # 秒，归档任务执行间隔
+    # 归档后回收空闲页：auto_vacuum=INCREMENTAL 时每次最多回收的页数；旧数据库由迁移切换为增量回收模式
+    RETENTION_VACUUM_PAGES: int = 2000
+
     # CORS
     CORS_ALLOWED_ORIGINS: list[str] = [  # 末尾不带斜杠
         "http://127.0.0.1:5000",
@@ -1,20 +1,84 @@
 # -*- coding: utf-8 -*-
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from backend.core.conf import settings
+
 # 数据库文件路径
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./dmjdb.db"
 
-# 创建异步引擎
+
+def _apply_sqlite_pragmas(dbapi_connection, read_only: bool = False):
+    """
+    在新建的 SQLite 连接上应用存储调优参数
+
+    Args:
+        dbapi_connection: DBAPI 连接对象
+        read_only (bool): 是否为只读连接 (读连接池)
+    """
+    pragmas = [f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}"]
+    if settings.SQLITE_TUNING_ENABLED:
+        pragmas += [
+            f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+            f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+            f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}",
+            f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+        ]
+        # journal_mode / auto_vacuum 持久化在数据库文件中，由写连接设置即可
+        # auto_vacuum 必须在建表前设置，已有数据的库需要一次 VACUUM 才会生效
+        if not read_only:
+            pragmas.insert(0, f"PRAGMA auto_vacuum={settings.SQLITE_AUTO_VACUUM}")
+            pragmas.insert(1, f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in pragmas:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+# 创建异步引擎 (写连接：单个常驻连接，串行化写入，避免 SQLITE_BUSY)
 engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=settings.SQLITE_WRITER_POOL_TIMEOUT,
+)
+
+# 只读引擎 (读连接池：WAL 模式下读写互不阻塞)
+read_engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=settings.SQLITE_READ_POOL_SIZE,
+    max_overflow=settings.SQLITE_READ_POOL_MAX_OVERFLOW,
 )
 
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_writer_connect(dbapi_connection, connection_record):
+    _apply_sqlite_pragmas(dbapi_connection)
+
+
+@event.listens_for(read_engine.sync_engine, "connect")
+def _on_reader_connect(dbapi_connection, connection_record):
+    _apply_sqlite_pragmas(dbapi_connection, read_only=True)
+
+
 # 创建异步会话工厂
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# 只读会话工厂：用于历史查询等纯读操作
+AsyncReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 # 声明性基类
 Base = declarative_base()
 
@@ -22,3 +86,13 @@ Base = declarative_base()
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+# 依赖项：获取只读数据库会话
+async def get_read_db():
+    async with AsyncReadSessionLocal() as session:
+        yield session
+
+async def dispose_engines():
+    """释放读写连接池 (应用关闭时调用)"""
+    await read_engine.dispose()
+    await engine.dispose()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+弹幕 / SC 全文检索 (SQLite FTS5)
+
+danmu_fts / superchat_fts 是以 danmu / superchat 为外部内容表的 FTS5 虚拟表，只保存倒排索引，
+正文仍从原表读取。使用 trigram 分词，中文无需分词即可做子串匹配 (检索词至少 3 个字符)。
+原表上的触发器在插入/删除/更新时同步索引，归档删除记录时索引也随之删除。
+
+重建索引 (例如在已有数据的库上首次启用)：
+    python -m backend.database.fts
+"""
+from sqlalchemy import Connection, text
+
+# FTS 表名 -> (原表, 正文列)
+FTS_TABLES = {
+    "danmu_fts": ("danmu", "dm_text"),
+    "superchat_fts": ("superchat", "sc_text"),
+}
+
+
+def fts_ddl(fts_table: str) -> list[str]:
+    """虚拟表与同步触发器的建表语句"""
+    source, column = FTS_TABLES[fts_table]
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{column}, content='{source}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {source}_fts_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {source}_fts_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {source}_fts_au AFTER UPDATE OF {column} ON {source} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def create_fts(conn: Connection):
+    """
+    创建全文索引 (已存在时跳过)；新建时若原表已有数据则同时重建索引
+    """
+    for fts_table in FTS_TABLES:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts_table}
+        ).scalar()
+        for ddl in fts_ddl(fts_table):
+            conn.execute(text(ddl))
+        if not exists:
+            rebuild_fts(conn, fts_table)
+
+
+def rebuild_fts(conn: Connection, fts_table: str):
+    """根据原表内容重建全文索引"""
+    conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+
+if __name__ == "__main__":
+    import asyncio
+    from loguru import logger
+    from backend.database.db import engine
+
+    async def main():
+        async with engine.begin() as conn:
+            await conn.run_sync(create_fts)
+            for fts_table in FTS_TABLES:
+                await conn.run_sync(rebuild_fts, fts_table)
+                logger.info(f"全文索引 {fts_table} 重建完成")
+        await engine.dispose()
+
+    asyncio.run(main())
@@ -6,11 +6,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from backend.app.api.router import v1
-from backend.database.db import engine, Base
+from backend.database.db import engine, Base, dispose_engines
+from backend.database.fts import create_fts
 from backend.core.conf import settings
 from backend.core.logger import setup_logging
 from backend.core.middleware import BilibiliUserInfoMiddleware
 from backend.common.exception.handler import register_exception_handler
+from backend.app.services.blive_service import blive_service
+from backend.app.services.stats_service import stats_service
+from backend.app.services.gift_service import gift_service
+from backend.app.services.identity_service import identity_pool
+from backend.app.services.rollup_service import rollup_service
+from backend.app.services.retention_service import retention_service
+from backend.utils.task_supervisor import background_tasks
 
 # 设置日志
 setup_logging()
@@ -29,8 +37,34 @@ async def lifespan(app: FastAPI):
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_fts)
+
+    # 加载礼物信息索引
+    await gift_service.load()
+    # 加载账号池并预先创建各账号的会话
+    await identity_pool.load()
+
+    # 启动实时统计推送/快照任务
+    background_tasks.spawn(
+        stats_service.run(blive_service.broadcast_stats, blive_service.stats_room_ids), name="stats"
+    )
+    # 启动分时汇总任务
+    if settings.ROLLUP_ENABLED:
+        background_tasks.spawn(rollup_service.run(), name="rollup")
+    # 启动数据保留/归档任务
+    if settings.RETENTION_ENABLED:
+        background_tasks.spawn(retention_service.run(), name="retention")
     yield
 
+    await background_tasks.shutdown(cancel=True)
+
+    # 写完待保存的事件
+    await blive_service.close_pipelines()
+    await identity_pool.close()
+
+    # 释放数据库连接池
+    await dispose_engines()
+
 app = FastAPI(
     title=settings.APP_TITLE,
     description=settings.APP_DESCRIPTION,
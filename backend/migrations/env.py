@@ -26,9 +26,17 @@ from backend.database.db import Base
 from backend.app.models.danmaku import Danmaku, Gift, SuperChat, GiftInfoRoom
 from backend.app.models.auth import Auth
 from backend.app.models.room import Room
+from backend.app.models.rollup import RoomRollup, RoomGiftRollup, RoomRollupSender, RollupState
 
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # FTS5 虚拟表及其影子表由迁移脚本手动维护，autogenerate 时忽略
+    if type_ == "table" and reflected and "_fts" in name:
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -53,6 +61,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -74,7 +83,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
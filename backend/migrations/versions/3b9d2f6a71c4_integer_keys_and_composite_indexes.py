@@ -0,0 +1,51 @@
+"""integer_keys_and_composite_indexes
+
+Revision ID: 3b9d2f6a71c4
+Revises: e27014378950
+Create Date: 2026-10-19 10:12:45.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2f6a71c4'
+down_revision: Union[str, Sequence[str], None] = 'e27014378950'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('danmu', 'gift', 'superchat')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        # 清理无法转换为整数的 uid (空字符串 / 'None')
+        op.execute(f"UPDATE {table} SET uid = NULL WHERE uid = '' OR uid = 'None'")
+
+        # SQLite 不支持直接修改列类型，使用 batch 模式重建表
+        # INTEGER 亲和性会在复制数据时自动把数字字符串转换为整数
+        with op.batch_alter_table(table, recreate='always') as batch_op:
+            batch_op.drop_index(f'ix_{table}_room_id')
+            batch_op.alter_column('room_id', existing_type=sa.String(length=64), type_=sa.Integer(),
+                                  existing_nullable=False)
+            batch_op.alter_column('uid', existing_type=sa.String(length=64), type_=sa.BigInteger(),
+                                  existing_nullable=True)
+            batch_op.create_index(f'ix_{table}_room_id_create_time', ['room_id', 'create_time'], unique=False)
+            batch_op.create_index(f'ix_{table}_room_id_uid', ['room_id', 'uid'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always') as batch_op:
+            batch_op.drop_index(f'ix_{table}_room_id_uid')
+            batch_op.drop_index(f'ix_{table}_room_id_create_time')
+            batch_op.alter_column('uid', existing_type=sa.BigInteger(), type_=sa.String(length=64),
+                                  existing_nullable=True)
+            batch_op.alter_column('room_id', existing_type=sa.Integer(), type_=sa.String(length=64),
+                                  existing_nullable=False)
+            batch_op.create_index(f'ix_{table}_room_id', ['room_id'], unique=False)
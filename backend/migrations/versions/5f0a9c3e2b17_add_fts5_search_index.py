@@ -0,0 +1,55 @@
+"""add_fts5_search_index
+
+Revision ID: 5f0a9c3e2b17
+Revises: 8c41e5d07a92
+Create Date: 2026-10-19 16:02:41.207915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0a9c3e2b17'
+down_revision: Union[str, Sequence[str], None] = '8c41e5d07a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# FTS 表名 -> (原表, 正文列)
+FTS_TABLES = {
+    'danmu_fts': ('danmu', 'dm_text'),
+    'superchat_fts': ('superchat', 'sc_text'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for fts_table, (source, column) in FTS_TABLES.items():
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+            f"{column}, content='{source}', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {source}_fts_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {source}_fts_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {source}_fts_au AFTER UPDATE OF {column} ON {source} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+            f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END"
+        )
+        # 为已有数据建立索引
+        op.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for fts_table, (source, _) in FTS_TABLES.items():
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {source}_fts_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts_table}")
@@ -0,0 +1,68 @@
+"""add_rollup_tables
+
+Revision ID: 8c41e5d07a92
+Revises: 3b9d2f6a71c4
+Create Date: 2026-10-19 14:26:03.551872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41e5d07a92'
+down_revision: Union[str, Sequence[str], None] = '3b9d2f6a71c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'room_rollup',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('room_id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=16), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('danmaku_count', sa.Integer(), nullable=False),
+        sa.Column('gift_count', sa.Integer(), nullable=False),
+        sa.Column('super_chat_count', sa.Integer(), nullable=False),
+        sa.Column('unique_senders', sa.Integer(), nullable=False),
+        sa.Column('gift_revenue', sa.Float(), nullable=False),
+        sa.Column('guard_revenue', sa.Float(), nullable=False),
+        sa.Column('super_chat_revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('room_id', 'granularity', 'bucket', name='uq_room_rollup_bucket'),
+    )
+    op.create_index('ix_room_rollup_granularity_bucket', 'room_rollup', ['granularity', 'bucket'], unique=False)
+    op.create_table(
+        'room_gift_rollup',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('room_id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=16), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('gift_name', sa.String(length=255), nullable=False),
+        sa.Column('gift_count', sa.Integer(), nullable=False),
+        sa.Column('gift_num', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('room_id', 'granularity', 'bucket', 'gift_name', name='uq_room_gift_rollup_bucket'),
+    )
+    op.create_index('ix_room_gift_rollup_granularity_bucket', 'room_gift_rollup', ['granularity', 'bucket'], unique=False)
+    op.create_table(
+        'rollup_state',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('watermark', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rollup_state')
+    op.drop_index('ix_room_gift_rollup_granularity_bucket', table_name='room_gift_rollup')
+    op.drop_table('room_gift_rollup')
+    op.drop_index('ix_room_rollup_granularity_bucket', table_name='room_rollup')
+    op.drop_table('room_rollup')
@@ -0,0 +1,38 @@
+"""gift_info_room_upsert_keys
+
+Revision ID: a6e3c1f94d28
+Revises: 5f0a9c3e2b17
+Create Date: 2026-10-19 18:21:37.640512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e3c1f94d28'
+down_revision: Union[str, Sequence[str], None] = '5f0a9c3e2b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 同名礼物只保留最早的一条，之后按名称 upsert
+    op.execute(
+        "DELETE FROM gift_info_room WHERE id NOT IN (SELECT MIN(id) FROM gift_info_room GROUP BY name)"
+    )
+    with op.batch_alter_table('gift_info_room') as batch_op:
+        batch_op.add_column(sa.Column('gift_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ux_gift_info_room_name', ['name'], unique=True)
+        batch_op.create_index('ix_gift_info_room_gift_id', ['gift_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('gift_info_room') as batch_op:
+        batch_op.drop_index('ix_gift_info_room_gift_id')
+        batch_op.drop_index('ux_gift_info_room_name')
+        batch_op.drop_column('gift_id')
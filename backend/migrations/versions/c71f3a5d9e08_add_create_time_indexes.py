@@ -0,0 +1,32 @@
+"""add_create_time_indexes
+
+Revision ID: c71f3a5d9e08
+Revises: a6e3c1f94d28
+Create Date: 2026-10-19 21:05:12.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71f3a5d9e08'
+down_revision: Union[str, Sequence[str], None] = 'a6e3c1f94d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 分时汇总按时间范围跨房间聚合，(room_id, create_time) 索引的首列不是 create_time，无法用于范围扫描
+    op.create_index('ix_danmu_create_time', 'danmu', ['create_time'], unique=False)
+    op.create_index('ix_gift_create_time', 'gift', ['create_time'], unique=False)
+    op.create_index('ix_superchat_create_time', 'superchat', ['create_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_superchat_create_time', table_name='superchat')
+    op.drop_index('ix_gift_create_time', table_name='gift')
+    op.drop_index('ix_danmu_create_time', table_name='danmu')
@@ -0,0 +1,38 @@
+"""incremental_auto_vacuum
+
+Revision ID: d4b8e2a61f35
+Revises: c71f3a5d9e08
+Create Date: 2026-10-19 21:40:27.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b8e2a61f35'
+down_revision: Union[str, Sequence[str], None] = 'c71f3a5d9e08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _set_auto_vacuum(mode: str, value: int) -> None:
+    bind = op.get_bind()
+    if bind.exec_driver_sql("PRAGMA auto_vacuum").scalar() == value:
+        return
+    # 已有数据的库切换 auto_vacuum 需要一次完整 VACUUM 才会生效，VACUUM 不能在事务中执行。
+    # 在迁移时离线执行一次，之后归档任务只做有上限的 incremental_vacuum，不会在运行中阻塞写入
+    with op.get_context().autocommit_block():
+        bind.exec_driver_sql(f"PRAGMA auto_vacuum={mode}")
+        bind.exec_driver_sql("VACUUM")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _set_auto_vacuum("INCREMENTAL", 2)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _set_auto_vacuum("NONE", 0)
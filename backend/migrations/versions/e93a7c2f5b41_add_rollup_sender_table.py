@@ -0,0 +1,39 @@
+"""add_rollup_sender_table
+
+Revision ID: e93a7c2f5b41
+Revises: d4b8e2a61f35
+Create Date: 2026-10-20 10:12:44.207135
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e93a7c2f5b41'
+down_revision: Union[str, Sequence[str], None] = 'd4b8e2a61f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'room_rollup_sender',
+        sa.Column('granularity', sa.String(length=16), nullable=False),
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('room_id', sa.Integer(), nullable=False),
+        sa.Column('uid', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('granularity', 'bucket', 'room_id', 'uid'),
+    )
+    # 当天已汇总部分的发送者没有记录，把汇总进度退回当天零点，下次汇总时重算当天并填充发送者集合
+    op.execute(
+        "UPDATE rollup_state SET watermark = substr(watermark, 1, 10) || ' 00:00:00.000000'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('room_rollup_sender')
@@ -0,0 +1,122 @@
+import asyncio
+from typing import Coroutine, Optional, Set
+
+from loguru import logger
+
+
+class TaskSupervisor:
+    """
+    有界的后台任务管理器
+
+    替代直接调用 asyncio.create_task：持有任务的强引用 (避免任务被 GC 回收)，
+    用信号量限制同时运行的数量，超过积压上限时拒绝新任务，统计并记录任务异常，
+    关闭时等待已有任务完成 (超时后取消)。
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 0, max_pending: int = 0):
+        """
+        :param name: 名称，用于日志
+        :param max_concurrency: 同时运行的任务上限，0 表示不限制
+        :param max_pending: 任务总数 (运行中 + 等待中) 上限，0 表示不限制
+        """
+        self.name = name
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self._closing = False
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> Optional[asyncio.Task]:
+        """
+        提交一个协程
+
+        :param coro: 协程对象
+        :param name: 任务名称
+        :return: 创建的任务；关闭中或积压超过上限时返回 None (协程会被关闭，不会执行)
+        """
+        if self._closing or (self.max_pending > 0 and len(self._tasks) >= self.max_pending):
+            coro.close()
+            self.rejected += 1
+            if self.rejected == 1 or self.rejected % 100 == 0:
+                logger.warning(f"[{self.name}] 任务积压已达上限 {self.max_pending}，已拒绝 {self.rejected} 个任务")
+            return None
+
+        task = asyncio.create_task(self._guarded(coro), name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    async def _guarded(self, coro: Coroutine):
+        if self._semaphore is None:
+            self._running += 1
+            try:
+                return await coro
+            finally:
+                self._running -= 1
+        async with self._semaphore:
+            self._running += 1
+            try:
+                return await coro
+            finally:
+                self._running -= 1
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            self.cancelled += 1
+            return
+        exc = task.exception()
+        if exc is None:
+            self.completed += 1
+            return
+        self.failed += 1
+        self.last_error = f"{type(exc).__name__}: {exc}"
+        logger.opt(exception=exc).error(f"[{self.name}] 任务 {task.get_name()} 异常: {exc}")
+
+    @property
+    def pending(self) -> int:
+        """运行中与等待运行的任务数"""
+        return len(self._tasks)
+
+    async def shutdown(self, timeout: Optional[float] = None, cancel: bool = False):
+        """
+        停止接收新任务并等待已有任务结束
+
+        :param timeout: 等待的最长时间 (秒)，超时后取消剩余任务；None 表示一直等待
+        :param cancel: 是否直接取消 (用于常驻的循环任务)
+        """
+        self._closing = True
+        try:
+            tasks = list(self._tasks)
+            if not tasks:
+                return
+            if not cancel:
+                _, tasks = await asyncio.wait(tasks, timeout=timeout)
+                if tasks:
+                    logger.warning(f"[{self.name}] 关闭超时，取消剩余 {len(tasks)} 个任务")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # 关闭完成后允许再次使用 (例如应用在同一进程内重启)
+            self._closing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": self.pending,
+            "running": self._running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+# 应用级常驻后台任务 (统计推送、分时汇总、归档等)，随 main.lifespan 启停
+background_tasks: TaskSupervisor = TaskSupervisor("background")
@@ -39,6 +39,26 @@ class TimeZone:
         """
         return datetime.strptime(t_str, format_str).replace(tzinfo=self.tz_info)
 
+    def to_local(self, t: datetime) -> datetime:
+        """
+        将 datetime 对象转换为当前时区时间，无时区信息时视为当前时区
+
+        :param t: datetime 对象
+        :return:
+        """
+        if t.tzinfo is None:
+            return t.replace(tzinfo=self.tz_info)
+        return t.astimezone(self.tz_info)
+
+    def to_timestamp(self, t: datetime) -> float:
+        """
+        将 datetime 对象转换为时间戳，无时区信息时视为当前时区 (SQLite 读出的时间不带时区)
+
+        :param t: datetime 对象
+        :return:
+        """
+        return self.to_local(t).timestamp()
+
     @staticmethod
     def to_str(t: datetime, format_str: str = settings.DATETIME_FORMAT) -> str:
         """
@@ -76,6 +76,18 @@ const useDanmakuStore = create((set) => ({
         };
         const newTotal = state.totalRevenue + price;
         console.log('New totalRevenue:', newTotal);
+
+        // 礼物连击：price/num 是增量，列表中同一连击只保留一条，显示累计值
+        if (gift.combo_id) {
+            newItem.count = gift.combo_num;
+            newItem.price = gift.combo_price;
+            const index = state.giftList.findIndex((item) => item.combo_id === gift.combo_id);
+            if (index !== -1) {
+                const giftList = [...state.giftList];
+                giftList[index] = { ...newItem, id: state.giftList[index].id };
+                return { giftList, totalRevenue: newTotal };
+            }
+        }
         
         return { 
             giftList: [...state.giftList, newItem].slice(-200),